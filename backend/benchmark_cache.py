@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Cache contention benchmark: LRUCache vs StripedLRUCache
+
+Runs a read-heavy mixed workload (90% get / 10% set over a hot key space)
+from 1, 8 and 32 threads and reports throughput for each implementation.
+
+Usage:
+    python -m backend.benchmark_cache [--ops 20000] [--segments 16]
+"""
+import argparse
+import random
+import threading
+import time
+from typing import Callable, Dict, List
+
+from backend.cache_service import LRUCache, StripedLRUCache
+
+THREAD_COUNTS = [1, 8, 32]
+KEY_SPACE = 1000
+
+def run_workload(cache, threads: int, ops_per_thread: int) -> float:
+    """Run the workload and return throughput in operations per second"""
+    keys = [f"search:{i}" for i in range(KEY_SPACE)]
+    for key in keys:
+        cache.set(key, {"docs": [key]})
+
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(seed: int):
+        rng = random.Random(seed)
+        barrier.wait()
+        for _ in range(ops_per_thread):
+            key = keys[rng.randrange(KEY_SPACE)]
+            if rng.random() < 0.9:
+                cache.get(key)
+            else:
+                cache.set(key, {"docs": [key]})
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for thread in workers:
+        thread.start()
+
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    return threads * ops_per_thread / elapsed
+
+def benchmark(ops_per_thread: int, segments: int) -> List[Dict[str, float]]:
+    """Benchmark both cache implementations at each thread count"""
+    factories: Dict[str, Callable] = {
+        "LRUCache": lambda: LRUCache(max_size=KEY_SPACE * 2),
+        f"StripedLRUCache({segments})": lambda: StripedLRUCache(max_size=KEY_SPACE * 2, segments=segments)
+    }
+
+    rows = []
+    for threads in THREAD_COUNTS:
+        row = {"threads": threads}
+        for name, factory in factories.items():
+            row[name] = run_workload(factory(), threads, ops_per_thread)
+        rows.append(row)
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Cache lock contention benchmark")
+    parser.add_argument("--ops", type=int, default=20000, help="Operations per thread")
+    parser.add_argument("--segments", type=int, default=16, help="Segments for the striped cache")
+    args = parser.parse_args()
+
+    rows = benchmark(args.ops, args.segments)
+    names = [name for name in rows[0] if name != "threads"]
+
+    print("Cache contention benchmark (ops/sec, 90% get / 10% set)")
+    print("=" * 60)
+    print(f"{'threads':>8}" + "".join(f"{name:>26}" for name in names))
+    for row in rows:
+        print(f"{row['threads']:>8}" + "".join(f"{row[name]:>26,.0f}" for name in names))
+
+if __name__ == "__main__":
+    main()
@@ -5,11 +5,19 @@ Provides in-memory caching for search results and embeddings to improve performa
 Uses LRU (Least Recently Used) eviction policy with configurable TTL (Time To Live).
 
 Features:
-- LRU cache with size limits
-- TTL-based expiration
+- LRU cache with entry-count and byte-budget limits
+- TTL-based expiration, swept incrementally from an expiry-ordered heap
 - Cache hit/miss statistics
-- Thread-safe operations
+- Thread-safe operations, optionally lock-striped (StripedLRUCache)
+- Optional cross-worker shared tier (SQLite or Redis) behind the in-process LRU
+- Dependency tags: entries are evicted when the invalidation bus reports a change,
+  in every worker via per-scope generations kept in the shared tier (re-read at
+  most every CACHE_GENERATION_TTL seconds)
 - Configurable cache sizes per operation type
+- @cached decorator for async service methods and route handlers
+- Single-flight get_or_compute: concurrent misses share one computation
+- Stale-while-revalidate: past its soft TTL an entry is still served while a
+  single background refresh replaces it, until the hard TTL expires it
 
 Usage:
     from cache_service import CacheService
@@ -30,83 +38,191 @@ Usage:
 """
 
 import asyncio
+import functools
 import hashlib
+import heapq
+import inspect
 import json
 import logging
+import os
+import sys
 import threading
 import time
+import zlib
 from collections import OrderedDict
-from typing import Any, Dict, List, Optional
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+try:
+    from .invalidation_bus import get_invalidation_bus
+    from .shared_cache import create_shared_cache, encode_value, run_in_shared_executor
+except ImportError:  # Imported as a top-level module by the standalone scripts
+    from invalidation_bus import get_invalidation_bus
+    from shared_cache import create_shared_cache, encode_value, run_in_shared_executor
 
 logger = logging.getLogger(__name__)
 
 class CacheEntry:
-    """Represents a cache entry with value, timestamp, and TTL"""
+    """
+    Represents a cache entry with value, timestamp, and TTL
+
+    ``ttl_seconds`` is the soft TTL: the entry is fresh until then. It may be
+    served stale for a further ``stale_seconds`` (the hard TTL) while it is
+    being refreshed.
+    """
 
-    def __init__(self, value: Any, ttl_seconds: int = 300):
+    def __init__(self, value: Any, ttl_seconds: int = 300, size_bytes: int = 0,
+                 stale_seconds: float = 0):
         self.value = value
         self.timestamp = time.time()
         self.ttl_seconds = ttl_seconds
+        self.size_bytes = size_bytes
+        self.fresh_until = self.timestamp + ttl_seconds
+        self.expires_at = self.fresh_until + stale_seconds
 
-    def is_expired(self) -> bool:
+    def is_expired(self, now: Optional[float] = None) -> bool:
         """Check if the cache entry has expired"""
-        return time.time() - self.timestamp > self.ttl_seconds
+        return (now or time.time()) > self.expires_at
+
+    def stale_age(self, now: Optional[float] = None) -> float:
+        """Seconds the entry has been past its soft TTL (0 while fresh)"""
+        return max(0.0, (now or time.time()) - self.fresh_until)
 
     def get_age_seconds(self) -> float:
         """Get the age of the cache entry in seconds"""
         return time.time() - self.timestamp
 
+def estimate_size(value: Any, _seen: Optional[set] = None) -> int:
+    """
+    Approximate the memory footprint of a cached value in bytes
+
+    Walks dicts, lists, tuples and sets recursively (shared objects are
+    counted once). A numpy array that owns its data is fully covered by
+    ``sys.getsizeof``; views (``base`` set) and other objects exposing
+    ``nbytes`` add their buffer on top of the object header.
+    """
+    if _seen is None:
+        _seen = set()
+    if id(value) in _seen:
+        return 0
+    _seen.add(id(value))
+
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        for k, v in value.items():
+            size += estimate_size(k, _seen) + estimate_size(v, _seen)
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        for item in value:
+            size += estimate_size(item, _seen)
+    elif hasattr(value, "nbytes") and not (hasattr(value, "base") and value.base is None):
+        size += int(value.nbytes)
+    return size
+
 class LRUCache:
-    """Thread-safe LRU cache implementation"""
+    """Thread-safe LRU cache implementation, bounded by entry count and optionally bytes"""
 
-    def __init__(self, max_size: int = 1000):
+    def __init__(self, max_size: int = 1000, max_bytes: Optional[int] = None):
         self.max_size = max_size
+        self.max_bytes = max_bytes
         self.cache: OrderedDict[str, CacheEntry] = OrderedDict()
         self.lock = threading.Lock()
+        # (expires_at, key) min-heap. Overwritten, evicted or deleted keys leave
+        # stale heap items behind; they are skipped when they reach the top, and
+        # the heap is rebuilt from live entries once they outnumber them
+        self._expiry_heap: List[Tuple[float, str]] = []
+        self.bytes_in_use = 0
         self.hits = 0
         self.misses = 0
         self.evictions = 0
+        self.expirations = 0
+        self.rejected_oversize = 0  # Values larger than the whole byte budget
+        self.coalesced = 0  # Misses served by another caller's in-flight computation
+        self.coalesce_timeouts = 0
+        self.stale_hits = 0  # Hits served past the soft TTL
+        self.stale_age_total = 0.0
+        self.stale_age_max = 0.0
+        self.refreshes = 0  # Background refresh outcomes
+        self.refresh_failures = 0
+        self.refresh_discarded = 0
 
     def get(self, key: str) -> Optional[Any]:
         """Get a value from the cache"""
+        return self.get_with_staleness(key)[0]
+
+    def get_with_staleness(self, key: str) -> Tuple[Optional[Any], float]:
+        """Get (value, seconds past soft TTL) for a key, or (None, 0)"""
         with self.lock:
             if key in self.cache:
                 entry = self.cache[key]
-                if not entry.is_expired():
+                now = time.time()
+                if not entry.is_expired(now):
                     # Move to end (most recently used)
                     self.cache.move_to_end(key)
                     self.hits += 1
-                    return entry.value
+                    return entry.value, entry.stale_age(now)
                 else:
                     # Remove expired entry
-                    del self.cache[key]
-                    self.evictions += 1
+                    self._remove(key)
+                    self.expirations += 1
 
             self.misses += 1
-            return None
+            return None, 0.0
+
+    def set(self, key: str, value: Any, ttl_seconds: int = 300, stale_seconds: float = 0) -> None:
+        """Set a value in the cache, servable stale for stale_seconds past its TTL"""
+        # Size the value outside the lock; large graph payloads take a while to walk
+        size_bytes = estimate_size(value) if self.max_bytes is not None else 0
 
-    def set(self, key: str, value: Any, ttl_seconds: int = 300) -> None:
-        """Set a value in the cache"""
         with self.lock:
             # Remove if already exists
             if key in self.cache:
-                del self.cache[key]
+                self._remove(key)
+
+            if self.max_bytes is not None and size_bytes > self.max_bytes:
+                self.rejected_oversize += 1
+                logger.debug("Not caching %s: %d bytes exceeds budget of %d", key, size_bytes, self.max_bytes)
+                return
 
             # Add new entry
-            self.cache[key] = CacheEntry(value, ttl_seconds)
+            entry = CacheEntry(value, ttl_seconds, size_bytes, stale_seconds)
+            self.cache[key] = entry
+            self.bytes_in_use += size_bytes
+            heapq.heappush(self._expiry_heap, (entry.expires_at, key))
 
-            # Evict if over capacity
-            if len(self.cache) > self.max_size:
-                # Remove least recently used (first item)
-                evicted_key, _ = self.cache.popitem(last=False)
+            # Evict least recently used (first items) until within both limits
+            while len(self.cache) > self.max_size or (
+                self.max_bytes is not None and self.bytes_in_use > self.max_bytes
+            ):
+                evicted_key = next(iter(self.cache))
+                self._remove(evicted_key)
                 self.evictions += 1
                 logger.debug("Evicted cache key: %s", evicted_key)
 
+            self._compact_expiry_heap()
+
+    def _compact_expiry_heap(self) -> None:
+        """Rebuild the expiry heap from live entries when stale items dominate; caller must hold the lock"""
+        # Amortized O(1) per set: a rebuild costs O(n) and only happens after n stale pushes
+        if len(self._expiry_heap) > 2 * len(self.cache) + 64:
+            self._expiry_heap = [(entry.expires_at, key) for key, entry in self.cache.items()]
+            heapq.heapify(self._expiry_heap)
+
+    def __contains__(self, key: str) -> bool:
+        """Check for a live entry without touching recency or statistics"""
+        with self.lock:
+            entry = self.cache.get(key)
+            return entry is not None and not entry.is_expired()
+
+    def _remove(self, key: str) -> CacheEntry:
+        """Remove an entry and release its bytes; caller must hold the lock"""
+        entry = self.cache.pop(key)
+        self.bytes_in_use -= entry.size_bytes
+        return entry
+
     def delete(self, key: str) -> bool:
         """Delete a key from the cache"""
         with self.lock:
             if key in self.cache:
-                del self.cache[key]
+                self._remove(key)
                 return True
             return False
 
@@ -114,9 +230,46 @@ class LRUCache:
         """Clear all cache entries"""
         with self.lock:
             self.cache.clear()
+            self._expiry_heap.clear()
+            self.bytes_in_use = 0
+            self.rejected_oversize = 0
             self.hits = 0
             self.misses = 0
             self.evictions = 0
+            self.expirations = 0
+            self.coalesced = 0
+            self.coalesce_timeouts = 0
+            self.stale_hits = 0
+            self.stale_age_total = 0.0
+            self.stale_age_max = 0.0
+            self.refreshes = 0
+            self.refresh_failures = 0
+            self.refresh_discarded = 0
+
+    def record_coalesced(self, key: str, timed_out: bool = False) -> None:
+        """Count a miss on key that waited on another caller's in-flight computation"""
+        with self.lock:
+            if timed_out:
+                self.coalesce_timeouts += 1
+            else:
+                self.coalesced += 1
+
+    def record_stale_hit(self, key: str, stale_age: float) -> None:
+        """Count a hit on key served past its soft TTL, and how stale it was"""
+        with self.lock:
+            self.stale_hits += 1
+            self.stale_age_total += stale_age
+            self.stale_age_max = max(self.stale_age_max, stale_age)
+
+    def record_refresh(self, key: str, outcome: str) -> None:
+        """Count a background refresh outcome for key: refreshed, failed or discarded"""
+        with self.lock:
+            if outcome == "refreshed":
+                self.refreshes += 1
+            elif outcome == "failed":
+                self.refresh_failures += 1
+            else:
+                self.refresh_discarded += 1
 
     def get_stats(self) -> Dict[str, Any]:
         """Get cache statistics"""
@@ -127,49 +280,356 @@ class LRUCache:
             return {
                 "size": len(self.cache),
                 "max_size": self.max_size,
+                "bytes_in_use": self.bytes_in_use,
+                "max_bytes": self.max_bytes,
+                "rejected_oversize": self.rejected_oversize,
                 "hits": self.hits,
                 "misses": self.misses,
                 "evictions": self.evictions,
+                "expirations": self.expirations,
+                "coalesced": self.coalesced,
+                "coalesce_timeouts": self.coalesce_timeouts,
+                "stale_hits": self.stale_hits,
+                "stale_age_avg_seconds": round(self.stale_age_total / self.stale_hits, 3) if self.stale_hits else 0,
+                "stale_age_max_seconds": round(self.stale_age_max, 3),
+                "refreshes": self.refreshes,
+                "refresh_failures": self.refresh_failures,
+                "refresh_discarded": self.refresh_discarded,
                 "hit_rate_percent": round(hit_rate, 2),
                 "total_requests": total_requests
             }
 
-    def cleanup_expired(self) -> int:
-        """Remove all expired entries, return count removed"""
-        with self.lock:
-            expired_keys = []
-            for key, entry in self.cache.items():
-                if entry.is_expired():
-                    expired_keys.append(key)
+    def cleanup_expired(self, batch_size: int = 256) -> int:
+        """
+        Remove all expired entries, return count removed
+
+        Pops expired items off the expiry heap in batches of ``batch_size``,
+        releasing the lock between batches so readers are never stalled by
+        a sweep. Each removal is O(log n).
+        """
+        removed = 0
+        more = True
+        while more:
+            with self.lock:
+                now = time.time()
+                for _ in range(batch_size):
+                    if not self._expiry_heap or self._expiry_heap[0][0] > now:
+                        break
+                    expires_at, key = heapq.heappop(self._expiry_heap)
+                    entry = self.cache.get(key)
+                    # Skip stale heap items for keys since overwritten or deleted
+                    if entry is not None and entry.expires_at == expires_at:
+                        self._remove(key)
+                        self.expirations += 1
+                        removed += 1
+                more = bool(self._expiry_heap) and self._expiry_heap[0][0] <= now
+
+        if removed:
+            logger.debug("Cleaned up %d expired cache entries", removed)
+
+        return removed
+
+class StripedLRUCache:
+    """
+    Lock-striped LRU cache for multi-threaded access
+
+    Keys are sharded by hash across ``segments`` independent LRUCache
+    instances, each with its own lock and a 1/N share of the entry and byte
+    limits. Threads touching different segments never contend. Recency is
+    tracked per segment, so eviction is approximately (not exactly) global
+    LRU. Exposes the same interface as LRUCache.
+    """
+
+    def __init__(self, max_size: int = 1000, max_bytes: Optional[int] = None, segments: int = 8):
+        if segments < 1:
+            raise ValueError("segments must be at least 1")
+        self.max_size = max_size
+        self.max_bytes = max_bytes
+        self.segments = [
+            LRUCache(
+                max_size=max(1, max_size // segments),
+                max_bytes=max_bytes // segments if max_bytes is not None else None
+            )
+            for _ in range(segments)
+        ]
+
+    def _segment(self, key: str) -> LRUCache:
+        """Segment owning a key (stable across processes, unlike the salted str hash)"""
+        return self.segments[zlib.crc32(key.encode("utf-8")) % len(self.segments)]
+
+    def get(self, key: str) -> Optional[Any]:
+        """Get a value from the cache"""
+        return self._segment(key).get(key)
+
+    def get_with_staleness(self, key: str) -> Tuple[Optional[Any], float]:
+        """Get (value, seconds past soft TTL) for a key, or (None, 0)"""
+        return self._segment(key).get_with_staleness(key)
+
+    def set(self, key: str, value: Any, ttl_seconds: int = 300, stale_seconds: float = 0) -> None:
+        """Set a value in the cache, servable stale for stale_seconds past its TTL"""
+        self._segment(key).set(key, value, ttl_seconds, stale_seconds)
+
+    def delete(self, key: str) -> bool:
+        """Delete a key from the cache"""
+        return self._segment(key).delete(key)
+
+    def __contains__(self, key: str) -> bool:
+        """Check for a live entry without touching recency or statistics"""
+        return key in self._segment(key)
+
+    def clear(self) -> None:
+        """Clear all cache entries"""
+        for segment in self.segments:
+            segment.clear()
+
+    def record_coalesced(self, key: str, timed_out: bool = False) -> None:
+        """Count a miss on key that waited on another caller's in-flight computation"""
+        self._segment(key).record_coalesced(key, timed_out)
+
+    def record_stale_hit(self, key: str, stale_age: float) -> None:
+        """Count a hit on key served past its soft TTL, and how stale it was"""
+        self._segment(key).record_stale_hit(key, stale_age)
+
+    def record_refresh(self, key: str, outcome: str) -> None:
+        """Count a background refresh outcome for key: refreshed, failed or discarded"""
+        self._segment(key).record_refresh(key, outcome)
+
+    def cleanup_expired(self, batch_size: int = 256) -> int:
+        """Remove all expired entries, one segment at a time"""
+        return sum(segment.cleanup_expired(batch_size) for segment in self.segments)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics, summed across segments"""
+        segment_stats = [segment.get_stats() for segment in self.segments]
+
+        def total(field: str) -> int:
+            return sum(stats[field] for stats in segment_stats)
+
+        total_requests = total("total_requests")
+        hit_rate = (total("hits") / total_requests * 100) if total_requests > 0 else 0
+        stale_hits = total("stale_hits")
+        stale_age_total = sum(segment.stale_age_total for segment in self.segments)
+
+        return {
+            "size": total("size"),
+            "max_size": self.max_size,
+            "bytes_in_use": total("bytes_in_use"),
+            "max_bytes": self.max_bytes,
+            "rejected_oversize": total("rejected_oversize"),
+            "hits": total("hits"),
+            "misses": total("misses"),
+            "evictions": total("evictions"),
+            "expirations": total("expirations"),
+            "coalesced": total("coalesced"),
+            "coalesce_timeouts": total("coalesce_timeouts"),
+            "stale_hits": stale_hits,
+            "stale_age_avg_seconds": round(stale_age_total / stale_hits, 3) if stale_hits else 0,
+            "stale_age_max_seconds": max(stats["stale_age_max_seconds"] for stats in segment_stats),
+            "refreshes": total("refreshes"),
+            "refresh_failures": total("refresh_failures"),
+            "refresh_discarded": total("refresh_discarded"),
+            "hit_rate_percent": round(hit_rate, 2),
+            "total_requests": total_requests,
+            "segments": len(self.segments)
+        }
+
+class TieredCache:
+    """
+    In-process cache backed by a shared tier visible to every worker process
+
+    Reads try the local cache first, then the shared tier; shared hits are
+    promoted into the local cache for their remaining soft and hard TTL.
+    Writes, deletes and clears go to both tiers. Exposes the same interface
+    as LRUCache, plus get_with_staleness_async/set_async that do the shared
+    tier I/O off the event loop (used by CacheService.get_or_compute).
+    """
+
+    def __init__(self, local, shared, namespace: str):
+        self.local = local
+        self.shared = shared
+        self.namespace = namespace
+        self.shared_hits = 0
+        self.shared_misses = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        """Get a value from the local tier, falling back to the shared tier"""
+        return self.get_with_staleness(key)[0]
+
+    def get_with_staleness(self, key: str) -> Tuple[Optional[Any], float]:
+        """Get (value, seconds past soft TTL) for a key, or (None, 0)"""
+        value, stale_age = self.local.get_with_staleness(key)
+        if value is not None:
+            return value, stale_age
+
+        return self._promote(key, self.shared.get(self.namespace, key))
+
+    async def get_with_staleness_async(self, key: str) -> Tuple[Optional[Any], float]:
+        """get_with_staleness with the shared tier read in the shared executor"""
+        value, stale_age = self.local.get_with_staleness(key)
+        if value is not None:
+            return value, stale_age
+        return self._promote(key, await run_in_shared_executor(self.shared.get, self.namespace, key))
+
+    def _promote(self, key: str, found: Optional[Tuple[Any, float, float]]) -> Tuple[Optional[Any], float]:
+        """Copy a shared tier hit into the local tier, return (value, seconds past soft TTL)"""
+        if found is None:
+            self.shared_misses += 1
+            return None, 0.0
+
+        self.shared_hits += 1
+        value, expires_at, fresh_until = found
+        now = time.time()
+        if expires_at > now:
+            self.local.set(key, value, max(fresh_until - now, 0), expires_at - max(fresh_until, now))
+        return value, max(0.0, now - fresh_until)
+
+    def set(self, key: str, value: Any, ttl_seconds: int = 300, stale_seconds: float = 0) -> None:
+        """Set a value in both tiers, servable stale for stale_seconds past its TTL"""
+        self.local.set(key, value, ttl_seconds, stale_seconds)
+        self._set_shared(key, value, ttl_seconds, stale_seconds)
+
+    async def set_async(self, key: str, value: Any, ttl_seconds: int = 300, stale_seconds: float = 0) -> None:
+        """set with encoding and the shared tier write in the shared executor"""
+        self.local.set(key, value, ttl_seconds, stale_seconds)
+        await run_in_shared_executor(self._set_shared, key, value, ttl_seconds, stale_seconds)
+
+    def _set_shared(self, key: str, value: Any, ttl_seconds: float, stale_seconds: float) -> None:
+        blob = encode_value(value)
+        if blob is not None:
+            self.shared.set(self.namespace, key, blob, ttl_seconds, stale_seconds)
+
+    def delete(self, key: str) -> bool:
+        """Delete a key from both tiers"""
+        self.shared.delete(self.namespace, key)
+        return self.local.delete(key)
+
+    def __contains__(self, key: str) -> bool:
+        """Check the local tier for a live entry"""
+        return key in self.local
+
+    def clear(self) -> None:
+        """Clear both tiers for this cache"""
+        self.local.clear()
+        self.shared.clear(self.namespace)
+        self.shared_hits = 0
+        self.shared_misses = 0
+
+    def record_coalesced(self, key: str, timed_out: bool = False) -> None:
+        """Count a miss on key that waited on another caller's in-flight computation"""
+        self.local.record_coalesced(key, timed_out)
+
+    def record_stale_hit(self, key: str, stale_age: float) -> None:
+        """Count a hit on key served past its soft TTL, and how stale it was"""
+        self.local.record_stale_hit(key, stale_age)
 
-            for key in expired_keys:
-                del self.cache[key]
+    def record_refresh(self, key: str, outcome: str) -> None:
+        """Count a background refresh outcome for key: refreshed, failed or discarded"""
+        self.local.record_refresh(key, outcome)
 
-            if expired_keys:
-                logger.debug("Cleaned up %d expired cache entries", len(expired_keys))
+    def cleanup_expired(self, batch_size: int = 256) -> int:
+        """Remove expired local entries; the shared tier is swept by CacheService"""
+        return self.local.cleanup_expired(batch_size)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get local cache statistics plus shared tier hits and misses"""
+        stats = self.local.get_stats()
+        stats["shared_hits"] = self.shared_hits
+        stats["shared_misses"] = self.shared_misses
+        return stats
 
-            return len(expired_keys)
+# Result handed to single-flight waiters when the computing caller was cancelled
+_ABANDONED = object()
 
 class CacheService:
     """Main cache service with multiple cache instances for different types of data"""
 
     def __init__(self):
-        # Separate caches for different types of data
-        self.search_cache = LRUCache(max_size=500)  # Search results
-        self.embedding_cache = LRUCache(max_size=200)  # Embeddings
-        self.vector_cache = LRUCache(max_size=300)  # Vector search results
-        self.integrated_cache = LRUCache(max_size=100)  # Integrated search results
+        # Separate caches for different types of data, each with a byte budget
+        # (CACHE_MAX_MB_<TYPE>) so a few huge payloads cannot exhaust memory.
+        # CACHE_SEGMENTS > 1 switches to lock-striped caches for threaded access.
+        # Result caches are also backed by the cross-worker shared tier when one is
+        # configured; embeddings already persist across workers in the embedding store.
+        segments = int(os.getenv("CACHE_SEGMENTS", "1"))
+        self.shared_tier = create_shared_cache()
+        self.search_cache = self._create_cache("search", 500, self._budget_bytes("SEARCH", 64), segments)  # Search results
+        self.embedding_cache = self._create_cache(None, 200, self._budget_bytes("EMBEDDING", 16), segments)  # Embeddings
+        self.vector_cache = self._create_cache("vector", 300, self._budget_bytes("VECTOR", 32), segments)  # Vector search results
+        self.integrated_cache = self._create_cache("integrated", 100, self._budget_bytes("INTEGRATED", 64), segments)  # Integrated search results
 
-        # Default TTL values (in seconds)
+        # Default TTL values (in seconds), overridable per cache via CACHE_TTL_<TYPE>
         self.default_ttl = {
-            "search": 300,      # 5 minutes for search results
-            "embedding": 3600,  # 1 hour for embeddings
-            "vector": 600,      # 10 minutes for vector results
-            "integrated": 300   # 5 minutes for integrated results
+            "search": int(os.getenv("CACHE_TTL_SEARCH", "300")),          # 5 minutes for search results
+            "embedding": int(os.getenv("CACHE_TTL_EMBEDDING", "3600")),   # 1 hour for embeddings
+            "vector": int(os.getenv("CACHE_TTL_VECTOR", "600")),          # 10 minutes for vector results
+            "integrated": int(os.getenv("CACHE_TTL_INTEGRATED", "300"))   # 5 minutes for integrated results
         }
 
+        # Stale-while-revalidate window past the TTL, overridable via CACHE_STALE_<TYPE>.
+        # Within it a hit is served immediately and refreshed once in the background.
+        self.default_stale = {
+            "search": int(os.getenv("CACHE_STALE_SEARCH", "300")),
+            "embedding": int(os.getenv("CACHE_STALE_EMBEDDING", "0")),
+            "vector": int(os.getenv("CACHE_STALE_VECTOR", "0")),
+            "integrated": int(os.getenv("CACHE_STALE_INTEGRATED", "300"))
+        }
+
+        # Single-flight: futures for computations currently running, by (cache type, key)
+        self._in_flight: Dict[Tuple[str, str], asyncio.Future] = {}
+        self.single_flight_timeout = float(os.getenv("CACHE_SINGLE_FLIGHT_TIMEOUT", "60"))
+        # Background stale-while-revalidate refreshes by (cache type, key); also keeps
+        # the tasks referenced so they are not garbage collected mid-flight
+        self._refresh_tasks: Dict[Tuple[str, str], asyncio.Task] = {}
+
+        # Background expiry sweeper, started from the application lifespan
+        self._sweeper_task: Optional[asyncio.Task] = None
+
+        # Dependency tags: scope -> {(cache type, key)}, evicted on invalidation events.
+        # Generations let in-flight computations detect an invalidation that raced them;
+        # the shared tier keeps cross-worker generations that are folded into tagged keys.
+        self._tag_index: Dict[str, Set[Tuple[str, str]]] = {}
+        self._tag_generation: Dict[str, int] = {}
+        self._tag_lock = threading.Lock()
+        # Shared generations read recently: scope -> (generation, monotonic read time).
+        # Reused for CACHE_GENERATION_TTL seconds so a local hit needs no shared round trip;
+        # that is also how long another worker's invalidation can take to be seen here.
+        self._shared_generations: Dict[str, Tuple[int, float]] = {}
+        self.generation_ttl = float(os.getenv("CACHE_GENERATION_TTL", "1"))
+        # Generation bumps running in the shared executor, by scope
+        self._pending_bumps: Dict[str, asyncio.Future] = {}
+        self._max_tagged_keys = 2 * (500 + 200 + 300 + 100)
+        self.invalidated: Dict[str, int] = {}
+        get_invalidation_bus().subscribe(self._on_invalidation)
+
         logger.info("Cache service initialized with separate caches for different data types")
 
+    def _create_cache(self, shared_namespace: Optional[str], max_size: int, max_bytes: int, segments: int):
+        """Create a plain or lock-striped LRU cache, tiered over the shared cache if enabled"""
+        if segments > 1:
+            cache = StripedLRUCache(max_size=max_size, max_bytes=max_bytes, segments=segments)
+        else:
+            cache = LRUCache(max_size=max_size, max_bytes=max_bytes)
+
+        if shared_namespace and self.shared_tier is not None:
+            return TieredCache(cache, self.shared_tier, shared_namespace)
+        return cache
+
+    @staticmethod
+    def _budget_bytes(cache_type: str, default_mb: int) -> int:
+        """Byte budget for a cache from CACHE_MAX_MB_<TYPE>"""
+        return int(float(os.getenv(f"CACHE_MAX_MB_{cache_type}", str(default_mb))) * 1024 * 1024)
+
+    def get_cache(self, cache_type: str):
+        """Get the cache instance for a data type (search, embedding, vector, integrated)"""
+        caches = {
+            "search": self.search_cache,
+            "embedding": self.embedding_cache,
+            "vector": self.vector_cache,
+            "integrated": self.integrated_cache
+        }
+        if cache_type not in caches:
+            raise ValueError(f"Unknown cache type: {cache_type}")
+        return caches[cache_type]
+
     def _generate_cache_key(self, operation: str, params: Dict[str, Any]) -> str:
         """Generate a consistent cache key from operation and parameters"""
         # Sort parameters for consistent key generation
@@ -202,15 +662,16 @@ class CacheService:
         ttl = ttl_seconds or self.default_ttl["search"]
         self.search_cache.set(cache_key, result, ttl)
 
-    def get_embedding(self, text: str) -> Optional[Any]:
+    def get_embedding(self, text: str, model: str = "") -> Optional[Any]:
         """Get cached embedding"""
-        params = {"text": text}
+        params = {"text": text, "model": model}
         cache_key = self._generate_cache_key("embedding", params)
         return self.embedding_cache.get(cache_key)
 
-    def set_embedding(self, text: str, embedding: Any, ttl_seconds: Optional[int] = None) -> None:
+    def set_embedding(self, text: str, embedding: Any, model: str = "",
+                      ttl_seconds: Optional[int] = None) -> None:
         """Cache embedding"""
-        params = {"text": text}
+        params = {"text": text, "model": model}
         cache_key = self._generate_cache_key("embedding", params)
         ttl = ttl_seconds or self.default_ttl["embedding"]
         self.embedding_cache.set(cache_key, embedding, ttl)
@@ -249,6 +710,240 @@ class CacheService:
         ttl = ttl_seconds or self.default_ttl["integrated"]
         self.integrated_cache.set(cache_key, result, ttl)
 
+    async def get_or_compute(self, cache_type: str, cache_key: str,
+                             compute: Callable[[], Awaitable[Any]],
+                             ttl_seconds: Optional[int] = None,
+                             should_cache: Optional[Callable[[Any], bool]] = None,
+                             wait_timeout: Optional[float] = None,
+                             tags: Iterable[str] = (),
+                             stale_seconds: Optional[float] = None) -> Any:
+        """
+        Get a cached value, computing it at most once across concurrent callers
+
+        The first caller to miss runs ``compute``; callers that miss on the same
+        key while it runs await that result instead of recomputing. A waiter
+        that is not served within ``wait_timeout`` seconds computes on its own.
+
+        An entry past its TTL but within ``stale_seconds`` more is returned
+        immediately, and a single background refresh is started for it.
+
+        Args:
+            cache_type: Which cache to use (search, embedding, vector, integrated)
+            cache_key: Key within that cache
+            compute: Coroutine function producing the value on a miss
+            ttl_seconds: Entry TTL; defaults to the cache type's default TTL
+            should_cache: Predicate on the result; rejected results are not stored
+            wait_timeout: Max seconds a waiter blocks; defaults to single_flight_timeout
+            tags: Invalidation scopes the value depends on (see invalidation_bus)
+            stale_seconds: Stale-while-revalidate window; defaults to the cache
+                type's default (0 disables it)
+
+        Returns:
+            The cached or freshly computed value
+        """
+        cache = self.get_cache(cache_type)
+        ttl = ttl_seconds or self.default_ttl[cache_type]
+        stale = self.default_stale[cache_type] if stale_seconds is None else stale_seconds
+        tags = tuple(tags)
+
+        if tags and isinstance(cache, TieredCache):
+            # Other workers bump the shared generations when they see a mutation;
+            # keying on them retires entries cached before it in every worker
+            generations = await self._get_shared_generations(tags)
+            if generations is None:
+                # Can't tell whether cached entries are still current
+                return await compute()
+            cache_key = f"{cache_key}@" + ".".join(str(generations[tag]) for tag in tags)
+
+        if isinstance(cache, TieredCache):
+            value, stale_age = await cache.get_with_staleness_async(cache_key)
+        else:
+            value, stale_age = cache.get_with_staleness(cache_key)
+        if value is not None:
+            if stale_age > 0:
+                cache.record_stale_hit(cache_key, stale_age)
+                self._start_refresh(cache_type, cache_key, compute, ttl, stale, should_cache, tags)
+            return value
+
+        flight_key = (cache_type, cache_key)
+        flight = self._in_flight.get(flight_key)
+        if flight is not None:
+            timeout = self.single_flight_timeout if wait_timeout is None else wait_timeout
+            try:
+                result = await asyncio.wait_for(asyncio.shield(flight), timeout)
+                if result is not _ABANDONED:
+                    cache.record_coalesced(cache_key)
+                    return result
+            except asyncio.TimeoutError:
+                cache.record_coalesced(cache_key, timed_out=True)
+                logger.warning("Timed out waiting for in-flight computation of %s", cache_key)
+            return await compute()
+
+        value, _ = await self._compute_and_store(cache_type, cache_key, compute, ttl, stale, should_cache, tags)
+        return value
+
+    async def _compute_and_store(self, cache_type: str, cache_key: str,
+                                 compute: Callable[[], Awaitable[Any]], ttl: float, stale: float,
+                                 should_cache: Optional[Callable[[Any], bool]],
+                                 tags: Tuple[str, ...]) -> Tuple[Any, bool]:
+        """Run compute as the single-flight leader for a key, return (value, stored)"""
+        flight_key = (cache_type, cache_key)
+        flight = asyncio.get_running_loop().create_future()
+        # Mark the exception as retrieved even when nobody waited on it
+        flight.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._in_flight[flight_key] = flight
+        generations = self._tag_generations(tags)
+        try:
+            value = await compute()
+            stored = False
+            if value is not None and (should_cache is None or should_cache(value)):
+                # Data the value depends on changed mid-computation: don't cache it
+                if self._tag_generations(tags) == generations:
+                    # Tag before the (awaited) shared write so an invalidation during it still evicts
+                    self.tag(cache_type, cache_key, tags)
+                    cache = self.get_cache(cache_type)
+                    if isinstance(cache, TieredCache):
+                        await cache.set_async(cache_key, value, ttl, stale)
+                    else:
+                        cache.set(cache_key, value, ttl, stale)
+                    stored = True
+            flight.set_result(value)
+            return value, stored
+        except asyncio.CancelledError:
+            # Leader went away; let waiters compute for themselves
+            flight.set_result(_ABANDONED)
+            raise
+        except Exception as e:
+            flight.set_exception(e)
+            raise
+        finally:
+            self._in_flight.pop(flight_key, None)
+
+    def _start_refresh(self, cache_type: str, cache_key: str,
+                       compute: Callable[[], Awaitable[Any]], ttl: float, stale: float,
+                       should_cache: Optional[Callable[[Any], bool]],
+                       tags: Tuple[str, ...]) -> None:
+        """Refresh a stale entry in the background unless it is already being computed"""
+        flight_key = (cache_type, cache_key)
+        if flight_key in self._in_flight or flight_key in self._refresh_tasks:
+            return
+
+        cache = self.get_cache(cache_type)
+
+        async def refresh():
+            try:
+                _, stored = await self._compute_and_store(
+                    cache_type, cache_key, compute, ttl, stale, should_cache, tags
+                )
+                cache.record_refresh(cache_key, "refreshed" if stored else "discarded")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # The stale value stays in place until its hard TTL
+                cache.record_refresh(cache_key, "failed")
+                logger.warning(f"Background refresh of {cache_key} failed: {e}")
+
+        task = asyncio.get_running_loop().create_task(refresh())
+        self._refresh_tasks[flight_key] = task
+        task.add_done_callback(lambda _: self._refresh_tasks.pop(flight_key, None))
+
+    async def _get_shared_generations(self, tags: Tuple[str, ...]) -> Optional[Dict[str, int]]:
+        """Cross-worker generation of each tag, or None if the shared tier can't be read"""
+        loop = asyncio.get_running_loop()
+        pending = [self._pending_bumps[tag] for tag in tags
+                   if tag in self._pending_bumps and self._pending_bumps[tag].get_loop() is loop]
+        if pending:
+            # This worker just invalidated a tag: don't read the generation from before the bump
+            await asyncio.gather(*(asyncio.shield(bump) for bump in pending), return_exceptions=True)
+
+        now = time.monotonic()
+        with self._tag_lock:
+            known = {tag: self._shared_generations[tag][0] for tag in tags
+                     if tag in self._shared_generations and now - self._shared_generations[tag][1] < self.generation_ttl}
+        if len(known) == len(tags):
+            return known
+
+        generations = await run_in_shared_executor(self.shared_tier.get_generations, tags)
+        if generations is not None:
+            for tag, generation in generations.items():
+                self._remember_generation(tag, generation, now)
+        return generations
+
+    def _remember_generation(self, scope: str, generation: Optional[int], read_at: float) -> None:
+        with self._tag_lock:
+            if generation is None:
+                self._shared_generations.pop(scope, None)
+                return
+            # Generations only grow; a read that raced a bump must not roll it back
+            previous = self._shared_generations.get(scope, (0, 0.0))[0]
+            self._shared_generations[scope] = (max(generation, previous), read_at)
+
+    def _bump_shared_generation(self, scope: str) -> None:
+        """Retire the scope's shared entries for every worker, without blocking the event loop"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Called from a worker thread (e.g. a Neo4j query thread): blocking is fine here
+            self._remember_generation(scope, self.shared_tier.bump_generation(scope), time.monotonic())
+            return
+
+        bump = run_in_shared_executor(self.shared_tier.bump_generation, scope)
+        self._pending_bumps[scope] = bump
+
+        def bumped(future: asyncio.Future) -> None:
+            if self._pending_bumps.get(scope) is future:
+                del self._pending_bumps[scope]
+            generation = None if future.cancelled() or future.exception() else future.result()
+            self._remember_generation(scope, generation, time.monotonic())
+
+        bump.add_done_callback(bumped)
+
+    def _tag_generations(self, tags: Tuple[str, ...]) -> Tuple[int, ...]:
+        """Current invalidation generation of each tag"""
+        with self._tag_lock:
+            return tuple(self._tag_generation.get(tag, 0) for tag in tags)
+
+    def tag(self, cache_type: str, cache_key: str, tags: Iterable[str]) -> None:
+        """Register a cache entry as depending on the given invalidation scopes"""
+        with self._tag_lock:
+            for tag in tags:
+                keys = self._tag_index.setdefault(tag, set())
+                keys.add((cache_type, cache_key))
+                if len(keys) > self._max_tagged_keys:
+                    # Drop entries that were evicted or expired since they were tagged
+                    self._tag_index[tag] = {
+                        (ct, key) for ct, key in keys if key in self.get_cache(ct)
+                    }
+
+    def invalidate(self, scope: str) -> int:
+        """Evict every cache entry tagged with a scope, return count evicted locally"""
+        if self.shared_tier is not None:
+            # Retires the scope's shared entries for every worker, including ones this process never tagged
+            self._bump_shared_generation(scope)
+
+        with self._tag_lock:
+            self._tag_generation[scope] = self._tag_generation.get(scope, 0) + 1
+            keys = self._tag_index.pop(scope, set())
+
+        removed = 0
+        for cache_type, cache_key in keys:
+            if self.get_cache(cache_type).delete(cache_key):
+                removed += 1
+
+        self.invalidated[scope] = self.invalidated.get(scope, 0) + removed
+        if removed:
+            logger.info("Invalidated %d cache entries for scope '%s'", removed, scope)
+        return removed
+
+    def _on_invalidation(self, event: Dict[str, Any]) -> None:
+        """Invalidation bus subscriber"""
+        self.invalidate(event["scope"])
+
+    def clear(self, cache_type: str) -> None:
+        """Clear a single cache"""
+        self.get_cache(cache_type).clear()
+        logger.info("Cache cleared: %s", cache_type)
+
     def clear_all(self) -> None:
         """Clear all caches"""
         self.search_cache.clear()
@@ -259,38 +954,37 @@ class CacheService:
 
     def get_stats(self) -> Dict[str, Any]:
         """Get comprehensive cache statistics"""
-        return {
+        stats = {
             "search_cache": self.search_cache.get_stats(),
             "embedding_cache": self.embedding_cache.get_stats(),
             "vector_cache": self.vector_cache.get_stats(),
-            "integrated_cache": self.integrated_cache.get_stats(),
-            "overall": {
-                "total_cached_items": (
-                    len(self.search_cache.cache) +
-                    len(self.embedding_cache.cache) +
-                    len(self.vector_cache.cache) +
-                    len(self.integrated_cache.cache)
-                ),
-                "total_hits": (
-                    self.search_cache.hits +
-                    self.embedding_cache.hits +
-                    self.vector_cache.hits +
-                    self.integrated_cache.hits
-                ),
-                "total_misses": (
-                    self.search_cache.misses +
-                    self.embedding_cache.misses +
-                    self.vector_cache.misses +
-                    self.integrated_cache.misses
-                ),
-                "total_evictions": (
-                    self.search_cache.evictions +
-                    self.embedding_cache.evictions +
-                    self.vector_cache.evictions +
-                    self.integrated_cache.evictions
-                )
-            }
+            "integrated_cache": self.integrated_cache.get_stats()
+        }
+
+        def total(field: str) -> int:
+            return sum(cache_stats[field] for cache_stats in stats.values())
+
+        stats["overall"] = {
+            "total_cached_items": total("size"),
+            "total_hits": total("hits"),
+            "total_misses": total("misses"),
+            "total_evictions": total("evictions"),
+            "total_expirations": total("expirations"),
+            "total_coalesced": total("coalesced"),
+            "total_stale_hits": total("stale_hits"),
+            "total_refreshes": total("refreshes"),
+            "total_refresh_failures": total("refresh_failures"),
+            "total_bytes_in_use": total("bytes_in_use"),
+            "in_flight": len(self._in_flight),
+            "refreshing": len(self._refresh_tasks)
         }
+        stats["shared_tier"] = self.shared_tier.get_stats() if self.shared_tier is not None else None
+        stats["invalidation"] = {
+            "evicted": dict(self.invalidated),
+            "tagged_keys": {tag: len(keys) for tag, keys in self._tag_index.items()},
+            "bus": get_invalidation_bus().get_stats()
+        }
+        return stats
 
     async def cleanup_expired_async(self) -> Dict[str, int]:
         """Async cleanup of expired entries across all caches"""
@@ -300,11 +994,50 @@ class CacheService:
                 "search": self.search_cache.cleanup_expired(),
                 "embedding": self.embedding_cache.cleanup_expired(),
                 "vector": self.vector_cache.cleanup_expired(),
-                "integrated": self.integrated_cache.cleanup_expired()
+                "integrated": self.integrated_cache.cleanup_expired(),
+                "shared": self.shared_tier.cleanup_expired() if self.shared_tier is not None else 0
             }
 
         return await asyncio.get_event_loop().run_in_executor(None, cleanup_all)
 
+    def start_sweeper(self, interval_seconds: Optional[float] = None) -> asyncio.Task:
+        """
+        Start a background task that sweeps expired entries periodically
+
+        Must be called from a running event loop (e.g. the FastAPI lifespan).
+        The interval defaults to CACHE_SWEEP_INTERVAL seconds.
+        """
+        if self._sweeper_task is not None and not self._sweeper_task.done():
+            return self._sweeper_task
+
+        interval = interval_seconds or float(os.getenv("CACHE_SWEEP_INTERVAL", "30"))
+
+        async def sweep_forever():
+            while True:
+                await asyncio.sleep(interval)
+                try:
+                    removed = await self.cleanup_expired_async()
+                    if any(removed.values()):
+                        logger.debug("Cache sweep removed expired entries: %s", removed)
+                except Exception as e:
+                    logger.error(f"Cache sweep failed: {e}")
+
+        self._sweeper_task = asyncio.get_running_loop().create_task(sweep_forever())
+        logger.info("Cache sweeper started (interval %ss)", interval)
+        return self._sweeper_task
+
+    async def stop_sweeper(self) -> None:
+        """Stop the background sweeper task"""
+        if self._sweeper_task is None:
+            return
+        self._sweeper_task.cancel()
+        try:
+            await self._sweeper_task
+        except asyncio.CancelledError:
+            pass
+        self._sweeper_task = None
+        logger.info("Cache sweeper stopped")
+
 # Global cache service instance
 _cache_service = None
 
@@ -313,4 +1046,70 @@ def get_cache_service() -> CacheService:
     global _cache_service
     if _cache_service is None:
         _cache_service = CacheService()
-    return _cache_service
\ No newline at end of file
+    return _cache_service
+
+def _normalize_cache_param(value: Any) -> Any:
+    """Normalize a parameter so equivalent requests share a cache key"""
+    if isinstance(value, str):
+        # Collapse runs of whitespace; "foo  bar " and "foo bar" are the same query
+        return " ".join(value.split())
+    if isinstance(value, dict):
+        return {str(k): _normalize_cache_param(v) for k, v in value.items() if v is not None}
+    if isinstance(value, (list, tuple)):
+        return [_normalize_cache_param(v) for v in value]
+    return value
+
+def cached(cache_type: str, ttl_seconds: Optional[int] = None,
+           should_cache: Optional[Callable[[Any], bool]] = None,
+           tags: Iterable[str] = (), stale_seconds: Optional[float] = None):
+    """
+    Decorator that caches the result of an async function in CacheService
+
+    The cache key is built from the function name and its normalized bound
+    arguments (``self`` excluded), so positional and keyword calls hit the
+    same entry. Concurrent misses are coalesced via get_or_compute. The
+    wrapper keeps the original signature for FastAPI.
+
+    Args:
+        cache_type: Which cache to use (search, embedding, vector, integrated)
+        ttl_seconds: Entry TTL; defaults to the cache type's default TTL
+        should_cache: Predicate on the result; results it rejects (e.g. error
+            payloads) are returned but not stored
+        tags: Invalidation scopes the result depends on; entries are evicted
+            when any of them is published on the invalidation bus
+        stale_seconds: Stale-while-revalidate window past the TTL; defaults
+            to the cache type's default (0 disables it)
+
+    Usage:
+        @cached("search", ttl_seconds=120, should_cache=lambda r: "error" not in r, tags=("solr",))
+        async def search(self, query, limit=20): ...
+    """
+    def decorator(func: Callable) -> Callable:
+        signature = inspect.signature(func)
+        operation = f"{cache_type}:{func.__qualname__}"
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            cache_service = get_cache_service()
+
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            params = {
+                name: _normalize_cache_param(value)
+                for name, value in bound.arguments.items()
+                if name not in ("self", "cls")
+            }
+            cache_key = cache_service._generate_cache_key(operation, params)
+
+            return await cache_service.get_or_compute(
+                cache_type,
+                cache_key,
+                lambda: func(*args, **kwargs),
+                ttl_seconds=ttl_seconds,
+                should_cache=should_cache,
+                tags=tags,
+                stale_seconds=stale_seconds
+            )
+
+        return wrapper
+    return decorator
@@ -0,0 +1,134 @@
+"""
+Circuit Breaker for NeoBoi Application
+
+Stops callers from piling up on a backend that is down. The breaker counts
+consecutive failures and moves through three states:
+
+- closed: requests go through; failure_threshold consecutive failures open it
+- open: requests are rejected immediately until reset_timeout has passed
+- half_open: one trial request goes through; success closes the breaker,
+  failure opens it again for another reset_timeout
+
+Usage:
+    breaker = CircuitBreaker("ollama", failure_threshold=5, reset_timeout=30)
+
+    if not breaker.allow_request():
+        return fail_fast()
+    try:
+        result = await call()
+    except TransportError:
+        breaker.record_failure()
+        raise
+    breaker.record_success()
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class CircuitBreaker:
+    """Thread-safe closed/open/half-open circuit breaker"""
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._stats = {"rejected": 0, "opened": 0, "last_failure": None, "last_opened": None}
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        # An open breaker becomes half-open once reset_timeout has passed
+        if self._state == OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+            self._state = HALF_OPEN
+            self._trial_in_flight = False
+            logger.info(f"Circuit breaker '{self.name}' half-open, allowing a trial request")
+        return self._state
+
+    def _open(self, reason: str) -> None:
+        if self._state != OPEN:
+            self._stats["opened"] += 1
+            self._stats["last_opened"] = time.time()
+            logger.warning(f"Circuit breaker '{self.name}' opened: {reason}")
+        self._state = OPEN
+        self._opened_at = self._clock()
+        self._trial_in_flight = False
+
+    def allow_request(self) -> bool:
+        """Whether a request may go through now (claims the trial slot when half-open)"""
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            self._stats["rejected"] += 1
+            return False
+
+    def record_success(self) -> None:
+        """The backend answered: close the breaker"""
+        with self._lock:
+            if self._state != CLOSED:
+                logger.info(f"Circuit breaker '{self.name}' closed")
+            self._state = CLOSED
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self, error: Optional[str] = None) -> None:
+        """The backend failed: open the breaker after enough consecutive failures"""
+        with self._lock:
+            self._failures += 1
+            self._stats["last_failure"] = error
+            if self._current_state() == HALF_OPEN:
+                self._open(f"trial request failed ({error})")
+            elif self._failures >= self.failure_threshold:
+                self._open(f"{self._failures} consecutive failures ({error})")
+
+    def release(self) -> None:
+        """A request ended without an outcome (e.g. cancelled): free the trial slot"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def trip(self, error: Optional[str] = None) -> None:
+        """Open the breaker now (e.g. a health check found the backend down)"""
+        with self._lock:
+            self._stats["last_failure"] = error
+            self._failures = max(self._failures, self.failure_threshold)
+            if self._current_state() != OPEN:
+                self._open(error or "tripped")
+
+    def get_state(self) -> Dict[str, Any]:
+        """State, failure count, seconds until the next trial and counters"""
+        with self._lock:
+            state = self._current_state()
+            retry_in = None
+            if state == OPEN:
+                retry_in = round(max(0.0, self.reset_timeout - (self._clock() - self._opened_at)), 1)
+            return {
+                "name": self.name,
+                "state": state,
+                "consecutive_failures": self._failures,
+                "failure_threshold": self.failure_threshold,
+                "reset_timeout_seconds": self.reset_timeout,
+                "retry_in_seconds": retry_in,
+                **self._stats
+            }
@@ -0,0 +1,9 @@
+"""
+Shared pytest setup for the backend tests
+"""
+import os
+import tempfile
+
+def pytest_configure(config):
+    # A fresh shared cache tier per run, so tests never read entries left by earlier runs
+    os.environ["CACHE_SQLITE_PATH"] = os.path.join(tempfile.mkdtemp(prefix="neoboi-tests-"), "cache.sqlite3")
@@ -0,0 +1,243 @@
+"""
+Persistent Embedding Store for NeoBoi Application
+
+Content-addressed store for sentence embeddings so identical text is never
+encoded twice, across requests and across restarts.
+
+Layout (one directory per embedding model):
+    <store_dir>/<model>/vectors.f32   - float32 rows, memory-mapped for reads
+    <store_dir>/<model>/index.jsonl   - append-only "text hash -> row" index
+    <store_dir>/<model>/meta.json     - model name and vector dimensions
+
+Keys are (model name, SHA-256 of the text). Rows are only ever appended, so a
+crash can at worst lose the tail of the index; orphaned rows are harmless. A
+torn (partial) row left at the end of the vectors file is truncated away on
+load and before every append, so later rows stay aligned.
+
+Usage:
+    from embedding_store import get_embedding_store
+
+    store = get_embedding_store("all-MiniLM-L6-v2")
+    vectors = store.get_or_encode(texts, lambda missing: model.encode(missing))
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process append only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STORE_DIR = os.getenv(
+    "EMBEDDING_STORE_DIR",
+    os.path.join(os.path.dirname(__file__), '..', 'embedding_store')
+)
+
+class EmbeddingStore:
+    """Append-only, memory-mapped embedding store for a single model"""
+
+    def __init__(self, model_name: str, store_dir: Optional[str] = None):
+        self.model_name = model_name
+        safe_name = re.sub(r'[^A-Za-z0-9_.-]', '_', model_name)
+        self.store_dir = os.path.join(store_dir or DEFAULT_STORE_DIR, safe_name)
+        self.vectors_path = os.path.join(self.store_dir, "vectors.f32")
+        self.index_path = os.path.join(self.store_dir, "index.jsonl")
+        self.meta_path = os.path.join(self.store_dir, "meta.json")
+
+        self.lock = threading.Lock()
+        self.index: Dict[str, int] = {}
+        self.dimensions: Optional[int] = None
+        self.rows = 0
+        self._mmap: Optional[np.memmap] = None
+        self._mapped_rows = 0
+
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(self.store_dir, exist_ok=True)
+        self._load()
+
+    @staticmethod
+    def text_key(text: str) -> str:
+        """Content hash used as the lookup key for a text"""
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def _truncate_torn_row(self, f) -> int:
+        """Cut a partial row off the end of the open vectors file; returns the row count"""
+        row_bytes = self.dimensions * 4
+        size = f.seek(0, os.SEEK_END)
+        if size % row_bytes:
+            logger.warning(f"Embedding store for '{self.model_name}' truncating a torn row ({size % row_bytes} bytes)")
+            f.truncate(size - size % row_bytes)
+        return size // row_bytes
+
+    def _load(self) -> None:
+        """Load metadata and index from disk"""
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                self.dimensions = json.load(f).get("dimensions")
+
+        if self.dimensions and os.path.exists(self.vectors_path):
+            with self.lock, open(self.vectors_path, "r+b") as f:
+                if fcntl is not None:
+                    # A writer in another process holds this lock while appending
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    self.rows = self._truncate_torn_row(f)
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(f, fcntl.LOCK_UN)
+
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Torn write at the tail of the index
+                        continue
+                    if entry.get("row", self.rows) < self.rows:
+                        self.index[entry["key"]] = entry["row"]
+
+        logger.info(f"Embedding store for '{self.model_name}' loaded with {len(self.index)} vectors")
+
+    def _vectors(self) -> Optional[np.memmap]:
+        """Return a memory map covering every written row, remapping after appends"""
+        if self.rows == 0 or not self.dimensions:
+            return None
+        if self._mmap is None or self._mapped_rows != self.rows:
+            self._mmap = np.memmap(self.vectors_path, dtype=np.float32, mode="r",
+                                   shape=(self.rows, self.dimensions))
+            self._mapped_rows = self.rows
+        return self._mmap
+
+    def get(self, text: str) -> Optional[np.ndarray]:
+        """Get the stored embedding for a text, or None"""
+        key = self.text_key(text)
+        with self.lock:
+            row = self.index.get(key)
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return np.array(self._vectors()[row])
+
+    def put_many(self, texts: Sequence[str], vectors: Any) -> None:
+        """Append embeddings for texts that are not stored yet"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2 or len(texts) != vectors.shape[0]:
+            raise ValueError("Expected one embedding row per text")
+
+        with self.lock:
+            if self.dimensions is None:
+                self.dimensions = int(vectors.shape[1])
+                with open(self.meta_path, "w", encoding="utf-8") as f:
+                    json.dump({"model": self.model_name, "dimensions": self.dimensions}, f)
+            elif vectors.shape[1] != self.dimensions:
+                raise ValueError(
+                    f"Embedding has {vectors.shape[1]} dimensions, store expects {self.dimensions}"
+                )
+
+            new_rows: Dict[str, np.ndarray] = {}
+            for text, vector in zip(texts, vectors):
+                key = self.text_key(text)
+                if key not in self.index and key not in new_rows:
+                    new_rows[key] = vector
+
+            if not new_rows:
+                return
+
+            with open(self.vectors_path, "ab") as f:
+                if fcntl is not None:
+                    # Other worker processes may append to the same store
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    first_row = self._truncate_torn_row(f)
+                    # Vectors first, index second: an index line never points past the data
+                    f.write(np.stack(list(new_rows.values())).astype(np.float32).tobytes())
+                    f.flush()
+                    with open(self.index_path, "a", encoding="utf-8") as index_file:
+                        for offset, key in enumerate(new_rows):
+                            index_file.write(json.dumps({"key": key, "row": first_row + offset}) + "\n")
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(f, fcntl.LOCK_UN)
+
+            for offset, key in enumerate(new_rows):
+                self.index[key] = first_row + offset
+            self.rows = first_row + len(new_rows)
+
+    def get_or_encode(self, texts: Sequence[str],
+                      encode_fn: Callable[[List[str]], Any]) -> np.ndarray:
+        """
+        Return embeddings for texts, encoding only the ones not already stored
+
+        Args:
+            texts: Texts to embed
+            encode_fn: Called with the list of missing (deduplicated) texts,
+                must return one embedding row per text
+
+        Returns:
+            Array of shape (len(texts), dimensions)
+        """
+        if not texts:
+            return np.zeros((0, self.dimensions or 0), dtype=np.float32)
+
+        found: Dict[str, np.ndarray] = {}
+        missing: List[str] = []
+        seen = set()
+        for text in texts:
+            if text in seen:
+                continue
+            seen.add(text)
+            vector = self.get(text)
+            if vector is None:
+                missing.append(text)
+            else:
+                found[text] = vector
+
+        if missing:
+            encoded = np.asarray(encode_fn(missing), dtype=np.float32)
+            self.put_many(missing, encoded)
+            for text, vector in zip(missing, encoded):
+                found[text] = vector
+            logger.debug(f"Encoded {len(missing)} new texts, reused {len(texts) - len(missing)}")
+
+        return np.stack([found[text] for text in texts])
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get embedding store statistics"""
+        with self.lock:
+            total_requests = self.hits + self.misses
+            hit_rate = (self.hits / total_requests * 100) if total_requests > 0 else 0
+
+            return {
+                "model": self.model_name,
+                "vectors": len(self.index),
+                "dimensions": self.dimensions,
+                "bytes_on_disk": self.rows * (self.dimensions or 0) * 4,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate_percent": round(hit_rate, 2)
+            }
+
+# Global embedding stores, one per model
+_embedding_stores: Dict[str, EmbeddingStore] = {}
+_embedding_stores_lock = threading.Lock()
+
+def get_embedding_store(model_name: str) -> EmbeddingStore:
+    """Get the global embedding store for a model"""
+    with _embedding_stores_lock:
+        if model_name not in _embedding_stores:
+            _embedding_stores[model_name] = EmbeddingStore(model_name)
+        return _embedding_stores[model_name]
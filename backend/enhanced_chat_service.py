@@ -8,7 +8,7 @@ import logging
 from typing import Dict, Any, Optional
 from datetime import datetime
 
-from backend.unstructured_pipeline.llm_service import OfflineLLMService
+from backend.unstructured_pipeline.llm_service import get_llm_service
 from backend.neo4j_service import Neo4jService
 
 logger = logging.getLogger(__name__)
@@ -17,7 +17,7 @@ class EnhancedChatService:
     """Enhanced chat service with offline LLM integration"""
 
     def __init__(self):
-        self.llm_service = OfflineLLMService()
+        self.llm_service = get_llm_service()
         self.neo4j_service = Neo4jService()
         self.conversation_history = []
         self.max_history = 10
@@ -121,7 +121,11 @@ class EnhancedChatService:
         Provide a Cypher query that would get the relevant information.
         """
 
-        llm_response = self.llm_service.generate_response(understanding_prompt, max_tokens=200)
+        # The Cypher gets executed, so a merely similar question must not reuse it
+        llm_response = await self.llm_service.generate_cached_response(
+            query, understanding_prompt, "chat",
+            context=("graph_query", self._graph_fingerprint(graph_context)), exact=True, max_tokens=200
+        )
 
         # Extract Cypher query from LLM response
         cypher_query = self._extract_cypher_from_response(llm_response.get('response', ''))
@@ -144,7 +148,8 @@ class EnhancedChatService:
             "graphData": graph_data,
             "cypher": cypher_query,
             "confidence": 0.8,
-            "source": "llm-enhanced"
+            "source": "llm-enhanced",
+            "semantic_cache": llm_response.get('semantic_cache', {'hit': False})
         }
 
     async def _handle_analysis_request(self, query: str, graph_context: Dict) -> Dict[str, Any]:
@@ -165,14 +170,18 @@ class EnhancedChatService:
         4. Any anomalies or interesting findings
         """
 
-        analysis = self.llm_service.generate_response(analysis_prompt, max_tokens=400)
+        analysis = await self.llm_service.generate_cached_response(
+            query, analysis_prompt, "chat",
+            context=("analysis_request", self._graph_fingerprint(graph_context)), max_tokens=400
+        )
 
         return {
             "textResponse": analysis.get('response', 'Analysis completed.'),
             "graphData": graph_context,
             "analysis": analysis.get('response', ''),
             "confidence": 0.85,
-            "source": "llm-analysis"
+            "source": "llm-analysis",
+            "semantic_cache": analysis.get('semantic_cache', {'hit': False})
         }
 
     async def _handle_search_request(self, query: str, graph_context: Dict) -> Dict[str, Any]:
@@ -193,8 +202,12 @@ class EnhancedChatService:
             search_results = {"neo4j_results": []}
 
         # Get LLM analysis of results
-        results_analysis = self.llm_service.generate_response(
-            f"Search query: '{query}'\nFound {len(search_results.get('neo4j_results', []))} results. Summarize the key findings.",
+        result_count = len(search_results.get('neo4j_results', []))
+        results_analysis = await self.llm_service.generate_cached_response(
+            query,
+            f"Search query: '{query}'\nFound {result_count} results. Summarize the key findings.",
+            "chat",
+            context=("search_request", result_count),
             max_tokens=200
         )
 
@@ -207,7 +220,8 @@ class EnhancedChatService:
             "search_results": search_results,
             "analysis": results_analysis.get('response', ''),
             "confidence": 0.8,
-            "source": "llm-search"
+            "source": "llm-search",
+            "semantic_cache": results_analysis.get('semantic_cache', {'hit': False})
         }
 
     async def _handle_command(self, query: str, graph_context: Dict) -> Dict[str, Any]:
@@ -285,13 +299,17 @@ class EnhancedChatService:
         If appropriate, suggest specific actions they can take.
         """
 
-        response = self.llm_service.generate_response(context_prompt, max_tokens=300)
+        response = await self.llm_service.generate_cached_response(
+            query, context_prompt, "chat",
+            context=("general", self._graph_fingerprint(graph_context)), max_tokens=300
+        )
 
         return {
             "textResponse": response.get('response', f"I understand you're asking about: {query}"),
             "graphData": graph_context,
             "confidence": 0.7,
-            "source": "llm-general"
+            "source": "llm-general",
+            "semantic_cache": response.get('semantic_cache', {'hit': False})
         }
 
     def _extract_cypher_from_response(self, llm_response: str) -> Optional[str]:
@@ -320,6 +338,14 @@ class EnhancedChatService:
 
         return None
 
+    def _graph_fingerprint(self, graph_context: Dict) -> tuple:
+        """The parts of the graph context the chat prompts are built from"""
+        return (
+            len(graph_context.get('nodes', [])),
+            len(graph_context.get('edges', [])),
+            sorted(str(group) for group in set(node.get('group', 'Unknown') for node in graph_context.get('nodes', [])))
+        )
+
     def _add_to_history(self, role: str, content: str):
         """Add message to conversation history"""
         self.conversation_history.append({
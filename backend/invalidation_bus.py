@@ -0,0 +1,104 @@
+"""
+Cache Invalidation Bus for NeoBoi Application
+
+In-process publish/subscribe bus for data-change events. Mutating operations
+publish an event tagged with the scope of data they changed; subscribers such
+as CacheService evict exactly the entries that depend on that scope.
+
+Scopes:
+- graph:    Neo4j nodes/relationships changed (e.g. write queries via /api/query)
+- solr:     Solr index contents changed (index, commit, clear)
+- chunks:   DocumentChunk nodes/embeddings changed (vector search inputs)
+- document: processed documents added or removed
+
+Usage:
+    from invalidation_bus import get_invalidation_bus, SCOPE_SOLR
+
+    get_invalidation_bus().publish(SCOPE_SOLR, source="solr.clear_index")
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List
+
+logger = logging.getLogger(__name__)
+
+SCOPE_GRAPH = "graph"
+SCOPE_SOLR = "solr"
+SCOPE_CHUNKS = "chunks"
+SCOPE_DOCUMENT = "document"
+SCOPES = (SCOPE_GRAPH, SCOPE_SOLR, SCOPE_CHUNKS, SCOPE_DOCUMENT)
+
+class InvalidationBus:
+    """Synchronous in-process invalidation event bus"""
+
+    def __init__(self):
+        self._subscribers: List[Callable[[Dict[str, Any]], None]] = []
+        self.lock = threading.Lock()
+        self.published: Dict[str, int] = {scope: 0 for scope in SCOPES}
+
+    def subscribe(self, callback: Callable[[Dict[str, Any]], None]) -> None:
+        """Register a callback invoked with every published event"""
+        with self.lock:
+            self._subscribers.append(callback)
+
+    def unsubscribe(self, callback: Callable[[Dict[str, Any]], None]) -> None:
+        """Remove a previously registered callback"""
+        with self.lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+    def publish(self, scope: str, source: str = "", **details: Any) -> Dict[str, Any]:
+        """
+        Publish a data-change event to all subscribers
+
+        Args:
+            scope: One of SCOPES
+            source: Operation that changed the data (for logs and stats)
+            **details: Extra event context (e.g. filename)
+
+        Returns:
+            The published event
+        """
+        if scope not in SCOPES:
+            raise ValueError(f"Unknown invalidation scope: {scope}")
+
+        event = {
+            "scope": scope,
+            "source": source,
+            "details": details,
+            "timestamp": time.time()
+        }
+
+        with self.lock:
+            self.published[scope] += 1
+            subscribers = list(self._subscribers)
+
+        for callback in subscribers:
+            try:
+                callback(event)
+            except Exception as e:
+                # A failing subscriber must never fail the write that published
+                logger.error(f"Invalidation subscriber failed for scope '{scope}': {e}")
+
+        logger.debug("Published invalidation event: %s from %s", scope, source)
+        return event
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get event counts per scope"""
+        with self.lock:
+            return {
+                "published": dict(self.published),
+                "subscribers": len(self._subscribers)
+            }
+
+# Global invalidation bus instance
+_invalidation_bus = None
+
+def get_invalidation_bus() -> InvalidationBus:
+    """Get the global invalidation bus instance"""
+    global _invalidation_bus
+    if _invalidation_bus is None:
+        _invalidation_bus = InvalidationBus()
+    return _invalidation_bus
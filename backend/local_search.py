@@ -0,0 +1,562 @@
+"""
+Embedded Full-Text Search Engine for NeoBoi Application
+
+In-process stand-in for Solr built on SQLite FTS5. LocalSearchService
+subclasses SolrService and replaces its HTTP calls, so it builds the same
+documents, accepts the same indexing calls and returns search results in the
+same shape (facets, range facets, stats, cursors, field lists, highlights).
+
+Backends (SEARCH_BACKEND):
+- solr:  Solr only (default)
+- local: this engine only; no JVM needed, suits small deployments and tests
+- auto:  Solr, with every write mirrored here and reads falling back here
+         while Solr is unreachable
+
+Query support covers what the application sends: bare terms (OR-ed and
+ranked with BM25), quoted phrases, ``label:``/``content:`` terms, other
+``field:value`` terms as exact filters, and ``*`` / ``*:*`` for everything.
+"""
+
+import asyncio
+import json
+import logging
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+try:
+    from .cache_service import cached
+    from .invalidation_bus import SCOPE_SOLR, get_invalidation_bus
+    from .solr_service import SolrService
+except ImportError:  # Imported as a top-level module by the standalone scripts
+    from cache_service import cached
+    from invalidation_bus import SCOPE_SOLR, get_invalidation_bus
+    from solr_service import SolrService
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INDEX_PATH = os.path.join(os.path.dirname(__file__), '..', 'local_search', 'index.sqlite3')
+
+# Full-text columns, in FTS5 column order (used by snippet())
+TEXT_FIELDS = ("label", "content")
+
+FIELD_TERM = re.compile(r'(\w+):("[^"]*"|\S+)')
+PHRASE = re.compile(r'"([^"]*)"')
+WORD = re.compile(r'\w+')
+OPERATORS = {"AND", "OR", "NOT", "TO"}
+
+def _quote(text: str) -> str:
+    return '"' + text.replace('"', '""') + '"'
+
+def parse_query(query: str) -> Tuple[Optional[str], Dict[str, str]]:
+    """
+    Translate a Solr query string into an FTS5 MATCH expression plus exact filters
+
+    Returns:
+        (match expression or None to match everything, {field: value} filters)
+    """
+    filters: Dict[str, str] = {}
+    clauses: List[str] = []
+
+    def field_term(match: re.Match) -> str:
+        field, value = match.group(1), match.group(2).strip('"')
+        if field in TEXT_FIELDS:
+            clauses.extend(f"{field} : {_quote(word)}" for word in WORD.findall(value))
+        elif value != "*" and field != "*":
+            filters[field] = value
+        return " "
+
+    rest = FIELD_TERM.sub(field_term, query.strip())
+    clauses.extend(_quote(phrase) for phrase in PHRASE.findall(rest) if phrase.strip())
+    rest = PHRASE.sub(" ", rest)
+    clauses.extend(_quote(word) for word in WORD.findall(rest) if word not in OPERATORS)
+
+    return (" OR ".join(clauses) or None), filters
+
+class LocalSearchService(SolrService):
+    """SolrService interface backed by a local SQLite FTS5 index"""
+
+    def __init__(self, path: Optional[str] = None):
+        super().__init__(solr_url="local://", collection="local")
+        self.path = path or os.getenv("LOCAL_SEARCH_PATH", DEFAULT_INDEX_PATH)
+        self._local = threading.local()
+        self._write_lock = threading.RLock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = self._connection()
+        try:
+            conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(label, content)"
+            )
+        except sqlite3.OperationalError as e:
+            raise RuntimeError(f"SQLite FTS5 is not available: {e}")
+        conn.execute("CREATE TABLE IF NOT EXISTS documents (id TEXT PRIMARY KEY, doc TEXT NOT NULL)")
+        logger.info(f"Local search index at {self.path}")
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread; SQLite connections are not thread-safe"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    async def _run(self, func, *args):
+        return await asyncio.get_event_loop().run_in_executor(None, func, *args)
+
+    # Writes
+
+    def _upsert(self, docs: List[Dict[str, Any]]) -> None:
+        with self._write_lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for doc in docs:
+                    row = conn.execute("SELECT rowid FROM documents WHERE id = ?", (doc["id"],)).fetchone()
+                    blob = json.dumps(doc, default=str)
+                    if row:
+                        rowid = row[0]
+                        conn.execute("UPDATE documents SET doc = ? WHERE rowid = ?", (blob, rowid))
+                        conn.execute("DELETE FROM documents_fts WHERE rowid = ?", (rowid,))
+                    else:
+                        rowid = conn.execute(
+                            "INSERT INTO documents (id, doc) VALUES (?, ?)", (doc["id"], blob)
+                        ).lastrowid
+                    conn.execute(
+                        "INSERT INTO documents_fts (rowid, label, content) VALUES (?, ?, ?)",
+                        (rowid, str(doc.get("label") or ""), str(doc.get("content") or ""))
+                    )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def _delete(self, ids: Optional[List[str]]) -> None:
+        """Delete documents by id, or every document if ids is None"""
+        with self._write_lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if ids is None:
+                    conn.execute("DELETE FROM documents")
+                    conn.execute("DELETE FROM documents_fts")
+                else:
+                    for doc_id in ids:
+                        row = conn.execute("SELECT rowid FROM documents WHERE id = ?", (doc_id,)).fetchone()
+                        if row:
+                            conn.execute("DELETE FROM documents WHERE rowid = ?", (row[0],))
+                            conn.execute("DELETE FROM documents_fts WHERE rowid = ?", (row[0],))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    @staticmethod
+    def _is_atomic_update(doc: Dict[str, Any]) -> bool:
+        # Atomic updates carry {"set": ...} / {"inc": ...} field values
+        return any(isinstance(value, dict) for value in doc.values())
+
+    def _write(self, docs: List[Dict[str, Any]]) -> None:
+        """Upsert full documents and apply atomic updates, as one Solr update request would"""
+        with self._write_lock:
+            full_docs = [doc for doc in docs if not self._is_atomic_update(doc)]
+            if full_docs:
+                self._upsert(full_docs)
+            for update in filter(self._is_atomic_update, docs):
+                if not self._apply_atomic_update(update):
+                    logger.warning(f"Atomic update for missing local document {update['id']} skipped")
+
+    async def index_documents(self, docs: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Add or replace documents (or apply atomic updates); returns {'success', 'indexed', 'error'}"""
+        try:
+            await self._run(self._write, docs)
+            return {"success": True, "indexed": len(docs)}
+        except Exception as e:
+            return {"success": False, "indexed": 0, "error": str(e)}
+
+    async def delete_documents(self, ids: List[str]) -> Dict[str, Any]:
+        """Delete documents by id; returns {'success', 'deleted', 'error'}"""
+        if not ids:
+            return {"success": True, "deleted": 0}
+        try:
+            await self._run(self._delete, ids)
+            return {"success": True, "deleted": len(ids)}
+        except Exception as e:
+            return {"success": False, "deleted": 0, "error": str(e)}
+
+    async def index_node(self, node_data: Dict[str, Any]) -> bool:
+        """Index a single node"""
+        result = await self.index_documents([self._node_document(node_data)])
+        if not result["success"]:
+            logger.error(f"Failed to index node {node_data.get('id', 'unknown')} locally: {result['error']}")
+        return result["success"]
+
+    async def index_relationship(self, edge_data: Dict[str, Any]) -> bool:
+        """Index a single relationship"""
+        result = await self.index_documents([self._relationship_document(edge_data)])
+        if not result["success"]:
+            logger.error(f"Failed to index relationship {edge_data.get('id', 'unknown')} locally: {result['error']}")
+        return result["success"]
+
+    def _apply_atomic_update(self, update: Dict[str, Any]) -> bool:
+        """Apply Solr-style set/inc field updates to a stored document"""
+        with self._write_lock:
+            row = self._connection().execute("SELECT doc FROM documents WHERE id = ?", (update["id"],)).fetchone()
+            if row is None:
+                return False
+            doc = json.loads(row[0])
+            for field, change in update.items():
+                if field == "id":
+                    continue
+                if "inc" in change:
+                    doc[field] = (doc.get(field) or 0) + change["inc"]
+                elif change["set"] is None:
+                    doc.pop(field, None)
+                else:
+                    doc[field] = change["set"]
+            self._upsert([doc])
+            return True
+
+    async def update_properties(self, data: Dict[str, Any], old_properties: Dict[str, Any],
+                                kind: str = "node", counters: Iterable[str] = ()) -> Dict[str, Any]:
+        """Apply a property change to an indexed document (see SolrService.update_properties)"""
+        prefix = "node" if kind == "node" else "edge"
+        update = self._atomic_update_document(f"{prefix}_{data['id']}", data, old_properties, counters)
+        if update is None:
+            return {"success": True, "updated_fields": []}
+        try:
+            if not await self._run(self._apply_atomic_update, update):
+                return {"success": False, "updated_fields": [], "error": "Document not found"}
+            return {"success": True, "updated_fields": [field for field in update if field != "id"]}
+        except Exception as e:
+            return {"success": False, "updated_fields": [], "error": str(e)}
+
+    async def commit(self, mode: Optional[str] = None):
+        """Writes are visible as soon as they return; only notify caches"""
+        get_invalidation_bus().publish(SCOPE_SOLR, source="local_search.commit")
+        return True
+
+    async def hard_commit(self) -> bool:
+        return True
+
+    async def clear_index(self):
+        """Clear all documents from the index"""
+        try:
+            await self._run(self._delete, None)
+            get_invalidation_bus().publish(SCOPE_SOLR, source="local_search.clear_index")
+            return True
+        except Exception as e:
+            logger.error(f"Clear local index error: {e}")
+            return False
+
+    # Reads
+
+    @staticmethod
+    def _json_path(field: str) -> str:
+        return '$."' + field.replace('"', '') + '"'
+
+    def _where(self, match: Optional[str], filters: Dict[str, Any]) -> Tuple[str, List[Any]]:
+        """FROM/WHERE clause selecting the matching documents (alias d)"""
+        params: List[Any] = []
+        if match:
+            sql = "FROM documents_fts JOIN documents d ON d.rowid = documents_fts.rowid WHERE documents_fts MATCH ?"
+            params.append(match)
+        else:
+            sql = "FROM documents d WHERE 1 = 1"
+        for field, value in filters.items():
+            sql += " AND CAST(json_extract(d.doc, ?) AS TEXT) = ?"
+            params.extend([self._json_path(field), str(value)])
+        return sql, params
+
+    def _facets(self, where: str, params: List[Any], facet_fields: List[str], limit: int) -> Dict[str, Any]:
+        conn = self._connection()
+        facets = {}
+        for field in facet_fields:
+            name = self._field_name(field)
+            rows = conn.execute(
+                f"SELECT json_extract(d.doc, ?) AS value, COUNT(*) AS count {where} "
+                f"AND value IS NOT NULL GROUP BY value ORDER BY count DESC, value LIMIT ?",
+                [self._json_path(name), *params, limit]
+            ).fetchall()
+            facets[name] = [{"value": value, "count": count} for value, count in rows]
+        return facets
+
+    def _range_facets(self, where: str, params: List[Any],
+                      facet_ranges: List[Dict[str, Any]]) -> Dict[str, Any]:
+        conn = self._connection()
+        range_facets = {}
+        for facet_range in facet_ranges:
+            name = self._field_name(facet_range["field"])
+            try:
+                start, end, gap = (float(facet_range[key]) for key in ("start", "end", "gap"))
+            except ValueError:
+                # Date math ranges (e.g. NOW-1YEAR) need Solr
+                logger.warning(f"Local search supports numeric range facets only; skipping {name}")
+                continue
+            rows = dict(conn.execute(
+                f"SELECT CAST((json_extract(d.doc, ?) - ?) / ? AS INTEGER) AS bucket, COUNT(*) {where} "
+                f"AND json_extract(d.doc, ?) >= ? AND json_extract(d.doc, ?) < ? GROUP BY bucket",
+                [self._json_path(name), start, gap, *params, self._json_path(name), start, self._json_path(name), end]
+            ).fetchall())
+            buckets = []
+            for index in range(math.ceil((end - start) / gap)):
+                value = start + index * gap
+                buckets.append({"value": str(int(value) if value.is_integer() else value),
+                                "count": rows.get(index, 0)})
+            range_facets[name] = {
+                "buckets": buckets, "start": facet_range["start"],
+                "end": facet_range["end"], "gap": facet_range["gap"]
+            }
+        return range_facets
+
+    def _stats(self, where: str, params: List[Any], stats_fields: List[str]) -> Dict[str, Any]:
+        conn = self._connection()
+        stats = {}
+        for field in stats_fields:
+            name = self._field_name(field)
+            value = "json_extract(d.doc, ?)"
+            numeric = f"CASE WHEN json_type(d.doc, ?) IN ('integer', 'real') THEN {value} END"
+            row = conn.execute(
+                f"SELECT MIN(v), MAX(v), COUNT(v), COUNT(*) - COUNT(v), SUM(v), AVG(v), SUM(v * v) "
+                f"FROM (SELECT {numeric} AS v {where})",
+                [self._json_path(name), self._json_path(name), *params]
+            ).fetchone()
+            minimum, maximum, count, missing, total, mean, sum_of_squares = row
+            if not count:
+                continue
+            variance = (sum_of_squares - count * mean * mean) / (count - 1) if count > 1 else 0.0
+            stats[name] = {
+                "min": minimum, "max": maximum, "count": count, "missing": missing,
+                "sum": total, "sumOfSquares": sum_of_squares, "mean": mean,
+                "stddev": math.sqrt(max(variance, 0.0))
+            }
+        return stats
+
+    def _select(self, query: str, filters: Optional[Dict[str, Any]], limit: int, offset: int,
+                facet_fields: Optional[List[str]], facet_ranges: Optional[List[Dict[str, Any]]],
+                stats_fields: Optional[List[str]], facet_limit: int, cursor_mark: Optional[str],
+                fields: Optional[List[str]], highlight: bool, highlight_fields: Optional[List[str]],
+                snippet_length: int) -> Dict[str, Any]:
+        conn = self._connection()
+        match, query_filters = parse_query(query)
+        all_filters = {**query_filters, **{self._field_name(k): v for k, v in (filters or {}).items()}}
+        where, params = self._where(match, all_filters)
+
+        total = conn.execute(f"SELECT COUNT(*) {where}", params).fetchone()[0]
+
+        columns = "d.id, d.doc, " + ("-bm25(documents_fts)" if match else "1.0")
+        highlight_columns = [field for field in (highlight_fields or ["content"]) if field in TEXT_FIELDS]
+        if highlight and match:
+            tokens = max(4, min(64, snippet_length // 6))
+            for field in highlight_columns:
+                columns += f", snippet(documents_fts, {TEXT_FIELDS.index(field)}, '<em>', '</em>', '...', {tokens})"
+
+        page_sql, page_params = f"SELECT {columns} {where}", list(params)
+        if cursor_mark is not None:
+            # Keyset paging on id, like Solr's cursorMark with sort=id asc
+            if cursor_mark != "*":
+                page_sql += " AND d.id > ?"
+                page_params.append(cursor_mark)
+            page_sql += " ORDER BY d.id LIMIT ?"
+            page_params.append(limit)
+        else:
+            page_sql += (" ORDER BY 3 DESC, d.id" if match else " ORDER BY d.id") + " LIMIT ? OFFSET ?"
+            page_params.extend([limit, offset])
+
+        docs = []
+        for row in conn.execute(page_sql, page_params).fetchall():
+            doc = json.loads(row[1])
+            doc["score"] = row[2]
+            if fields:
+                doc = {key: doc[key] for key in dict.fromkeys(["id", *fields]) if key in doc}
+            else:
+                doc.pop("score")
+            if highlight:
+                snippets = row[3:] if match else ()
+                doc["highlights"] = {
+                    field: [snippet] for field, snippet in zip(highlight_columns, snippets) if "<em>" in (snippet or "")
+                }
+            docs.append(doc)
+
+        result = {"total": total, "docs": docs, "query": query, "filters": filters}
+        if facet_fields or facet_ranges:
+            result["facets"] = self._facets(where, params, facet_fields or [], facet_limit)
+            result["range_facets"] = self._range_facets(where, params, facet_ranges or [])
+        if stats_fields:
+            result["stats"] = self._stats(where, params, stats_fields)
+        if cursor_mark is not None:
+            done = len(docs) < limit
+            result["next_cursor"] = None if done else self.encode_cursor(docs[-1]["id"], query, filters)
+        return result
+
+    @cached("search", should_cache=lambda result: "error" not in result, tags=(SCOPE_SOLR,))
+    async def search(self, query: str, filters: Optional[Dict[str, Any]] = None,
+                    limit: int = 20, offset: int = 0,
+                    facet_fields: Optional[List[str]] = None,
+                    facet_ranges: Optional[List[Dict[str, Any]]] = None,
+                    stats_fields: Optional[List[str]] = None,
+                    facet_limit: int = 20, cursor: Optional[str] = None,
+                    fields: Optional[List[str]] = None, highlight: bool = False,
+                    highlight_fields: Optional[List[str]] = None,
+                    snippet_length: int = 150) -> Dict[str, Any]:
+        """Search the local index (same arguments and result shape as SolrService.search)"""
+        cursor_mark = self.decode_cursor(cursor, query, filters) if cursor else None
+        try:
+            return await self._run(
+                self._select, query, filters, limit, offset, facet_fields, facet_ranges,
+                stats_fields, facet_limit, cursor_mark, fields, highlight, highlight_fields, snippet_length
+            )
+        except Exception as e:
+            logger.error(f"Local search error: {e}")
+            return {"total": 0, "docs": [], "error": str(e)}
+
+    def _get(self, ids: List[str], fields: str) -> Dict[str, Any]:
+        conn = self._connection()
+        wanted = [field.strip() for field in fields.split(",")]
+        docs = {}
+        # Stay under SQLite's bound-parameter limit
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            records = conn.execute(
+                f"SELECT doc FROM documents WHERE id IN ({', '.join('?' * len(chunk))})", chunk
+            ).fetchall()
+            for doc in (json.loads(r[0]) for r in records):
+                docs[doc["id"]] = {key: doc[key] for key in wanted if key in doc}
+        return {"docs": docs}
+
+    async def get_documents(self, ids: List[str], fields: str = "id,label,group,properties") -> Dict[str, Any]:
+        """Fetch stored documents by id (same result shape as SolrService.get_documents)"""
+        if not ids:
+            return {"docs": {}}
+        try:
+            return await self._run(self._get, ids, fields)
+        except Exception as e:
+            return {"docs": {}, "error": str(e)}
+
+    def _scan(self, cursor: str, rows: int, fields: str, query: str) -> Dict[str, Any]:
+        after = "" if cursor == "*" else cursor
+        where, params = self._where(*parse_query(query))
+        records = self._connection().execute(
+            f"SELECT d.id, d.doc {where} AND d.id > ? ORDER BY d.id LIMIT ?", [*params, after, rows]
+        ).fetchall()
+        wanted = [field.strip() for field in fields.split(",")]
+        docs = [{key: doc[key] for key in wanted if key in doc} for doc in (json.loads(r[1]) for r in records)]
+        next_cursor = records[-1][0] if records else cursor
+        return {"docs": docs, "next_cursor": next_cursor, "done": not records}
+
+    async def scan_documents(self, cursor: str = "*", rows: int = 1000,
+                             fields: str = "id,neo4j_id,type", query: str = "*:*") -> Dict[str, Any]:
+        """Page through every document matching a query in id order"""
+        try:
+            return await self._run(self._scan, cursor, rows, fields, query)
+        except Exception as e:
+            return {"docs": [], "error": str(e)}
+
+    async def get_index_stats(self) -> Dict[str, Any]:
+        """Document count and index location"""
+        try:
+            count = await self._run(
+                lambda: self._connection().execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+            )
+            return {"collection": self.collection, "status": "active", "engine": "sqlite-fts5",
+                    "documents": count, "path": self.path}
+        except Exception as e:
+            return {"collection": self.collection, "status": "error", "engine": "sqlite-fts5", "error": str(e)}
+
+class FallbackSearchService:
+    """
+    Solr with the local engine as a hot standby
+
+    Writes go to both engines. Reads go to Solr; when a Solr search fails,
+    the local engine answers and Solr is skipped for SEARCH_FALLBACK_COOLDOWN
+    seconds so requests do not keep waiting on a dead endpoint. Anything not
+    overridden here (document builders, cursors, scans) is Solr's.
+    """
+
+    def __init__(self, primary: SolrService, local: LocalSearchService, cooldown_seconds: Optional[float] = None):
+        self.primary = primary
+        self.local = local
+        self.cooldown_seconds = cooldown_seconds if cooldown_seconds is not None else float(
+            os.getenv("SEARCH_FALLBACK_COOLDOWN", "30"))
+        self._primary_down_until = 0.0
+        self.fallback_searches = 0
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.primary, name)
+
+    def _primary_available(self) -> bool:
+        return time.time() >= self._primary_down_until
+
+    async def search(self, query: str, *args, **kwargs) -> Dict[str, Any]:
+        """Search Solr, or the local engine while Solr is failing"""
+        if self._primary_available():
+            result = await self.primary.search(query, *args, **kwargs)
+            if "error" not in result:
+                return result
+            logger.warning(f"Solr search failed ({result['error'][:200]}); using local search engine")
+            self._primary_down_until = time.time() + self.cooldown_seconds
+
+        self.fallback_searches += 1
+        result = await self.local.search(query, *args, **kwargs)
+        return {**result, "engine": "local"}
+
+    async def iterate_search(self, query: str, filters: Optional[Dict[str, Any]] = None,
+                             page_size: int = 500) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Yield every matching document from whichever engine is up when the export starts"""
+        engine = self.primary if self._primary_available() else self.local
+        async for docs in engine.iterate_search(query, filters, page_size):
+            yield docs
+
+    async def _both(self, method: str, *args, **kwargs) -> Any:
+        """Call a write method on both engines; Solr's result is returned"""
+        primary_result, local_result = await asyncio.gather(
+            getattr(self.primary, method)(*args, **kwargs),
+            getattr(self.local, method)(*args, **kwargs),
+            return_exceptions=True
+        )
+        if isinstance(local_result, Exception):
+            logger.error(f"Local search engine {method} failed: {local_result}")
+        if isinstance(primary_result, Exception):
+            raise primary_result
+        return primary_result
+
+    async def index_node(self, node_data: Dict[str, Any]) -> bool:
+        return await self._both("index_node", node_data)
+
+    async def index_relationship(self, edge_data: Dict[str, Any]) -> bool:
+        return await self._both("index_relationship", edge_data)
+
+    async def index_documents(self, docs: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return await self._both("index_documents", docs)
+
+    async def bulk_index(self, docs: List[Dict[str, Any]], batch_size: Optional[int] = None,
+                         concurrency: Optional[int] = None) -> Dict[str, Any]:
+        return await self._both("bulk_index", docs, batch_size, concurrency)
+
+    async def index_graph_data(self, graph_data: Dict[str, Any], batch_size: Optional[int] = None) -> Dict[str, Any]:
+        return await self._both("index_graph_data", graph_data, batch_size)
+
+    async def delete_documents(self, ids: List[str]) -> Dict[str, Any]:
+        return await self._both("delete_documents", ids)
+
+    async def update_properties(self, data: Dict[str, Any], old_properties: Dict[str, Any],
+                                kind: str = "node", counters: Iterable[str] = ()) -> Dict[str, Any]:
+        return await self._both("update_properties", data, old_properties, kind, counters)
+
+    async def commit(self, mode: Optional[str] = None):
+        return await self._both("commit", mode)
+
+    async def clear_index(self):
+        return await self._both("clear_index")
+
+    async def get_index_stats(self) -> Dict[str, Any]:
+        stats = await self.primary.get_index_stats()
+        return {**stats, "fallback": {**await self.local.get_index_stats(),
+                                      "fallback_searches": self.fallback_searches,
+                                      "solr_skipped": not self._primary_available()}}
@@ -15,6 +15,10 @@ load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '..', '.env.loca
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+from .cache_service import get_cache_service
+from .solr_service import get_solr_vector_service, solr_service
+from .unstructured_pipeline.llm_service import get_llm_service
+
 # Import and include routes
 try:
     from .routes.routes import router
@@ -40,7 +44,16 @@ except Exception as e:
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logger.info("Application startup - Neo4j connection deferred")
+    get_cache_service().start_sweeper()
+    solr_service.start_commit_scheduler()
+    get_llm_service().start_health_monitor()
     yield
+    await get_cache_service().stop_sweeper()
+    await solr_service.stop_commit_scheduler()
+    await solr_service.close()
+    await get_solr_vector_service().close()
+    await get_llm_service().stop_health_monitor()
+    await get_llm_service().close()
     logger.info("Application shutdown")
 
 app = FastAPI(
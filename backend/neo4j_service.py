@@ -1,13 +1,25 @@
-from neo4j import GraphDatabase, basic_auth
+from neo4j import GraphDatabase, Query, basic_auth
 import os
 import logging
-from typing import Dict, List, Any, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Optional, Tuple
 from contextlib import asynccontextmanager
 import asyncio
 import requests
 import json
 import numpy as np
 
+try:
+    from .cache_service import cached, get_cache_service
+    from .embedding_store import get_embedding_store
+    from .invalidation_bus import SCOPE_CHUNKS, SCOPE_GRAPH, SCOPE_SOLR, get_invalidation_bus
+    from .search_fanout import remaining_time
+except ImportError:  # Imported as a top-level module by the standalone scripts
+    from cache_service import cached, get_cache_service
+    from embedding_store import get_embedding_store
+    from invalidation_bus import SCOPE_CHUNKS, SCOPE_GRAPH, SCOPE_SOLR, get_invalidation_bus
+    from search_fanout import remaining_time
+
 # Import services
 # from solr_service import solr_service  # Moved to avoid circular import
 # from unstructured_pipeline.llm_service import OfflineLLMService  # Not used in this module
@@ -54,7 +66,16 @@ class Neo4jService:
         self.vector_index_name = "document_chunks_vector"
         self.vector_supported = self._check_vector_support()
 
+        # Vector search backend: Neo4j's vector index, or a Solr dense vector
+        # collection (chunks are then also indexed into Solr when stored)
+        self.vector_backend = os.getenv("VECTOR_BACKEND", "neo4j").lower()
+        self.solr_vector_indexing = (
+            self.vector_backend == "solr" or os.getenv("SOLR_VECTOR_INDEXING", "false").lower() == "true"
+        )
+
         # Initialize embedding model if available
+        self.embedding_model = None
+        self.embedding_store = None
         if SENTENCE_TRANSFORMERS_AVAILABLE:
             try:
                 self.embedding_model = SentenceTransformer(self.embedding_model_name)
@@ -65,8 +86,96 @@ class Neo4jService:
         else:
             logger.warning(f"SentenceTransformers not available. Cannot load model '{self.embedding_model_name}'")
 
+        # Persistent store so identical text is never re-encoded
+        if self.embedding_model is not None:
+            try:
+                self.embedding_store = get_embedding_store(self.embedding_model_name)
+            except Exception as e:
+                logger.warning(f"Embedding store unavailable, embeddings will not be persisted: {e}")
+
+        # Bounded pool for query threads. A query whose awaiter timed out keeps its
+        # thread until the transaction timeout ends it, without starving the default executor
+        self._query_executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv("NEO4J_QUERY_THREADS", "8")), thread_name_prefix="neo4j-query"
+        )
+
         logger.info(f"Neo4jService initialized for {self.deployment_type} deployment (URI: {self.uri})")
 
+    @staticmethod
+    def _transaction_timeout() -> Optional[float]:
+        """Server-side timeout for a query: what is left of the search deadline, if any"""
+        remaining = remaining_time()
+        # A timeout of 0 means "no timeout" to Neo4j
+        return None if remaining is None else max(remaining, 0.001)
+
+    def _run_query(self, query: str, params: Dict[str, Any], timeout: Optional[float]) -> Tuple[list, Any]:
+        """
+        Run a query in its own session and read every record (blocking)
+
+        The session opens and closes in the worker thread, so an awaiter that
+        gave up cannot close it under a running query. Bookkeeping for writes
+        (cache invalidation, the Solr sync change log) happens here too, so it
+        is not skipped when the awaiter has gone.
+        """
+        with self.get_driver().session(database=self.database) as session:
+            result = session.run(Query(query, timeout=timeout), params)
+            records = list(result)
+            summary = result.consume()
+
+            # Write queries invalidate cached results derived from the graph
+            if summary.counters.contains_updates:
+                bus = get_invalidation_bus()
+                bus.publish(SCOPE_GRAPH, source="neo4j.execute_query")
+                if "DocumentChunk" in query:
+                    bus.publish(SCOPE_CHUNKS, source="neo4j.execute_query")
+
+            # Change log for the incremental Solr sync: deleted elements leave no
+            # updated_at behind, so count deletions per type for it to reconcile
+            counters = summary.counters
+            if counters.nodes_deleted or counters.relationships_deleted:
+                session.run(
+                    "MERGE (s:SolrSyncState {name: 'graph'}) "
+                    "SET s.deleted_at = timestamp(), "
+                    "s.nodes_deleted = coalesce(s.nodes_deleted, 0) + $nodes, "
+                    "s.relationships_deleted = coalesce(s.relationships_deleted, 0) + $relationships",
+                    {"nodes": counters.nodes_deleted, "relationships": counters.relationships_deleted}
+                ).consume()
+        return records, summary
+
+    def _encode_texts(self, texts: List[str]) -> List[List[float]]:
+        """
+        Encode texts with the embedding model, reusing previously computed embeddings
+
+        Lookup order: in-memory embedding cache, persistent embedding store,
+        then the model itself for whatever is still missing.
+        """
+        cache = get_cache_service()
+        vectors: Dict[str, List[float]] = {}
+        missing: List[str] = []
+
+        for text in dict.fromkeys(texts):
+            cached = cache.get_embedding(text, self.embedding_model_name)
+            if cached is not None:
+                vectors[text] = cached
+            else:
+                missing.append(text)
+
+        if missing:
+            def encode(batch: List[str]):
+                return self.embedding_model.encode(batch, convert_to_numpy=True)
+
+            if self.embedding_store is not None:
+                encoded = self.embedding_store.get_or_encode(missing, encode)
+            else:
+                encoded = encode(missing)
+
+            for text, embedding in zip(missing, encoded):
+                embedding_list = embedding.tolist()
+                cache.set_embedding(text, embedding_list, self.embedding_model_name)
+                vectors[text] = embedding_list
+
+        return [vectors[text] for text in texts]
+
     def get_deployment_info(self) -> Dict[str, Any]:
         """
         Get information about the current Neo4j deployment
@@ -300,69 +409,69 @@ class Neo4jService:
         if params is None:
             params = {}
 
-        driver = self.get_driver()
         nodes_map = {}
         edges = []
 
         logger.info(f"Executing query: {query} with params: {params}")
 
-        with driver.session(database=self.database) as session:
-            result = await asyncio.get_event_loop().run_in_executor(
-                None, session.run, query, params
-            )
+        records, summary = await asyncio.get_event_loop().run_in_executor(
+            self._query_executor, self._run_query, query, params, self._transaction_timeout()
+        )
+
+        # Process results based on query type
+        if "AS n_info" in query:
+            # Structured query with info objects
+            for record in records:
+                n_info = record.get('n_info')
+                r_info = record.get('r_info')
+                m_info = record.get('m_info')
+
+                if n_info:
+                    self._add_node_from_info(n_info, nodes_map)
+                if m_info:
+                    self._add_node_from_info(m_info, nodes_map)
+                if r_info:
+                    self._process_relationship(r_info, nodes_map, edges)
+        else:
+            # Standard Neo4j objects
+            for record in records:
+                n = record.get('n')
+                r = record.get('r')
+                m = record.get('m')
 
-            # Process results based on query type
-            if "AS n_info" in query:
-                # Structured query with info objects
-                for record in result:
-                    n_info = record.get('n_info')
-                    r_info = record.get('r_info')
-                    m_info = record.get('m_info')
-
-                    if n_info:
-                        self._add_node_from_info(n_info, nodes_map)
-                    if m_info:
-                        self._add_node_from_info(m_info, nodes_map)
-                    if r_info:
-                        self._process_relationship(r_info, nodes_map, edges)
-            else:
-                # Standard Neo4j objects
-                for record in result:
-                    n = record.get('n')
-                    r = record.get('r')
-                    m = record.get('m')
-
-                    if n:
-                        self._add_node_from_info({
-                            'id': n.element_id,
-                            'labels': list(n.labels),
-                            'properties': dict(n.items())
-                        }, nodes_map)
-
-                    if m:
-                        self._add_node_from_info({
-                            'id': m.element_id,
-                            'labels': list(m.labels),
-                            'properties': dict(m.items())
-                        }, nodes_map)
-
-                    if r:
-                        self._process_relationship({
-                            'elementId': r.element_id,
-                            'startNodeElementId': r.start_node.element_id,
-                            'endNodeElementId': r.end_node.element_id,
-                            'type': r.type,
-                            'properties': dict(r.items())
-                        }, nodes_map, edges)
-
-            raw_records = [record.data() for record in result]
-            return {
-                'nodes': list(nodes_map.values()),
-                'edges': edges,
-                'rawRecords': raw_records,
-                'summary': str(result.consume())
-            }
+                if n:
+                    self._add_node_from_info({
+                        'id': n.element_id,
+                        'labels': list(n.labels),
+                        'properties': dict(n.items())
+                    }, nodes_map)
+
+                if m:
+                    self._add_node_from_info({
+                        'id': m.element_id,
+                        'labels': list(m.labels),
+                        'properties': dict(m.items())
+                    }, nodes_map)
+
+                if r:
+                    self._process_relationship({
+                        'elementId': r.element_id,
+                        'startNodeElementId': r.start_node.element_id,
+                        'endNodeElementId': r.end_node.element_id,
+                        'type': r.type,
+                        'properties': dict(r.items())
+                    }, nodes_map, edges)
+
+        raw_records = [record.data() for record in records]
 
+        return {
+            'nodes': list(nodes_map.values()),
+            'edges': edges,
+            'rawRecords': raw_records,
+            'summary': str(summary)
+        }
+
+    @cached("integrated", should_cache=lambda result: "error" not in result, tags=(SCOPE_GRAPH, SCOPE_SOLR))
     async def integrated_search(self, query: str, search_type: str = "all",
                                limit: int = 20) -> Dict[str, Any]:
         """
@@ -399,8 +508,8 @@ class Neo4jService:
 
             # 2. Search Solr (both structured and unstructured)
             if search_type in ["unstructured", "all"]:
-                from solr_service import solr_service  # Import locally to avoid circular import
-                solr_result = await solr_service.search(query, limit=limit)
+                from solr_service import DISPLAY_FIELDS, solr_service  # Import locally to avoid circular import
+                solr_result = await solr_service.search(query, limit=limit, fields=DISPLAY_FIELDS, highlight=True)
                 results["solr_results"] = solr_result.get("docs", [])
 
             # 3. Get Ollama context and insights
@@ -714,13 +823,20 @@ class Neo4jService:
                 "deployment_type": self.deployment_type
             }
 
-    async def vector_similarity_search(self, query: str, limit: int = 10) -> Dict[str, Any]:
+    @cached("vector", should_cache=lambda result: result.get("success", False), tags=(SCOPE_CHUNKS,))
+    async def vector_similarity_search(self, query: str, limit: int = 10, threshold: Optional[float] = None,
+                                       keywords: Optional[str] = None, filters: Optional[Dict[str, Any]] = None,
+                                       backend: Optional[str] = None) -> Dict[str, Any]:
         """
-        Perform vector similarity search using Neo4j GraphRAG Cypher queries
+        Perform vector similarity search using Neo4j GraphRAG Cypher queries or Solr kNN
 
         Args:
             query: Natural language search query
             limit: Maximum number of results to return
+            threshold: Drop results with a lower similarity score
+            keywords: Keyword query chunks must also match (Solr backend only)
+            filters: Exact chunk field filters, e.g. document_filename (Solr backend only)
+            backend: 'neo4j' or 'solr' (default VECTOR_BACKEND)
 
         Returns:
             Dictionary containing search results with similarity scores
@@ -728,9 +844,16 @@ class Neo4jService:
         if not self.embedding_model:
             return {"success": False, "error": "Embedding model not available", "results": []}
 
+        if (backend or self.vector_backend) == "solr":
+            return await self._solr_vector_search(query, limit, threshold, keywords, filters)
+        if keywords or filters:
+            return {"success": False, "error": "Keyword and field filters need the Solr vector backend", "results": []}
+
         try:
-            # Generate embedding for the query
-            query_embedding = self.embedding_model.encode([query], convert_to_numpy=True)[0].tolist()
+            # Generate embedding for the query (off the event loop, so concurrent searches keep running)
+            query_embedding = (await asyncio.get_event_loop().run_in_executor(
+                self._query_executor, self._encode_texts, [query]
+            ))[0]
 
             # Cypher query for vector similarity search using Neo4j's vector index
             search_query = f"""
@@ -743,35 +866,53 @@ class Neo4jService:
             ORDER BY score DESC
             """
 
-            driver = self.get_driver()
-            with driver.session(database=self.database) as session:
-                result = await asyncio.get_event_loop().run_in_executor(
-                    None, session.run, search_query, {"query_embedding": query_embedding}
-                )
-
-                records = await asyncio.get_event_loop().run_in_executor(None, list, result)
+            records, _ = await asyncio.get_event_loop().run_in_executor(
+                self._query_executor, self._run_query, search_query,
+                {"query_embedding": query_embedding}, self._transaction_timeout()
+            )
 
-                results = []
-                for record in records:
-                    results.append({
-                        "chunk_id": record["chunk_id"],
-                        "text": record["text"],
-                        "document_filename": record["document_filename"],
-                        "similarity_score": record["similarity_score"]
-                    })
+            results = []
+            for record in records:
+                if threshold is not None and record["similarity_score"] < threshold:
+                    continue
+                results.append({
+                    "chunk_id": record["chunk_id"],
+                    "text": record["text"],
+                    "document_filename": record["document_filename"],
+                    "similarity_score": record["similarity_score"]
+                })
 
             logger.info(f"Vector similarity search completed: {len(results)} results for query '{query}'")
             return {
                 "success": True,
                 "query": query,
                 "results": results,
-                "total_results": len(results)
+                "total_results": len(results),
+                "backend": "neo4j"
             }
 
         except Exception as e:
             logger.error(f"Vector similarity search failed: {str(e)}")
             return {"success": False, "error": str(e), "query": query, "results": []}
 
+    async def _solr_vector_search(self, query: str, limit: int, threshold: Optional[float],
+                                  keywords: Optional[str], filters: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Vector similarity search against the Solr chunk collection, with keyword filters in the same request"""
+        try:
+            from .solr_service import get_solr_vector_service
+        except ImportError:  # Imported as a top-level module by the standalone scripts
+            from solr_service import get_solr_vector_service
+
+        query_embedding = (await asyncio.get_event_loop().run_in_executor(
+            self._query_executor, self._encode_texts, [query]
+        ))[0]
+        result = await get_solr_vector_service().knn_search(query_embedding, limit, keywords, filters)
+        if threshold is not None:
+            result["results"] = [r for r in result["results"] if r["similarity_score"] >= threshold]
+            result["total_results"] = len(result["results"])
+        logger.info(f"Solr vector search completed: {len(result['results'])} results for query '{query}'")
+        return {**result, "query": query}
+
     async def store_document_chunks_with_embeddings(self, chunks: List[Dict[str, Any]],
                                                   document_metadata: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -791,13 +932,16 @@ class Neo4jService:
             stored_chunks = 0
             driver = self.get_driver()
 
-            # Generate embeddings for all chunks in batch
+            # Generate embeddings for all chunks in batch, skipping text encoded before
+            # (off the event loop: inference and embedding store I/O block)
             texts = [chunk['text'] for chunk in chunks]
-            embeddings = self.embedding_model.encode(texts, convert_to_numpy=True)
+            embeddings = await asyncio.get_event_loop().run_in_executor(
+                self._query_executor, self._encode_texts, texts
+            )
 
             with driver.session(database=self.database) as session:
                 for i, chunk in enumerate(chunks):
-                    embedding_list = embeddings[i].tolist()
+                    embedding_list = embeddings[i]
 
                     # Create document chunk node with embedding for GraphRAG
                     create_chunk_query = """
@@ -808,7 +952,8 @@ class Neo4jService:
                         document_filename: $document_filename,
                         start_pos: $start_pos,
                         end_pos: $end_pos,
-                        created_at: datetime()
+                        created_at: datetime(),
+                        updated_at: timestamp()
                     })
                     RETURN chunk.id as chunk_id
                     """
@@ -831,11 +976,30 @@ class Neo4jService:
                         stored_chunks += 1
 
             logger.info(f"Successfully stored {stored_chunks} document chunks with embeddings for GraphRAG")
+
+            solr_result = None
+            if self.solr_vector_indexing:
+                try:
+                    from .solr_service import get_solr_vector_service
+                except ImportError:  # Imported as a top-level module by the standalone scripts
+                    from solr_service import get_solr_vector_service
+                # Reuse the embeddings computed above; Solr is a second vector backend
+                solr_result = await get_solr_vector_service().index_chunks(
+                    chunks, embeddings, document_metadata.get('filename', 'unknown')
+                )
+
+            if stored_chunks:
+                get_invalidation_bus().publish(
+                    SCOPE_CHUNKS,
+                    source="neo4j.store_document_chunks",
+                    filename=document_metadata.get('filename', 'unknown')
+                )
             return {
                 "success": True,
                 "chunks_stored": stored_chunks,
                 "total_chunks": len(chunks),
-                "document_filename": document_metadata.get('filename', 'unknown')
+                "document_filename": document_metadata.get('filename', 'unknown'),
+                **({"solr_chunks_indexed": solr_result["indexed"]} if solr_result is not None else {})
             }
 
         except Exception as e:
@@ -0,0 +1,159 @@
+"""
+Deterministic Rank Fusion for NeoBoi Application
+
+Merges ranked result lists from Solr, vector search and graph queries into
+one list without an LLM round trip, using reciprocal rank fusion (RRF):
+
+    fused(item) = sum over sources of weight(source) / (k + rank in source)
+
+RRF only needs ranks, so scores on different scales (BM25, cosine, none at
+all for Cypher rows) never have to be made comparable. Results that several
+sources agree on rise to the top.
+
+- Dedup: results are keyed by Neo4j id (nodes/relationships) or chunk id, so
+  a chunk found by both Solr and vector search is one fused result.
+- Weights: FUSION_WEIGHTS, e.g. "solr=1.0,vector=1.0,graph=0.8,neo4j=0.6".
+- Normalization: each source's native scores are min-max scaled to [0, 1]
+  for display, and the fused score is scaled by the best score achievable
+  (first in every source), so 1.0 means "ranked first everywhere".
+
+Usage:
+    from rank_fusion import fuse_results
+
+    fused = fuse_results(query, {"solr": solr_docs, "vector": chunks})
+"""
+
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WEIGHTS = {"solr": 1.0, "vector": 1.0, "graph": 0.8, "neo4j": 0.6}
+
+# Native relevance score field per result shape
+SCORE_FIELDS = ("score", "similarity_score")
+
+def _parse_weights(spec: str) -> Dict[str, float]:
+    weights = {}
+    for part in spec.split(","):
+        if "=" in part:
+            source, weight = part.split("=", 1)
+            try:
+                weights[source.strip()] = float(weight)
+            except ValueError:
+                logger.warning(f"Ignoring invalid fusion weight '{part}'")
+    return weights
+
+def get_fusion_weights() -> Dict[str, float]:
+    """Per-source weights: defaults overridden by FUSION_WEIGHTS"""
+    return {**DEFAULT_WEIGHTS, **_parse_weights(os.getenv("FUSION_WEIGHTS", ""))}
+
+def result_key(item: Dict[str, Any]) -> str:
+    """
+    Identity of a result across sources
+
+    Chunks are keyed by chunk id, graph elements by Neo4j id; anything else
+    (e.g. projected Cypher rows) by a hash of its content.
+    """
+    if item.get("chunk_id"):
+        return f"chunk:{item['chunk_id']}"
+    if item.get("document_filename") and item.get("id"):
+        # A DocumentChunk returned by Cypher (its id property is the chunk id)
+        return f"chunk:{item['id']}"
+    if item.get("neo4j_id"):
+        return f"neo4j:{item['neo4j_id']}"
+    for key in ("elementId", "id"):
+        if item.get(key) and not str(item[key]).startswith(("node_", "edge_")):
+            return f"neo4j:{item[key]}"
+
+    # Cypher rows: use the first nested node/chunk identity, if there is one
+    for value in item.values():
+        if isinstance(value, dict):
+            nested = result_key(value)
+            if not nested.startswith("hash:"):
+                return nested
+
+    digest = hashlib.sha1(json.dumps(item, sort_keys=True, default=str).encode()).hexdigest()[:16]
+    return f"hash:{digest}"
+
+def _normalized_scores(items: List[Dict[str, Any]]) -> List[Optional[float]]:
+    """Min-max scale a source's native scores to [0, 1] (None if it has none)"""
+    raw = []
+    for item in items:
+        score = next((item[field] for field in SCORE_FIELDS if isinstance(item.get(field), (int, float))), None)
+        raw.append(score)
+    present = [score for score in raw if score is not None]
+    if not present:
+        return raw
+    low, high = min(present), max(present)
+    return [None if score is None else (1.0 if high == low else (score - low) / (high - low)) for score in raw]
+
+def fuse_results(query: str, results: Dict[str, List[Dict[str, Any]]],
+                 weights: Optional[Dict[str, float]] = None, k: Optional[int] = None,
+                 limit: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Fuse ranked result lists with weighted reciprocal rank fusion
+
+    Args:
+        query: Original query (echoed back)
+        results: Source name -> results in rank order (best first)
+        weights: Source name -> weight (default get_fusion_weights(); unknown sources weigh 1.0)
+        k: RRF damping constant (default FUSION_RRF_K, 60); larger k flattens rank differences
+        limit: Fused results to return (default FUSION_LIMIT, 20)
+
+    Returns:
+        Same shape as OfflineLLMService.fuse_multi_system_results: 'fused_analysis'
+        holds 'fused_results' (each with key, score, rrf_score, per-source rank
+        and normalized score, and the result itself), 'summary' and
+        'source_counts'.
+    """
+    started = time.perf_counter()
+    weights = {**get_fusion_weights(), **(weights or {})}
+    k = k if k is not None else int(os.getenv("FUSION_RRF_K", "60"))
+    limit = limit or int(os.getenv("FUSION_LIMIT", "20"))
+
+    fused: Dict[str, Dict[str, Any]] = {}
+    for source, items in results.items():
+        weight = weights.get(source, 1.0)
+        if weight <= 0 or not items:
+            continue
+        for rank, (item, normalized) in enumerate(zip(items, _normalized_scores(items)), start=1):
+            key = result_key(item)
+            entry = fused.setdefault(key, {"key": key, "rrf_score": 0.0, "sources": {}, "result": item})
+            if source in entry["sources"]:
+                continue  # Duplicate within one source: keep its best rank only
+            entry["rrf_score"] += weight / (k + rank)
+            entry["sources"][source] = {"rank": rank, "score": normalized}
+
+    # Best achievable: first in every source that returned anything
+    best = sum(weights.get(source, 1.0) / (k + 1) for source, items in results.items()
+               if items and weights.get(source, 1.0) > 0)
+    ranked = sorted(fused.values(), key=lambda entry: (-entry["rrf_score"], entry["key"]))[:limit]
+    for entry in ranked:
+        entry["score"] = round(entry["rrf_score"] / best, 6) if best else 0.0
+
+    source_counts = {source: len(items) for source, items in results.items()}
+    overlap = sum(1 for entry in fused.values() if len(entry["sources"]) > 1)
+    summary = (
+        f"{len(fused)} unique results from "
+        + ", ".join(f"{source} ({count})" for source, count in source_counts.items() if count)
+        + f"; {overlap} found by more than one source"
+    ) if fused else "No results from any source"
+
+    return {
+        "success": True,
+        "method": "rrf",
+        "original_query": query,
+        "fused_analysis": {
+            "fused_results": ranked,
+            "summary": summary,
+            "source_counts": source_counts,
+            "weights": {source: weights.get(source, 1.0) for source in results},
+            "rrf_k": k
+        },
+        "processing_time": time.perf_counter() - started
+    }
@@ -1,13 +1,22 @@
 from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from typing import Dict, List, Any, Optional
 from ..neo4j_service import get_neo4j_service
 from ..enhanced_chat_service import enhanced_chat_service
-from ..solr_service import solr_service
+from ..solr_service import DISPLAY_FIELDS, solr_service
+from ..cache_service import cached, get_cache_service
+from ..invalidation_bus import SCOPE_CHUNKS, SCOPE_DOCUMENT, SCOPE_GRAPH, SCOPE_SOLR
+from ..semantic_cache import clear_semantic_caches, get_semantic_cache_stats
+from ..rank_fusion import fuse_results
+from ..search_fanout import fan_out
+from ..solr_sync import get_solr_sync_job
+from ..solr_export import get_solr_export_job
 import logging
 from datetime import datetime
 import json
 import asyncio
 import os
+import time
 
 # Initialize services
 neo4j_service = get_neo4j_service()
@@ -208,9 +217,28 @@ async def get_solr_search(
     type: Optional[str] = Query(None, description="Filter by type (node/relationship)"),
     group: Optional[str] = Query(None, description="Filter by node group"),
     limit: int = Query(20, description="Maximum number of results"),
-    offset: int = Query(0, description="Offset for pagination")
+    offset: int = Query(0, description="Offset for pagination"),
+    facet: Optional[List[str]] = Query(None, description="Field to count values of (repeatable), e.g. group or type"),
+    range_facet: Optional[List[str]] = Query(None, description="Range facet as field,start,end,gap (repeatable)"),
+    stats: Optional[List[str]] = Query(None, description="Numeric field to compute min/max/sum/mean for (repeatable)"),
+    facet_limit: int = Query(20, description="Maximum buckets per facet field"),
+    cursor: Optional[str] = Query(None, description="'*' to start cursor paging (sorted by id), then the previous next_cursor"),
+    fl: Optional[str] = Query(None, description="Comma-separated fields to return, or 'display' for the list-view fields; all stored fields if omitted"),
+    highlight: bool = Query(False, description="Attach matching snippets to each result"),
+    hl_fields: Optional[str] = Query(None, description="Comma-separated fields to highlight (default content)"),
+    snippet_length: int = Query(150, description="Approximate highlight snippet size in characters")
 ):
-    """Search indexed data in Solr"""
+    """Search indexed data in Solr, with optional facets and stats over all matches"""
+    facet_ranges = []
+    for spec in range_facet or []:
+        parts = [part.strip() for part in spec.split(",")]
+        if len(parts) != 4 or not all(parts):
+            raise HTTPException(status_code=400, detail=f"Invalid range_facet '{spec}'; expected field,start,end,gap")
+        facet_ranges.append(dict(zip(("field", "start", "end", "gap"), parts)))
+
+    fields = DISPLAY_FIELDS if fl == "display" else [f.strip() for f in (fl or "").split(",") if f.strip()]
+    highlight_fields = [f.strip() for f in (hl_fields or "").split(",") if f.strip()]
+
     try:
         logger.info(f"Solr search query: {q}, filters: type={type}, group={group}")
 
@@ -222,9 +250,15 @@ async def get_solr_search(
             filters["group"] = group
 
         # Perform search
-        result = await solr_service.search(q, filters, limit, offset)
+        result = await solr_service.search(
+            q, filters, limit, offset,
+            facet_fields=facet, facet_ranges=facet_ranges or None,
+            stats_fields=stats, facet_limit=facet_limit, cursor=cursor,
+            fields=fields or None, highlight=highlight,
+            highlight_fields=highlight_fields or None, snippet_length=snippet_length
+        )
 
-        return {
+        response = {
             "query": q,
             "filters": filters,
             "total": result.get("total", 0),
@@ -232,7 +266,13 @@ async def get_solr_search(
             "limit": limit,
             "offset": offset
         }
+        for key in ("facets", "range_facets", "stats", "next_cursor"):
+            if key in result:
+                response[key] = result[key]
+        return response
 
+    except ValueError as error:
+        raise HTTPException(status_code=400, detail=str(error))
     except Exception as error:
         logger.error(f"Error searching Solr: {error}")
         raise HTTPException(
@@ -243,6 +283,31 @@ async def get_solr_search(
             }
         )
 
+@router.get("/solr/search/export")
+async def get_solr_search_export(
+    q: str = Query(..., description="Search query"),
+    type: Optional[str] = Query(None, description="Filter by type (node/relationship)"),
+    group: Optional[str] = Query(None, description="Filter by node group"),
+    page_size: int = Query(500, description="Documents fetched from Solr per cursor page")
+):
+    """Stream every matching document as newline-delimited JSON, paging with cursorMark"""
+    filters = {}
+    if type:
+        filters["type"] = type
+    if group:
+        filters["group"] = group
+
+    async def export_lines():
+        try:
+            async for docs in solr_service.iterate_search(q, filters, page_size):
+                yield "".join(json.dumps(doc, default=str) + "\n" for doc in docs)
+        except Exception as error:
+            # Headers are already sent; end the stream with an error line
+            logger.error(f"Error exporting Solr search results: {error}")
+            yield json.dumps({"error": str(error)}) + "\n"
+
+    return StreamingResponse(export_lines(), media_type="application/x-ndjson")
+
 @router.post("/solr/clear")
 async def post_clear_solr():
     """Clear all documents from Solr index"""
@@ -276,6 +341,7 @@ async def get_solr_stats():
         stats = await solr_service.get_index_stats()
         return {
             "solr_stats": stats,
+            "commit_policy": solr_service.get_commit_stats(),
             "collection": "neoboi_graph",
             "solr_url": os.getenv("SOLR_URL", "http://localhost:8983")
         }
@@ -290,11 +356,79 @@ async def get_solr_stats():
             }
         )
 
+@router.post("/solr/sync")
+async def post_sync_solr(
+    max_pages: Optional[int] = Query(None, description="Stop after this many pages per phase; the next call resumes")
+):
+    """Incrementally sync changed and deleted graph elements into Solr"""
+    sync_job = get_solr_sync_job()
+    if sync_job.get_status()["running"]:
+        raise HTTPException(status_code=409, detail="Solr sync is already running")
+
+    try:
+        await ensure_neo4j_initialized()
+        result = await sync_job.run(max_pages=max_pages)
+        return {
+            "message": "Solr sync completed" if result["complete"] else "Solr sync paused; call again to resume",
+            "result": result,
+            "status": "completed" if result["complete"] else "partial"
+        }
+
+    except Exception as error:
+        logger.error(f"Error syncing Solr: {error}")
+        raise HTTPException(
+            status_code=500,
+            detail={
+                "error": "Failed to sync Solr",
+                "details": str(error)
+            }
+        )
+
+@router.get("/solr/sync/status")
+async def get_solr_sync_status():
+    """Get the incremental sync checkpoint and last run summary"""
+    return get_solr_sync_job().get_status()
+
+@router.post("/solr/export")
+async def post_export_solr(
+    restart: bool = Query(False, description="Ignore the checkpoint and export the whole graph again")
+):
+    """Start a full-graph export into Solr as a background job (resumes an interrupted export)"""
+    export_job = get_solr_export_job()
+    if export_job.get_status()["running"]:
+        raise HTTPException(status_code=409, detail="Solr export is already running")
+
+    try:
+        await ensure_neo4j_initialized()
+        export_job.start_background(restart=restart)
+        return {
+            "message": "Solr export started; poll /api/solr/export/status for progress",
+            "status": "started"
+        }
+
+    except Exception as error:
+        logger.error(f"Error starting Solr export: {error}")
+        raise HTTPException(
+            status_code=500,
+            detail={
+                "error": "Failed to start Solr export",
+                "details": str(error)
+            }
+        )
+
+@router.get("/solr/export/status")
+async def get_solr_export_status():
+    """Get full export progress and the checkpoint on disk"""
+    return get_solr_export_job().get_status()
+
 @router.get("/vector/search")
 async def get_vector_search(
     q: str = Query(..., description="Search query for vector similarity"),
     limit: int = Query(10, description="Maximum number of similar chunks to return"),
-    threshold: float = Query(0.7, description="Similarity threshold (0.0-1.0)")
+    threshold: Optional[float] = Query(None, description="Similarity threshold (0.0-1.0); unfiltered if omitted"),
+    keywords: Optional[str] = Query(None, description="Keywords chunks must also match (Solr backend)"),
+    filename: Optional[str] = Query(None, description="Only chunks of this document (Solr backend)"),
+    backend: Optional[str] = Query(None, description="Vector backend: neo4j or solr (default VECTOR_BACKEND)")
 ):
     """Search document chunks using vector similarity"""
     try:
@@ -302,7 +436,10 @@ async def get_vector_search(
         await ensure_neo4j_initialized()
 
         # Perform vector similarity search
-        search_results = await neo4j_service.vector_similarity_search(q, limit, threshold)
+        search_results = await neo4j_service.vector_similarity_search(
+            q, limit, threshold, keywords=keywords,
+            filters={"document_filename": filename} if filename else None, backend=backend
+        )
 
         return {
             "query": q,
@@ -310,7 +447,9 @@ async def get_vector_search(
             "total_found": len(search_results.get("results", [])),
             "threshold": threshold,
             "limit": limit,
-            "search_type": "vector_similarity"
+            "backend": search_results.get("backend", backend or neo4j_service.vector_backend),
+            "search_type": "vector_similarity",
+            **({"error": search_results["error"]} if "error" in search_results else {})
         }
 
     except Exception as error:
@@ -393,8 +532,13 @@ async def get_combined_data(include_unstructured: bool = True, include_search: b
         if include_search:
             try:
                 # Get recent search results from Solr
-                search_results = await solr_service.search("*", limit=20)  # Get recent results
+                # Get recent results; type/group breakdowns are counted by Solr over the whole index
+                search_results = await solr_service.search(
+                    "*", limit=20, facet_fields=["type", "group"], fields=DISPLAY_FIELDS
+                )
                 combined_data['search_results'] = search_results.get('docs', [])
+                combined_data['search_facets'] = search_results.get('facets', {})
+                combined_data['search_total'] = search_results.get('total', 0)
 
                 logger.info(f"Added {len(combined_data['search_results'])} search results")
 
@@ -544,6 +688,46 @@ async def get_neo4j_status():
             "message": f"Neo4j {deployment_info.get('deployment_type')} deployment is not accessible"
         }
 
+@router.get("/cache/stats")
+async def get_cache_stats():
+    """Get hit/miss statistics for all caches"""
+    try:
+        return {
+            "cache_stats": get_cache_service().get_stats(),
+            "semantic_cache_stats": get_semantic_cache_stats(),
+            "timestamp": datetime.now().isoformat()
+        }
+
+    except Exception as error:
+        logger.error(f"Error getting cache stats: {error}")
+        raise HTTPException(status_code=500, detail=f"Failed to get cache statistics: {str(error)}")
+
+@router.post("/cache/clear")
+async def post_clear_cache(
+    cache: Optional[str] = Query(None, description="Cache to purge (search, embedding, vector, integrated, semantic); all caches if omitted")
+):
+    """Purge one cache or all caches"""
+    cache_service = get_cache_service()
+    try:
+        if cache == "semantic":
+            clear_semantic_caches()
+        elif cache:
+            cache_service.clear(cache)
+        else:
+            cache_service.clear_all()
+            clear_semantic_caches()
+
+        return {
+            "message": f"Successfully cleared {cache or 'all'} cache",
+            "status": "completed"
+        }
+
+    except ValueError as error:
+        raise HTTPException(status_code=400, detail=str(error))
+    except Exception as error:
+        logger.error(f"Error clearing cache: {error}")
+        raise HTTPException(status_code=500, detail=f"Failed to clear cache: {str(error)}")
+
 # Import and include unstructured data routes
 try:
     from .unstructured import router as unstructured_router
@@ -554,7 +738,23 @@ except ImportError as e:
 except Exception as e:
     logger.error(f"Error loading unstructured routes: {e}")
 
+def cacheable_integrated_result(result: Dict[str, Any]) -> bool:
+    """
+    Whether an integrated search response is complete enough to cache
+
+    Degraded responses are returned but not cached: no backend ran, a
+    backend timed out or failed, or an LLM step fell back to a canned answer.
+    """
+    backends = result.get("backends", {})
+    return (bool(backends)
+            and all(backend["status"] == "ok" for backend in backends.values())
+            and all(result.get("llm_status", {}).values()))
+
 @router.post("/search/integrated")
+@cached(
+    "integrated", tags=(SCOPE_SOLR, SCOPE_CHUNKS, SCOPE_GRAPH, SCOPE_DOCUMENT),
+    should_cache=cacheable_integrated_result
+)
 async def post_integrated_search(request: Dict[str, Any]):
     """
     Unified search endpoint that orchestrates across Solr, Neo4j, and LLM systems
@@ -573,12 +773,13 @@ async def post_integrated_search(request: Dict[str, Any]):
         await ensure_neo4j_initialized()
 
         # Import LLM service for orchestration
-        from ..unstructured_pipeline.llm_service import OfflineLLMService
-        llm_service = OfflineLLMService()
+        from ..unstructured_pipeline.llm_service import get_llm_service
+        llm_service = get_llm_service()
 
         # Step 1: Analyze query intent
-        intent_analysis = llm_service.analyze_query_intent(user_query)
-        if not intent_analysis.get('success'):
+        intent_analysis = await llm_service.analyze_query_intent(user_query)
+        intent_ok = bool(intent_analysis.get('success'))
+        if not intent_ok:
             logger.warning(f"Query intent analysis failed: {intent_analysis.get('error')}")
             # Fall back to hybrid search
             intent_analysis = {
@@ -589,52 +790,54 @@ async def post_integrated_search(request: Dict[str, Any]):
             }
 
         # Step 2: Generate system-specific queries
-        system_queries = llm_service.generate_system_queries(user_query, intent_analysis.get('analysis', {}))
+        system_queries = await llm_service.generate_system_queries(user_query, intent_analysis.get('analysis', {}))
+
+        # Step 3: Execute searches across systems concurrently, each under its own deadline
+        queries = system_queries.get('system_queries', {})
+        search_calls = {}
+        if queries.get('solr_query'):
+            search_calls['solr'] = lambda: solr_service.search(
+                queries['solr_query'], limit=20, fields=DISPLAY_FIELDS, highlight=True
+            )
+        if queries.get('vector_query'):
+            search_calls['vector'] = lambda: neo4j_service.vector_similarity_search(queries['vector_query'], limit=10)
+        if queries.get('graph_query'):
+            search_calls['graph'] = lambda: neo4j_service.execute_query(queries['graph_query'], {})
+
+        search_started = time.perf_counter()
+        outcomes = await fan_out(
+            search_calls, timeouts=search_options.get("timeouts"), budget=search_options.get("budget")
+        )
+        search_time = time.perf_counter() - search_started
+
+        def backend_results(name: str, key: str) -> List[Any]:
+            outcome = outcomes.get(name)
+            return (outcome["result"] or {}).get(key, []) if outcome and outcome["status"] == "ok" else []
 
-        # Step 3: Execute parallel searches across systems
-        search_tasks = []
         search_results = {
-            'solr_results': [],
+            'solr_results': backend_results('solr', 'docs'),
             'neo4j_results': [],
-            'graph_results': [],
-            'vector_results': []
+            'graph_results': backend_results('graph', 'rawRecords'),
+            'vector_results': backend_results('vector', 'results')
+        }
+        backend_status = {
+            name: {key: value for key, value in outcome.items() if key != "result"}
+            for name, outcome in outcomes.items()
         }
 
-        # Solr search
-        if system_queries.get('system_queries', {}).get('solr_query'):
-            try:
-                solr_query = system_queries['system_queries']['solr_query']
-                solr_result = await solr_service.search(solr_query, limit=20)
-                search_results['solr_results'] = solr_result.get('docs', [])
-            except Exception as e:
-                logger.error(f"Solr search failed: {e}")
-                search_results['solr_results'] = []
-
-        # Neo4j vector search
-        if system_queries.get('system_queries', {}).get('vector_query'):
-            try:
-                vector_description = system_queries['system_queries']['vector_query']
-                vector_result = await neo4j_service.vector_similarity_search(vector_description, limit=10)
-                search_results['vector_results'] = vector_result.get('results', [])
-            except Exception as e:
-                logger.error(f"Vector search failed: {e}")
-                search_results['vector_results'] = []
-
-        # Neo4j graph search
-        if system_queries.get('system_queries', {}).get('graph_query'):
-            try:
-                graph_query = system_queries['system_queries']['graph_query']
-                graph_result = await neo4j_service.execute_query(graph_query, {})
-                search_results['graph_results'] = graph_result.get('rawRecords', [])
-            except Exception as e:
-                logger.error(f"Graph search failed: {e}")
-                search_results['graph_results'] = []
-
-        # Step 4: Fuse multi-system results
-        fused_results = llm_service.fuse_multi_system_results(user_query, search_results)
+        # Step 4: Fuse multi-system results (deterministic RRF unless LLM fusion is requested)
+        fusion_method = search_options.get("fusion", os.getenv("FUSION_METHOD", "rrf")).lower()
+        if fusion_method == "llm":
+            fused_results = await llm_service.fuse_multi_system_results(user_query, search_results)
+        else:
+            fused_results = fuse_results(user_query, {
+                "solr": search_results['solr_results'],
+                "vector": search_results['vector_results'],
+                "graph": search_results['graph_results']
+            }, weights=search_options.get("fusion_weights"))
 
         # Step 5: Generate integrated response
-        integrated_response = llm_service.generate_integrated_response(
+        integrated_response = await llm_service.generate_integrated_response(
             user_query,
             fused_results,
             conversation_context
@@ -659,14 +862,23 @@ async def post_integrated_search(request: Dict[str, Any]):
                     'results': search_results['graph_results'][:5]
                 }
             },
+            'backends': backend_status,
             'fused_results': fused_results.get('fused_analysis', {}),
+            'fusion_method': fused_results.get('method', 'llm'),
             'response': integrated_response.get('integrated_response', {}),
             'processing_time': {
                 'intent_analysis': intent_analysis.get('processing_time', 0),
+                'search': round(search_time, 3),
                 'fused_results': fused_results.get('processing_time', 0),
                 'integrated_response': integrated_response.get('processing_time', 0)
             },
             'model_used': integrated_response.get('model', 'unknown'),
+            # Which LLM steps produced a real answer rather than a fallback
+            'llm_status': {
+                'intent_analysis': intent_ok,
+                'system_queries': bool(system_queries.get('success')) and not system_queries.get('failed'),
+                'integrated_response': bool(integrated_response.get('success'))
+            },
             'timestamp': datetime.now().isoformat()
         }
 
@@ -11,9 +11,10 @@ import json
 
 from ..unstructured_pipeline.document_ingestion import DocumentIngestionService
 from ..unstructured_pipeline.data_processing import DataProcessingPipeline
-from ..unstructured_pipeline.llm_service import OfflineLLMService
+from ..unstructured_pipeline.llm_service import get_llm_service
 from ..unstructured_pipeline.tika_service import TikaService
 from ..neo4j_service import get_neo4j_service
+from ..invalidation_bus import SCOPE_DOCUMENT, get_invalidation_bus
 
 logger = logging.getLogger(__name__)
 
@@ -22,7 +23,7 @@ router = APIRouter(prefix="/api/unstructured", tags=["unstructured-data"])
 # Initialize services
 ingestion_service = DocumentIngestionService()
 processing_pipeline = DataProcessingPipeline()
-llm_service = OfflineLLMService()
+llm_service = get_llm_service()
 tika_service = TikaService()
 neo4j_service = get_neo4j_service()
 
@@ -95,6 +96,7 @@ async def upload_document(
 
                 # Combine results
                 result['neo4j_context'] = neo4j_result
+                get_invalidation_bus().publish(SCOPE_DOCUMENT, source="unstructured.upload", filename=unique_filename)
 
                 return {
                     'success': True,
@@ -156,6 +158,7 @@ async def process_document_background(file_content: bytes, unique_filename: str,
 
             # Save final result
             ingestion_service._save_processing_result(result)
+            get_invalidation_bus().publish(SCOPE_DOCUMENT, source="unstructured.background", filename=unique_filename)
 
         logger.info(f"Background processing completed for {unique_filename}")
 
@@ -235,7 +238,7 @@ async def analyze_document(filename: str) -> Dict[str, Any]:
         4. Insights and patterns
         """
 
-        analysis = llm_service.analyze_document(analysis_prompt, "document_with_context")
+        analysis = await llm_service.analyze_document(analysis_prompt, "document_with_context")
 
         return {
             'success': True,
@@ -272,7 +275,7 @@ async def search_documents(query: str, use_llm: bool = True, search_type: str =
         if use_llm and integrated_results.get("solr_results"):
             # Get LLM analysis of search results
             search_context = f"Search query: {query}\n\nResults found: {len(integrated_results.get('solr_results', []))} documents"
-            llm_analysis = llm_service.analyze_document(search_context, "search_results")
+            llm_analysis = await llm_service.analyze_document(search_context, "search_results")
 
             integrated_results["llm_search_analysis"] = llm_analysis
 
@@ -323,7 +326,7 @@ async def question_answer(question: str, context_filename: Optional[str] = None)
                 raise HTTPException(status_code=400, detail="No documents available for Q&A")
 
         # Get answer from LLM
-        answer = llm_service.answer_question(question, context)
+        answer = await llm_service.answer_question(question, context)
 
         return {
             'success': True,
@@ -378,8 +381,9 @@ async def get_service_status() -> Dict[str, Any]:
     try:
         services_status = {
             'tika_server': tika_service._is_server_running(),
-            'llm_service': llm_service.is_service_available(),
-            'available_models': llm_service.list_available_models() if llm_service.is_service_available() else [],
+            'llm_service': await llm_service.is_service_available(),
+            'available_models': await llm_service.list_available_models(),
+            'llm_health': llm_service.get_health(),
             'supported_formats': ingestion_service.get_supported_formats(),
             'processed_documents_count': len(ingestion_service.list_processed_documents()),
             'neo4j_connection': neo4j_service._is_connected() if hasattr(neo4j_service, '_is_connected') else True
@@ -407,6 +411,7 @@ async def delete_document(filename: str) -> Dict[str, Any]:
                 result_file = doc.get('result_file')
                 if result_file and os.path.exists(result_file):
                     os.remove(result_file)
+                    get_invalidation_bus().publish(SCOPE_DOCUMENT, source="unstructured.delete", filename=filename)
 
                 return {
                     'success': True,
@@ -0,0 +1,116 @@
+"""
+Concurrent Search Fan-Out for NeoBoi Application
+
+Runs independent backend calls (Solr, vector search, graph search) at the
+same time instead of one after another, so a request costs roughly its
+slowest backend rather than the sum of all of them.
+
+- Deadlines: each backend gets its own timeout (INTEGRATED_SEARCH_TIMEOUTS,
+  e.g. "solr=2,vector=5,graph=5") and no call may outlive the request budget
+  (INTEGRATED_SEARCH_BUDGET seconds). A call past its deadline is cancelled.
+- Partial results: a slow or failing backend never fails the request; its
+  entry reports status "timeout" or "error" and the others are returned.
+- Deadline propagation: cancelling the awaiter cannot stop a call that is
+  blocked in a worker thread or on the server, so each call also sees its
+  deadline through remaining_time(). Services pass it on as their own
+  timeout (Neo4j transaction timeout, Solr HTTP timeout), so the work
+  itself stops instead of running on after the request has moved on.
+
+Usage:
+    from search_fanout import fan_out
+
+    outcomes = await fan_out({
+        "solr": lambda: solr_service.search(query),
+        "vector": lambda: neo4j_service.vector_similarity_search(query)
+    })
+    outcomes["solr"]  # {"status": "ok", "latency_ms": 42.1, "result": {...}}
+"""
+
+import asyncio
+import contextvars
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUTS = {"solr": 2.0, "vector": 5.0, "graph": 5.0}
+
+# Event loop time by which the current fan-out call must finish (unset outside fan_out)
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("search_deadline", default=None)
+
+def remaining_time() -> Optional[float]:
+    """Seconds left before the current fan-out call's deadline, or None outside fan_out"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return max(0.0, deadline - asyncio.get_running_loop().time())
+
+def _parse_timeouts(spec: str) -> Dict[str, float]:
+    timeouts = {}
+    for part in spec.split(","):
+        if "=" in part:
+            backend, seconds = part.split("=", 1)
+            try:
+                timeouts[backend.strip()] = float(seconds)
+            except ValueError:
+                logger.warning(f"Ignoring invalid search timeout '{part}'")
+    return timeouts
+
+def get_search_timeouts() -> Dict[str, float]:
+    """Per-backend deadlines in seconds: defaults overridden by INTEGRATED_SEARCH_TIMEOUTS"""
+    return {**DEFAULT_TIMEOUTS, **_parse_timeouts(os.getenv("INTEGRATED_SEARCH_TIMEOUTS", ""))}
+
+def get_search_budget() -> float:
+    """Overall request budget in seconds (INTEGRATED_SEARCH_BUDGET)"""
+    return float(os.getenv("INTEGRATED_SEARCH_BUDGET", "8"))
+
+def _failed(result: Any) -> Optional[str]:
+    # Services report most failures in the result dict rather than raising
+    if isinstance(result, dict) and (result.get("success") is False or result.get("error")):
+        return str(result.get("error") or "unknown error")
+    return None
+
+async def _run(name: str, call: Callable[[], Awaitable[Any]], timeout: float) -> Dict[str, Any]:
+    started = time.perf_counter()
+    # Each _run is its own task under gather, so this only scopes this backend's call
+    _deadline.set(asyncio.get_running_loop().time() + timeout)
+    try:
+        result = await asyncio.wait_for(call(), timeout=timeout)
+        error = _failed(result)
+        outcome = {"status": "error", "error": error, "result": result} if error else {"status": "ok", "result": result}
+    except asyncio.TimeoutError:
+        logger.warning(f"{name} search exceeded its {timeout}s deadline")
+        outcome = {"status": "timeout", "error": f"No response within {timeout}s", "result": None}
+    except Exception as e:
+        logger.error(f"{name} search failed: {e}")
+        outcome = {"status": "error", "error": str(e), "result": None}
+    outcome["latency_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    outcome["timeout_s"] = timeout
+    return outcome
+
+async def fan_out(calls: Dict[str, Callable[[], Awaitable[Any]]],
+                  timeouts: Optional[Dict[str, float]] = None,
+                  budget: Optional[float] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Run backend calls concurrently, each under its own deadline
+
+    Args:
+        calls: Backend name -> zero-argument coroutine factory
+        timeouts: Backend name -> seconds (default get_search_timeouts(); unknown backends get the budget)
+        budget: Overall seconds no call may exceed (default get_search_budget())
+
+    Returns:
+        Backend name -> {'status': 'ok'|'timeout'|'error', 'latency_ms',
+        'timeout_s', 'result'} plus 'error' when the call did not succeed
+    """
+    timeouts = {**get_search_timeouts(), **(timeouts or {})}
+    budget = budget if budget is not None else get_search_budget()
+
+    # Every call starts now, so capping each deadline at the budget bounds the whole fan-out
+    names = list(calls)
+    outcomes = await asyncio.gather(*(
+        _run(name, calls[name], min(timeouts.get(name, budget), budget)) for name in names
+    ))
+    return dict(zip(names, outcomes))
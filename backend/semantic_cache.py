@@ -0,0 +1,310 @@
+"""
+Semantic LLM Response Cache for NeoBoi Application
+
+Caches LLM answers by the meaning of the question rather than its exact text,
+so "what suppliers do we have?" and "list our suppliers" share one Ollama
+call. Each entry is the embedding of the normalized question plus a
+fingerprint of the context it was answered in (document text, fused search
+results, graph statistics, model). A lookup only considers entries with the
+same fingerprint and returns the nearest one whose cosine similarity clears
+the threshold.
+
+Questions are embedded with the Neo4j service's sentence-transformers model
+(EMBEDDING_MODEL, through its embedding caches and persistent store) when it
+is loaded, so each process holds one copy of the model, and with hashed
+character n-grams otherwise. Async callers use lookup_async/store_async, which
+embed in a worker thread so model inference never blocks the event loop.
+
+Answers that are acted on rather than shown (e.g. generated Cypher) should be
+looked up with exact=True: only the same normalized question matches.
+
+Configuration:
+- SEMANTIC_CACHE_ENABLED:     true/false (default true)
+- SEMANTIC_CACHE_THRESHOLD:   minimum cosine similarity for a hit (default 0.92)
+- SEMANTIC_CACHE_MAX_ENTRIES: entries per cache before the oldest is dropped (default 1000)
+- SEMANTIC_CACHE_TTL:         entry lifetime in seconds (default 3600)
+
+Usage:
+    from semantic_cache import get_semantic_cache, context_fingerprint
+
+    cache = get_semantic_cache("answer")
+    fingerprint = context_fingerprint(model, document_text)
+    hit = await cache.lookup_async(question, fingerprint)
+    if hit is None:
+        answer = await ask_llm(question)
+        await cache.store_async(question, answer, fingerprint)
+"""
+
+import asyncio
+import copy
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    from .neo4j_service import get_neo4j_service
+except ImportError:  # Imported as a top-level module by the standalone scripts
+    from neo4j_service import get_neo4j_service
+
+logger = logging.getLogger(__name__)
+
+HASHED_DIMENSIONS = 1024
+
+def normalize_question(question: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation"""
+    return " ".join(question.lower().split()).rstrip("?!. ")
+
+def context_fingerprint(*parts: Any) -> str:
+    """Stable hash of whatever context an answer was generated from"""
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def hashed_ngram_embedding(text: str, dimensions: int = HASHED_DIMENSIONS) -> np.ndarray:
+    """Unit vector of hashed word and character-trigram counts"""
+    vector = np.zeros(dimensions, dtype=np.float32)
+    words = text.split()
+    features = words + [
+        word[i:i + 3] for word in (f" {w} " for w in words) for i in range(len(word) - 2)
+    ]
+    for feature in features:
+        digest = hashlib.md5(feature.encode("utf-8")).digest()
+        vector[int.from_bytes(digest[:4], "little") % dimensions] += 1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+class _ModelEmbedder:
+    """Embeds with the Neo4j service's model instead of loading a second copy"""
+
+    def __init__(self, neo4j_service):
+        self.service = neo4j_service
+
+    def __call__(self, text: str) -> np.ndarray:
+        vector = np.asarray(self.service._encode_texts([text])[0], dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+_default_embedder: Optional[Callable[[str], np.ndarray]] = None
+_default_embedder_lock = threading.Lock()
+
+def get_default_embedder() -> Callable[[str], np.ndarray]:
+    """The Neo4j service's embedding model if loaded, hashed n-grams otherwise"""
+    global _default_embedder
+    with _default_embedder_lock:
+        if _default_embedder is None:
+            try:
+                service = get_neo4j_service()
+                if service.embedding_model is not None:
+                    _default_embedder = _ModelEmbedder(service)
+                    logger.info(f"Semantic cache embedding questions with '{service.embedding_model_name}'")
+            except Exception as e:
+                logger.warning(f"Embedding model unavailable to the semantic cache, using hashed n-grams: {e}")
+            if _default_embedder is None:
+                _default_embedder = hashed_ngram_embedding
+        return _default_embedder
+
+class SemanticCacheEntry:
+    """A cached answer and the embedding of the question it answered"""
+
+    def __init__(self, question: str, vector: np.ndarray, value: Any, fingerprint: str):
+        self.question = question
+        self.vector = vector
+        self.value = value
+        self.fingerprint = fingerprint
+        self.created_at = time.time()
+        self.hits = 0
+
+class SemanticCache:
+    """Thread-safe nearest-neighbour cache of LLM responses"""
+
+    def __init__(self, name: str, embed_fn: Optional[Callable[[str], np.ndarray]] = None,
+                 threshold: Optional[float] = None, max_entries: Optional[int] = None,
+                 ttl_seconds: Optional[float] = None):
+        self.name = name
+        self._embed_fn = embed_fn
+        self.threshold = threshold if threshold is not None else float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+        self.max_entries = max_entries or int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "1000"))
+        self.ttl_seconds = ttl_seconds or float(os.getenv("SEMANTIC_CACHE_TTL", "3600"))
+        self.enabled = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+
+        self.lock = threading.Lock()
+        # Entries are only compared within the same context fingerprint
+        self._partitions: Dict[str, List[SemanticCacheEntry]] = {}
+        self._insertion_order: Deque[SemanticCacheEntry] = deque()
+
+        self.hits = 0
+        self.misses = 0
+        self.similarity_total = 0.0
+        self.saved_seconds = 0.0
+
+    def _embed(self, question: str) -> np.ndarray:
+        embed_fn = self._embed_fn or get_default_embedder()
+        return np.asarray(embed_fn(normalize_question(question)), dtype=np.float32)
+
+    async def _embed_async(self, question: str) -> np.ndarray:
+        # Loading and running the model is CPU-bound; keep it off the event loop
+        return await asyncio.get_running_loop().run_in_executor(None, self._embed, question)
+
+    def lookup(self, question: str, fingerprint: str = "", exact: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Find the cached answer to the most similar question asked in the same context
+
+        Args:
+            question: The question being asked
+            fingerprint: Context fingerprint; only entries with the same one are compared
+            exact: Only match the same normalized question (no embedding needed)
+
+        Returns:
+            A copy of the cached value with a ``semantic_cache`` provenance dict
+            (similarity, matched question, age), or None on a miss
+        """
+        if not self.enabled:
+            return None
+        return self._lookup(question, None if exact else self._embed(question), fingerprint)
+
+    async def lookup_async(self, question: str, fingerprint: str = "",
+                           exact: bool = False) -> Optional[Dict[str, Any]]:
+        """lookup with the question embedded in a worker thread"""
+        if not self.enabled:
+            return None
+        vector = None if exact else await self._embed_async(question)
+        return self._lookup(question, vector, fingerprint)
+
+    def _lookup(self, question: str, vector: Optional[np.ndarray], fingerprint: str) -> Optional[Dict[str, Any]]:
+        """Nearest entry to vector, or the exact normalized question when vector is None"""
+        now = time.time()
+        with self.lock:
+            entries = [
+                entry for entry in self._partitions.get(fingerprint, [])
+                if now - entry.created_at <= self.ttl_seconds
+            ]
+            best: Optional[Tuple[float, SemanticCacheEntry]] = None
+            if vector is None:
+                normalized = normalize_question(question)
+                matches = [entry for entry in entries if normalize_question(entry.question) == normalized]
+                if matches:
+                    best = (1.0, matches[-1])
+            elif entries:
+                similarities = np.stack([entry.vector for entry in entries]) @ vector
+                index = int(np.argmax(similarities))
+                if similarities[index] >= self.threshold:
+                    best = (float(similarities[index]), entries[index])
+
+            if best is None:
+                self.misses += 1
+                return None
+
+            similarity, entry = best
+            entry.hits += 1
+            self.hits += 1
+            self.similarity_total += similarity
+            value = copy.deepcopy(entry.value)
+
+        if isinstance(value, dict):
+            # The answer cost nothing this time; report the original cost as saved
+            saved = value.pop("total_duration", 0) / 1e9
+            with self.lock:
+                self.saved_seconds += saved
+            value["semantic_cache"] = {
+                "hit": True,
+                "cache": self.name,
+                "similarity": round(similarity, 4),
+                "matched_question": entry.question,
+                "cached_at": datetime.fromtimestamp(entry.created_at).isoformat(),
+                "age_seconds": round(now - entry.created_at, 1),
+                "saved_seconds": round(saved, 3)
+            }
+        logger.debug("Semantic cache '%s' hit (%.3f): %r -> %r", self.name, similarity, question, entry.question)
+        return value
+
+    def store(self, question: str, value: Any, fingerprint: str = "") -> None:
+        """Cache an answer for a question asked in a given context"""
+        if not self.enabled:
+            return
+        self._store(question, self._embed(question), value, fingerprint)
+
+    async def store_async(self, question: str, value: Any, fingerprint: str = "") -> None:
+        """store with the question embedded in a worker thread"""
+        if not self.enabled:
+            return
+        self._store(question, await self._embed_async(question), value, fingerprint)
+
+    def _store(self, question: str, vector: np.ndarray, value: Any, fingerprint: str) -> None:
+        entry = SemanticCacheEntry(question, vector, copy.deepcopy(value), fingerprint)
+        with self.lock:
+            self._partitions.setdefault(fingerprint, []).append(entry)
+            self._insertion_order.append(entry)
+            while len(self._insertion_order) > self.max_entries:
+                self._drop(self._insertion_order.popleft())
+
+            # Expired entries are dropped oldest-first as new ones arrive
+            now = time.time()
+            while self._insertion_order and now - self._insertion_order[0].created_at > self.ttl_seconds:
+                self._drop(self._insertion_order.popleft())
+
+    def _drop(self, entry: SemanticCacheEntry) -> None:
+        """Remove an entry from its partition; caller must hold the lock"""
+        partition = self._partitions.get(entry.fingerprint, [])
+        partition.remove(entry)
+        if not partition:
+            self._partitions.pop(entry.fingerprint, None)
+
+    def clear(self) -> None:
+        """Drop every cached answer and reset statistics"""
+        with self.lock:
+            self._partitions.clear()
+            self._insertion_order.clear()
+            self.hits = 0
+            self.misses = 0
+            self.similarity_total = 0.0
+            self.saved_seconds = 0.0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get semantic cache statistics"""
+        with self.lock:
+            total_requests = self.hits + self.misses
+            hit_rate = (self.hits / total_requests * 100) if total_requests > 0 else 0
+
+            return {
+                "enabled": self.enabled,
+                "size": len(self._insertion_order),
+                "contexts": len(self._partitions),
+                "max_entries": self.max_entries,
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate_percent": round(hit_rate, 2),
+                "avg_hit_similarity": round(self.similarity_total / self.hits, 4) if self.hits else 0,
+                "saved_llm_seconds": round(self.saved_seconds, 1)
+            }
+
+# Global semantic caches, one per kind of LLM call
+_semantic_caches: Dict[str, SemanticCache] = {}
+_semantic_caches_lock = threading.Lock()
+
+def get_semantic_cache(name: str) -> SemanticCache:
+    """Get the global semantic cache for a kind of LLM call (answer, integrated, chat)"""
+    with _semantic_caches_lock:
+        if name not in _semantic_caches:
+            _semantic_caches[name] = SemanticCache(name)
+        return _semantic_caches[name]
+
+def get_semantic_cache_stats() -> Dict[str, Any]:
+    """Statistics for every semantic cache"""
+    with _semantic_caches_lock:
+        caches = dict(_semantic_caches)
+    return {name: cache.get_stats() for name, cache in caches.items()}
+
+def clear_semantic_caches() -> None:
+    """Clear every semantic cache"""
+    with _semantic_caches_lock:
+        caches = list(_semantic_caches.values())
+    for cache in caches:
+        cache.clear()
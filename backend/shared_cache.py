@@ -0,0 +1,368 @@
+"""
+Shared Cache Tier for NeoBoi Application
+
+Second cache tier shared by every uvicorn worker on a host, so N workers do
+not keep N cold copies of the same search results. CacheService consults its
+in-process LRU first and this tier next.
+
+Backends (CACHE_SHARED_BACKEND):
+- sqlite: local SQLite file in WAL mode (default; no extra services needed)
+- redis:  any Redis-protocol server at CACHE_REDIS_URL (requires `redis`)
+- none:   disable the shared tier
+
+Values are stored as zlib-compressed compact JSON. Values that are not
+JSON-serializable are kept in the local tier only; a blob that cannot be
+decoded (corrupt or truncated) is dropped and counted as a miss. Each entry
+carries a hard expiry and a soft one (fresh_until) for stale-while-revalidate.
+
+The tier also holds a generation counter per invalidation scope. Any worker
+that sees a mutation bumps it, and CacheService folds the current generations
+into the keys of tagged entries, so entries cached before the mutation stop
+being served by every worker, not just the one that saw it.
+
+Backend calls block (SQLite busy timeout, Redis socket timeout); async
+callers run them through run_in_shared_executor so they never stall the
+event loop.
+"""
+
+import json
+import logging
+import os
+import asyncio
+import sqlite3
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+# Optional Redis client
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SQLITE_PATH = os.getenv(
+    "CACHE_SQLITE_PATH",
+    os.path.join(os.path.dirname(__file__), '..', 'sync_state', 'shared_cache.sqlite3')
+)
+
+# Dedicated threads for shared tier I/O, so slow calls cannot starve the default executor
+_shared_executor: Optional[ThreadPoolExecutor] = None
+
+def run_in_shared_executor(func: Callable[..., Any], *args: Any) -> Awaitable[Any]:
+    """Run a blocking shared tier call off the event loop"""
+    global _shared_executor
+    if _shared_executor is None:
+        _shared_executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv("CACHE_SHARED_THREADS", "4")), thread_name_prefix="cache-shared"
+        )
+    return asyncio.get_running_loop().run_in_executor(_shared_executor, func, *args)
+
+def encode_value(value: Any) -> Optional[bytes]:
+    """Serialize a value compactly, or return None if it is not JSON-serializable"""
+    try:
+        payload = json.dumps(value, separators=(",", ":")).encode("utf-8")
+    except (TypeError, ValueError):
+        return None
+    return zlib.compress(payload, 1)
+
+def decode_value(blob: bytes) -> Any:
+    """Inverse of encode_value"""
+    return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+# What a corrupt or truncated blob raises from decode_value
+DECODE_ERRORS = (zlib.error, UnicodeDecodeError, ValueError)
+
+class SQLiteSharedCache:
+    """Cross-process cache tier backed by a local SQLite database"""
+
+    def __init__(self, path: Optional[str] = None):
+        # Read at construction so tests and scripts can point CACHE_SQLITE_PATH elsewhere
+        self.path = path or os.getenv("CACHE_SQLITE_PATH", DEFAULT_SQLITE_PATH)
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._local = threading.local()
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache_entries ("
+            "namespace TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL, "
+            "expires_at REAL NOT NULL, fresh_until REAL, PRIMARY KEY (namespace, key))"
+        )
+        try:
+            # Databases created before stale-while-revalidate lack the soft expiry
+            conn.execute("ALTER TABLE cache_entries ADD COLUMN fresh_until REAL")
+        except sqlite3.OperationalError:
+            pass
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_expires ON cache_entries (expires_at)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache_generations ("
+            "scope TEXT PRIMARY KEY, generation INTEGER NOT NULL)"
+        )
+        conn.commit()
+        logger.info(f"SQLite shared cache tier at {self.path}")
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread; SQLite connections are not thread-safe"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, namespace: str, key: str) -> Optional[Tuple[Any, float, float]]:
+        """Get (value, expires_at, fresh_until) for a key, or None"""
+        try:
+            row = self._connection().execute(
+                "SELECT value, expires_at, COALESCE(fresh_until, expires_at) FROM cache_entries "
+                "WHERE namespace = ? AND key = ? AND expires_at > ?",
+                (namespace, key, time.time())
+            ).fetchone()
+        except sqlite3.Error as e:
+            self.errors += 1
+            logger.debug(f"Shared cache read failed: {e}")
+            return None
+
+        if row is None:
+            self.misses += 1
+            return None
+        try:
+            value = decode_value(row[0])
+        except DECODE_ERRORS as e:
+            logger.warning(f"Dropping undecodable shared cache entry {namespace}:{key}: {e!r}")
+            self.misses += 1
+            self.delete(namespace, key)
+            return None
+        self.hits += 1
+        return value, row[1], row[2]
+
+    def set(self, namespace: str, key: str, blob: bytes, ttl_seconds: float,
+            stale_seconds: float = 0) -> None:
+        """Store an encoded value, servable stale for stale_seconds past its TTL"""
+        fresh_until = time.time() + ttl_seconds
+        try:
+            self._connection().execute(
+                "INSERT OR REPLACE INTO cache_entries (namespace, key, value, expires_at, fresh_until) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (namespace, key, blob, fresh_until + stale_seconds, fresh_until)
+            )
+        except sqlite3.Error as e:
+            self.errors += 1
+            logger.debug(f"Shared cache write failed: {e}")
+
+    def delete(self, namespace: str, key: str) -> None:
+        """Delete a key"""
+        try:
+            self._connection().execute(
+                "DELETE FROM cache_entries WHERE namespace = ? AND key = ?", (namespace, key)
+            )
+        except sqlite3.Error as e:
+            self.errors += 1
+            logger.debug(f"Shared cache delete failed: {e}")
+
+    def clear(self, namespace: str) -> None:
+        """Delete every key in a namespace"""
+        try:
+            self._connection().execute("DELETE FROM cache_entries WHERE namespace = ?", (namespace,))
+        except sqlite3.Error as e:
+            self.errors += 1
+            logger.debug(f"Shared cache clear failed: {e}")
+
+    def get_generations(self, scopes: Tuple[str, ...]) -> Optional[Dict[str, int]]:
+        """Current generation of each invalidation scope, or None if unreadable"""
+        try:
+            rows = self._connection().execute(
+                f"SELECT scope, generation FROM cache_generations WHERE scope IN ({','.join('?' * len(scopes))})",
+                tuple(scopes)
+            ).fetchall()
+        except sqlite3.Error as e:
+            self.errors += 1
+            logger.debug(f"Shared cache generation read failed: {e}")
+            return None
+        generations = dict.fromkeys(scopes, 0)
+        generations.update(rows)
+        return generations
+
+    def bump_generation(self, scope: str) -> Optional[int]:
+        """Advance a scope's generation for every worker, return the new value"""
+        try:
+            conn = self._connection()
+            conn.execute(
+                "INSERT INTO cache_generations (scope, generation) VALUES (?, 1) "
+                "ON CONFLICT(scope) DO UPDATE SET generation = generation + 1",
+                (scope,)
+            )
+            return conn.execute(
+                "SELECT generation FROM cache_generations WHERE scope = ?", (scope,)
+            ).fetchone()[0]
+        except sqlite3.Error as e:
+            self.errors += 1
+            logger.warning(f"Shared cache generation bump for '{scope}' failed: {e}")
+            return None
+
+    def cleanup_expired(self) -> int:
+        """Delete expired rows (indexed on expires_at), return count removed"""
+        try:
+            cursor = self._connection().execute(
+                "DELETE FROM cache_entries WHERE expires_at <= ?", (time.time(),)
+            )
+            return cursor.rowcount
+        except sqlite3.Error as e:
+            self.errors += 1
+            logger.debug(f"Shared cache cleanup failed: {e}")
+            return 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get shared tier statistics (hit/miss counts are per process)"""
+        try:
+            entries = self._connection().execute("SELECT COUNT(*) FROM cache_entries").fetchone()[0]
+        except sqlite3.Error:
+            entries = None
+        return {
+            "backend": "sqlite",
+            "path": self.path,
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors
+        }
+
+class RedisSharedCache:
+    """Cross-process cache tier backed by a Redis-protocol server"""
+
+    def __init__(self, url: Optional[str] = None):
+        if not REDIS_AVAILABLE:
+            raise RuntimeError("redis package is not installed")
+        self.url = url or os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0")
+        self.client = redis.Redis.from_url(self.url, socket_timeout=0.5)
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        logger.info(f"Redis shared cache tier at {self.url}")
+
+    @staticmethod
+    def _key(namespace: str, key: str) -> str:
+        return f"neoboi:{namespace}:{key}"
+
+    @staticmethod
+    def _fresh_key(namespace: str, key: str) -> str:
+        # Kept under the namespace prefix so clear() removes it too
+        return f"neoboi:{namespace}:{key}:fresh_until"
+
+    def get(self, namespace: str, key: str) -> Optional[Tuple[Any, float, float]]:
+        """Get (value, expires_at, fresh_until) for a key, or None"""
+        try:
+            pipe = self.client.pipeline()
+            pipe.get(self._key(namespace, key))
+            pipe.pttl(self._key(namespace, key))
+            pipe.get(self._fresh_key(namespace, key))
+            blob, ttl_ms, fresh_until = pipe.execute()
+        except redis.RedisError as e:
+            self.errors += 1
+            logger.debug(f"Shared cache read failed: {e}")
+            return None
+
+        if blob is None:
+            self.misses += 1
+            return None
+        try:
+            value = decode_value(blob)
+        except DECODE_ERRORS as e:
+            logger.warning(f"Dropping undecodable shared cache entry {namespace}:{key}: {e!r}")
+            self.misses += 1
+            self.delete(namespace, key)
+            return None
+        self.hits += 1
+        expires_at = time.time() + max(ttl_ms, 0) / 1000
+        return value, expires_at, float(fresh_until) if fresh_until else expires_at
+
+    def set(self, namespace: str, key: str, blob: bytes, ttl_seconds: float,
+            stale_seconds: float = 0) -> None:
+        """Store an encoded value, servable stale for stale_seconds past its TTL"""
+        px = max(int((ttl_seconds + stale_seconds) * 1000), 1)
+        try:
+            pipe = self.client.pipeline()
+            pipe.set(self._key(namespace, key), blob, px=px)
+            pipe.set(self._fresh_key(namespace, key), time.time() + ttl_seconds, px=px)
+            pipe.execute()
+        except redis.RedisError as e:
+            self.errors += 1
+            logger.debug(f"Shared cache write failed: {e}")
+
+    def delete(self, namespace: str, key: str) -> None:
+        """Delete a key"""
+        try:
+            self.client.delete(self._key(namespace, key), self._fresh_key(namespace, key))
+        except redis.RedisError as e:
+            self.errors += 1
+            logger.debug(f"Shared cache delete failed: {e}")
+
+    def clear(self, namespace: str) -> None:
+        """Delete every key in a namespace"""
+        try:
+            for redis_key in self.client.scan_iter(match=self._key(namespace, "*"), count=500):
+                self.client.delete(redis_key)
+        except redis.RedisError as e:
+            self.errors += 1
+            logger.debug(f"Shared cache clear failed: {e}")
+
+    @staticmethod
+    def _generation_key(scope: str) -> str:
+        return f"neoboi-generation:{scope}"
+
+    def get_generations(self, scopes: Tuple[str, ...]) -> Optional[Dict[str, int]]:
+        """Current generation of each invalidation scope, or None if unreadable"""
+        try:
+            values = self.client.mget([self._generation_key(scope) for scope in scopes])
+        except redis.RedisError as e:
+            self.errors += 1
+            logger.debug(f"Shared cache generation read failed: {e}")
+            return None
+        return {scope: int(value or 0) for scope, value in zip(scopes, values)}
+
+    def bump_generation(self, scope: str) -> Optional[int]:
+        """Advance a scope's generation for every worker, return the new value"""
+        try:
+            return self.client.incr(self._generation_key(scope))
+        except redis.RedisError as e:
+            self.errors += 1
+            logger.warning(f"Shared cache generation bump for '{scope}' failed: {e}")
+            return None
+
+    def cleanup_expired(self) -> int:
+        """Redis expires keys itself"""
+        return 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get shared tier statistics (hit/miss counts are per process)"""
+        return {
+            "backend": "redis",
+            "url": self.url,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors
+        }
+
+def create_shared_cache():
+    """Create the shared tier configured by CACHE_SHARED_BACKEND, or None"""
+    backend = os.getenv("CACHE_SHARED_BACKEND", "sqlite").lower()
+    try:
+        if backend == "sqlite":
+            return SQLiteSharedCache()
+        if backend == "redis":
+            return RedisSharedCache()
+    except Exception as e:
+        logger.warning(f"Shared cache tier '{backend}' unavailable, using in-process cache only: {e}")
+        return None
+
+    if backend != "none":
+        logger.warning(f"Unknown CACHE_SHARED_BACKEND '{backend}', using in-process cache only")
+    return None
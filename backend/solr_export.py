@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Streaming Full-Graph Export into Solr for NeoBoi Application
+
+Indexes every node and relationship, for initial loads and disaster
+recovery. The graph is split into fixed ranges of internal ids, each read
+with an id seek, so a page costs the same anywhere in the graph. Up to
+SOLR_EXPORT_WORKERS ranges are exported concurrently; each worker holds only
+its current page, so memory stays bounded regardless of graph size.
+
+Completed ranges are recorded in a checkpoint file (SOLR_EXPORT_CHECKPOINT)
+after every page. An interrupted export resumes with the ranges that were not
+finished; failed ranges are retried on the next run.
+
+Usage (CLI):
+    python -m backend.solr_export [--range-size 5000] [--workers 4] [--restart]
+
+Usage (background job):
+    from solr_export import get_solr_export_job
+
+    get_solr_export_job().start_background()
+    get_solr_export_job().get_status()
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+try:
+    from .neo4j_service import get_neo4j_service
+    from .solr_service import solr_service
+    from .solr_sync import load_checkpoint, read_records, record_to_document, save_checkpoint
+except ImportError:  # Imported as a top-level module by the standalone scripts
+    from neo4j_service import get_neo4j_service
+    from solr_service import solr_service
+    from solr_sync import load_checkpoint, read_records, record_to_document, save_checkpoint
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHECKPOINT_PATH = os.getenv(
+    "SOLR_EXPORT_CHECKPOINT",
+    os.path.join(os.path.dirname(__file__), '..', 'sync_state', 'solr_export.json')
+)
+
+PHASES = ("nodes", "relationships")
+
+# id() is deprecated in Neo4j 5 but is the only id with cheap range seeks
+MAX_ID_QUERIES = {
+    "nodes": "MATCH (n) RETURN coalesce(max(id(n)), -1) AS max_id",
+    "relationships": "MATCH ()-[r]->() RETURN coalesce(max(id(r)), -1) AS max_id"
+}
+
+RANGE_QUERIES = {
+    "nodes": """
+        MATCH (n) WHERE id(n) IN range($lo, $hi - 1) AND NOT n:SolrSyncState
+        RETURN elementId(n) AS elementId, labels(n) AS labels, properties(n) AS properties
+    """,
+    "relationships": """
+        MATCH ()-[r]->() WHERE id(r) IN range($lo, $hi - 1)
+        RETURN elementId(r) AS elementId, type(r) AS type, properties(r) AS properties,
+               elementId(startNode(r)) AS startNodeElementId, elementId(endNode(r)) AS endNodeElementId
+    """
+}
+
+class SolrExportJob:
+    """Resumable, parallel export of the whole graph into Solr"""
+
+    def __init__(self, neo4j_service=None, solr=None, checkpoint_path: Optional[str] = None,
+                 range_size: Optional[int] = None, workers: Optional[int] = None):
+        self.neo4j = neo4j_service or get_neo4j_service()
+        self.solr = solr or solr_service
+        self.checkpoint_path = checkpoint_path or DEFAULT_CHECKPOINT_PATH
+        self.range_size = range_size or int(os.getenv("SOLR_EXPORT_RANGE_SIZE", "5000"))
+        self.workers = workers or int(os.getenv("SOLR_EXPORT_WORKERS", "4"))
+        self.lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.status: Dict[str, Any] = {"running": False}
+
+    def _initial_state(self) -> Dict[str, Any]:
+        # done_below: every range starting below it is exported
+        # completed: exported range starts at or above done_below
+        return {
+            "range_size": self.range_size,
+            "complete": False,
+            **{phase: {"max_id": None, "done_below": 0, "completed": [], "failed": []} for phase in PHASES}
+        }
+
+    def _read(self, query: str, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        return read_records(self.neo4j, query, params)
+
+    async def _query(self, query: str, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        return await asyncio.get_event_loop().run_in_executor(None, self._read, query, params)
+
+    def _save(self) -> None:
+        save_checkpoint(self.checkpoint_path, self.state)
+
+    async def _export_range(self, phase: str, start: int) -> None:
+        """Export one id range and record it in the checkpoint"""
+        state = self.state[phase]
+        progress = self.status[phase]
+        hi = start + self.state["range_size"]
+
+        try:
+            records = await self._query(RANGE_QUERIES[phase], {"lo": start, "hi": hi})
+            docs = [record_to_document(self.neo4j, self.solr, phase, record) for record in records]
+            # Parallelism comes from the range workers; one batch in flight per worker
+            result = await self.solr.bulk_index(docs, concurrency=1) if docs else {"indexed": 0, "failed_batches": []}
+            error = result["failed_batches"][0]["error"] if result["failed_batches"] else None
+        except Exception as e:
+            result = {"indexed": 0}
+            error = str(e)
+
+        if error:
+            logger.error(f"Solr export of {phase} ids {start}..{hi - 1} failed: {error}")
+            if start not in state["failed"]:
+                state["failed"].append(start)
+            progress["failed_ranges"] += 1
+            self.status["errors"].append({"phase": phase, "range": [start, hi - 1], "error": error})
+            del self.status["errors"][:-20]  # Keep the most recent errors only
+        else:
+            if start in state["failed"]:
+                state["failed"].remove(start)
+            completed = set(state["completed"])
+            completed.add(start)
+            # Fold the contiguous finished prefix into done_below
+            while state["done_below"] in completed:
+                completed.remove(state["done_below"])
+                state["done_below"] += self.state["range_size"]
+            state["completed"] = sorted(completed)
+            progress["indexed"] += result["indexed"]
+
+        progress["ranges_done"] += 1
+        self._save()
+
+    async def _export_phase(self, phase: str) -> None:
+        """Export every unfinished range of a phase with a pool of workers"""
+        state = self.state[phase]
+        if state["max_id"] is None:
+            records = await self._query(MAX_ID_QUERIES[phase], {})
+            state["max_id"] = records[0]["max_id"]
+            self._save()
+
+        range_size = self.state["range_size"]
+        completed = set(state["completed"])
+        pending = [
+            start for start in range(state["done_below"], state["max_id"] + 1, range_size)
+            if start not in completed
+        ]
+        self.status["phase"] = phase
+        self.status[phase]["ranges_total"] = len(pending)
+
+        ranges = iter(pending)
+
+        async def worker():
+            # Workers pull from one shared iterator; next() never yields control
+            for start in ranges:
+                await self._export_range(phase, start)
+
+        await asyncio.gather(*(worker() for _ in range(self.workers)))
+
+    async def run(self, restart: bool = False) -> Dict[str, Any]:
+        """
+        Export the whole graph, resuming from the checkpoint unless restart is set
+
+        Returns:
+            Final status: per-phase indexed/range counts and recent errors
+        """
+        if self.lock.locked():
+            raise RuntimeError("Solr export is already running")
+
+        async with self.lock:
+            state = load_checkpoint(self.checkpoint_path, self._initial_state())
+            if restart or state["complete"]:
+                state = self._initial_state()
+            self.state = state
+
+            self.status = {
+                "running": True,
+                "phase": None,
+                "resumed": any(state[phase]["max_id"] is not None for phase in PHASES),
+                "started_at": datetime.now().isoformat(),
+                "finished_at": None,
+                "errors": [],
+                **{phase: {"indexed": 0, "ranges_done": 0, "ranges_total": 0, "failed_ranges": 0} for phase in PHASES}
+            }
+            started = time.time()
+
+            try:
+                if self.neo4j.driver is None:
+                    await self.neo4j.initialize_driver()
+                for phase in PHASES:
+                    await self._export_phase(phase)
+
+                state["complete"] = not any(state[phase]["failed"] for phase in PHASES)
+                self._save()
+                await self.solr.commit()
+            except Exception as e:
+                logger.error(f"Solr export stopped: {e}")
+                self.status["errors"].append({"phase": self.status["phase"], "error": str(e)})
+            finally:
+                self.status.update({
+                    "running": False,
+                    "complete": state["complete"],
+                    "finished_at": datetime.now().isoformat(),
+                    "duration_seconds": round(time.time() - started, 2)
+                })
+
+            logger.info(
+                f"Solr export finished: {self.status['nodes']['indexed']} nodes, "
+                f"{self.status['relationships']['indexed']} relationships (complete: {state['complete']})"
+            )
+            return self.status
+
+    def start_background(self, restart: bool = False) -> asyncio.Task:
+        """Run the export as a background task on the running event loop"""
+        if self.is_running():
+            raise RuntimeError("Solr export is already running")
+        self._task = asyncio.get_running_loop().create_task(self.run(restart=restart))
+        return self._task
+
+    def is_running(self) -> bool:
+        # A started task counts as running before it acquires the lock
+        return self.lock.locked() or (self._task is not None and not self._task.done())
+
+    def get_status(self) -> Dict[str, Any]:
+        """Progress of the current or last export, plus the checkpoint on disk"""
+        checkpoint = load_checkpoint(self.checkpoint_path, {})
+        return {
+            **self.status,
+            "running": self.is_running(),
+            "checkpoint": {
+                "path": self.checkpoint_path,
+                "complete": checkpoint.get("complete"),
+                **{phase: {key: checkpoint[phase][key] for key in ("max_id", "done_below", "failed")}
+                   for phase in PHASES if phase in checkpoint}
+            }
+        }
+
+# Global export job instance
+_solr_export_job = None
+
+def get_solr_export_job() -> SolrExportJob:
+    """Get the global Solr export job"""
+    global _solr_export_job
+    if _solr_export_job is None:
+        _solr_export_job = SolrExportJob()
+    return _solr_export_job
+
+async def _main(args: argparse.Namespace) -> Dict[str, Any]:
+    job = SolrExportJob(range_size=args.range_size, workers=args.workers)
+    try:
+        return await job.run(restart=args.restart)
+    finally:
+        # No scheduler runs in the CLI; this hard-commits the exported documents
+        await job.solr.stop_commit_scheduler()
+        await job.solr.close()
+        await job.neo4j.close_driver()
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the whole Neo4j graph into Solr")
+    parser.add_argument("--range-size", type=int, default=None, help="Internal ids per page")
+    parser.add_argument("--workers", type=int, default=None, help="Pages exported concurrently")
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint and start over")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    status = asyncio.run(_main(args))
+    print(json.dumps(status, indent=2, default=str))
+
+if __name__ == "__main__":
+    main()
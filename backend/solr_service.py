@@ -1,12 +1,57 @@
-import requests
+import httpx
+import asyncio
+import base64
+import hashlib
 import json
 import logging
 import os
-from typing import Dict, List, Any, Optional
+import re
+from datetime import datetime
+from typing import AsyncIterator, Dict, Iterable, List, Any, Optional, Set
+
+try:
+    from .cache_service import cached
+    from .invalidation_bus import SCOPE_SOLR, get_invalidation_bus
+    from .search_fanout import remaining_time
+except ImportError:  # Imported as a top-level module by the standalone scripts
+    from cache_service import cached
+    from invalidation_bus import SCOPE_SOLR, get_invalidation_bus
+    from search_fanout import remaining_time
 # Removed circular import: from neo4j_service import neo4j_service
 
 logger = logging.getLogger(__name__)
 
+# Responses worth retrying: Solr or a proxy in front of it is temporarily unavailable
+RETRY_STATUS_CODES = {502, 503, 504}
+
+# What commit() asks Solr for: a soft commit (new searcher, no segment flush),
+# a hard commit that also opens a searcher, or nothing (rely on commitWithin)
+COMMIT_MODES = ("soft", "hard", "none")
+
+# Fields list views and prompts actually use; leaves out the serialized
+# properties blob and the prop_* copies that make stored documents wide
+DISPLAY_FIELDS = ["id", "type", "neo4j_id", "label", "group", "source", "target", "content", "score"]
+
+# Field names knn_search accepts as filter keys
+FIELD_NAME = re.compile(r"^[A-Za-z_][A-Za-z0-9_.]*$")
+
+# Fields knn_search returns for a chunk
+CHUNK_FIELDS = ["id", "chunk_id", "text", "document_filename", "start_pos", "end_pos", "score"]
+
+def property_diff(old_properties: Dict[str, Any], new_properties: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Compare two property maps
+
+    Returns:
+        {'set': {name: new value} for added or changed properties,
+         'remove': [names of properties that no longer exist]}
+    """
+    return {
+        "set": {key: value for key, value in new_properties.items()
+                if key not in old_properties or old_properties[key] != value},
+        "remove": [key for key in old_properties if key not in new_properties]
+    }
+
 class SolrService:
     def __init__(self, solr_url: str = None, collection: str = None):
         # Load from environment variables with defaults
@@ -14,36 +59,186 @@ class SolrService:
         self.collection = collection or os.getenv("SOLR_COLLECTION", "neoboi_graph")
         self.base_url = f"{self.solr_url}/{self.collection}"
 
+        # Bulk indexing: documents per update request and update requests in flight
+        self.batch_size = int(os.getenv("SOLR_BATCH_SIZE", "500"))
+        self.batch_concurrency = int(os.getenv("SOLR_BATCH_CONCURRENCY", "4"))
+
+        # Pooled keep-alive HTTP client, created lazily inside the running event loop
+        self.timeout = httpx.Timeout(
+            float(os.getenv("SOLR_TIMEOUT", "30")),
+            connect=float(os.getenv("SOLR_CONNECT_TIMEOUT", "5"))
+        )
+        self.limits = httpx.Limits(
+            max_connections=int(os.getenv("SOLR_MAX_CONNECTIONS", "20")),
+            max_keepalive_connections=int(os.getenv("SOLR_MAX_KEEPALIVE", "10"))
+        )
+        self.retries = int(os.getenv("SOLR_RETRIES", "2"))
+        self.retry_backoff = float(os.getenv("SOLR_RETRY_BACKOFF", "0.2"))
+        self._client: Optional[httpx.AsyncClient] = None
+        self._client_loop: Optional[asyncio.AbstractEventLoop] = None
+        # Closes of clients from earlier event loops, kept referenced until done
+        self._closing_clients: Set[asyncio.Task] = set()
+
+        # Commit policy: updates carry commitWithin, commit() makes changes visible
+        # with a soft commit, and durable hard commits (openSearcher=false, so
+        # searcher caches survive) run on a schedule while there are pending updates
+        self.commit_within_ms = int(os.getenv("SOLR_COMMIT_WITHIN_MS", "10000"))
+        self.commit_mode = os.getenv("SOLR_COMMIT_MODE", "soft").lower()
+        if self.commit_mode not in COMMIT_MODES:
+            logger.warning(f"Unknown SOLR_COMMIT_MODE '{self.commit_mode}', using 'soft'")
+            self.commit_mode = "soft"
+        self.hard_commit_interval = float(os.getenv("SOLR_HARD_COMMIT_INTERVAL", "300"))
+        self._pending_updates = 0
+        self._commit_stats = {"soft_commits": 0, "hard_commits": 0, "failed_commits": 0, "last_hard_commit": None}
+        self._commit_task: Optional[asyncio.Task] = None
+        # commitWithin visibility: loop time of the last update, and the deferred
+        # SCOPE_SOLR publish that waits until the window has made it searchable
+        self._last_update_at: Optional[float] = None
+        self._invalidation_due: Optional[float] = None
+        self._invalidation_task: Optional[asyncio.Task] = None
+
+        # Dense vector field for chunk embeddings (see ensure_vector_schema/knn_search)
+        self.vector_field = os.getenv("SOLR_VECTOR_FIELD", "embedding")
+        self.vector_dimensions = int(os.getenv("SOLR_VECTOR_DIMENSIONS", "384"))
+        self._vector_schema_ready = False
+
         logger.info(f"SolrService initialized with URL: {self.solr_url}, Collection: {self.collection}")
 
+    def _get_client(self) -> httpx.AsyncClient:
+        """Get the pooled client for the running event loop"""
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client.is_closed or self._client_loop is not loop:
+            # Pooled connections belong to the loop that opened them; a new loop
+            # (e.g. a standalone script calling asyncio.run again) needs its own pool
+            if self._client is not None and not self._client.is_closed:
+                self._retire_client(self._client, self._client_loop)
+            self._client = httpx.AsyncClient(timeout=self.timeout, limits=self.limits)
+            self._client_loop = loop
+        return self._client
+
+    def _retire_client(self, client: httpx.AsyncClient, loop: Optional[asyncio.AbstractEventLoop]) -> None:
+        """Close a client left behind by another event loop so its pooled connections are released"""
+        if loop is not None and loop.is_running():
+            # Its loop still runs in another thread: close it there
+            asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+            return
+
+        async def close():
+            try:
+                await client.aclose()
+            except Exception as e:
+                # Connections opened on a loop that has since closed may not shut down cleanly
+                logger.debug(f"Closing previous Solr HTTP client failed: {e}")
+
+        task = asyncio.get_running_loop().create_task(close())
+        self._closing_clients.add(task)
+        task.add_done_callback(self._closing_clients.discard)
+
+    async def close(self) -> None:
+        """Close the pooled HTTP client (called from the application lifespan)"""
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+            logger.info("Solr HTTP client closed")
+        self._client = None
+        self._client_loop = None
+
+    async def _request(self, method: str, path: str = "", url: Optional[str] = None,
+                       retry: bool = True, **kwargs) -> httpx.Response:
+        """
+        Send a request to the collection, retrying transient failures
+
+        Connection errors, timeouts and 502/503/504 responses are retried up to
+        SOLR_RETRIES times with exponential backoff. Solr updates are keyed by
+        document id, so retrying them is safe; pass retry=False for requests
+        that are not idempotent (atomic 'inc' updates).
+
+        Inside an integrated search fan-out every attempt is bounded by what is
+        left of the backend's deadline, so no request outlives it.
+        """
+        url = url or f"{self.base_url}/{path}"
+        retries = self.retries if retry else 0
+        for attempt in range(retries + 1):
+            remaining = remaining_time()
+            if remaining is not None:
+                if remaining <= 0 and attempt > 0:
+                    raise httpx.TimeoutException(f"Search deadline passed before retrying {path or url}")
+                kwargs["timeout"] = max(remaining, 0.001)
+            try:
+                response = await self._get_client().request(method, url, **kwargs)
+                if response.status_code not in RETRY_STATUS_CODES or attempt == retries:
+                    return response
+                logger.warning(f"Solr returned {response.status_code} for {path or url}, retrying")
+            except httpx.TransportError as e:
+                if attempt == retries:
+                    raise
+                logger.warning(f"Solr request to {path or url} failed ({e!r}), retrying")
+            await asyncio.sleep(self.retry_backoff * 2 ** attempt)
+
+    def _update_params(self) -> Dict[str, Any]:
+        """Query parameters for update requests (commitWithin, if enabled)"""
+        return {"commitWithin": self.commit_within_ms} if self.commit_within_ms > 0 else {}
+
+    async def _update(self, path: str = "update", **kwargs) -> httpx.Response:
+        """Send an update request and count it towards the next scheduled hard commit"""
+        params = {**self._update_params(), **kwargs.pop("params", {})}
+        response = await self._request("POST", path, params=params, **kwargs)
+        if response.status_code == 200:
+            self._pending_updates += 1
+            self._last_update_at = asyncio.get_running_loop().time()
+        return response
+
+    def _node_document(self, node_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Build the Solr document for a graph node"""
+        doc = {
+            "id": f"node_{node_data['id']}",
+            "type": "node",
+            "neo4j_id": node_data['id'],
+            "label": node_data.get('label', ''),
+            "group": node_data.get('group', ''),
+            "properties": self._serialize_properties(node_data.get('properties', {})),
+            "content": self._extract_searchable_content(node_data)
+        }
+
+        # Add all properties as individual fields for faceting/searching
+        doc.update(self._property_fields(node_data.get('properties', {})))
+        return doc
+
+    def _relationship_document(self, edge_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Build the Solr document for a graph relationship"""
+        doc = {
+            "id": f"edge_{edge_data['id']}",
+            "type": "relationship",
+            "neo4j_id": edge_data['id'],
+            "label": edge_data.get('label', ''),
+            "source": edge_data.get('from', ''),
+            "target": edge_data.get('to', ''),
+            "properties": self._serialize_properties(edge_data.get('properties', {})),
+            "content": self._extract_searchable_content(edge_data)
+        }
+
+        # Add all properties as individual fields
+        doc.update(self._property_fields(edge_data.get('properties', {})))
+        return doc
+
+    def _property_fields(self, properties: Dict[str, Any]) -> Dict[str, Any]:
+        """Flatten properties into prop_* fields"""
+        fields = {}
+        for key, value in properties.items():
+            if isinstance(value, (str, int, float, bool)):
+                fields[f"prop_{key}"] = value
+            elif hasattr(value, 'isoformat'):  # Handle DateTime objects
+                fields[f"prop_{key}"] = value.isoformat()
+            else:
+                # Convert other types to string
+                fields[f"prop_{key}"] = str(value)
+        return fields
+
     async def index_node(self, node_data: Dict[str, Any]) -> bool:
         """Index a single node into Solr"""
         try:
-            # Prepare document for Solr
-            doc = {
-                "id": f"node_{node_data['id']}",
-                "type": "node",
-                "neo4j_id": node_data['id'],
-                "label": node_data.get('label', ''),
-                "group": node_data.get('group', ''),
-                "properties": self._serialize_properties(node_data.get('properties', {})),
-                "content": self._extract_searchable_content(node_data)
-            }
-
-            # Add all properties as individual fields for faceting/searching
-            properties = node_data.get('properties', {})
-            for key, value in properties.items():
-                if isinstance(value, (str, int, float, bool)):
-                    doc[f"prop_{key}"] = value
-                elif hasattr(value, 'isoformat'):  # Handle DateTime objects
-                    doc[f"prop_{key}"] = value.isoformat()
-                else:
-                    # Convert other types to string
-                    doc[f"prop_{key}"] = str(value)
-
-            response = requests.post(
-                f"{self.base_url}/update/json/docs",
-                json=doc,
+            response = await self._update(
+                "update/json/docs",
+                json=self._node_document(node_data),
                 headers={"Content-Type": "application/json"}
             )
 
@@ -58,36 +253,287 @@ class SolrService:
             logger.error(f"Error indexing node {node_data.get('id', 'unknown')}: {e}")
             return False
 
-    async def index_graph_data(self, graph_data: Dict[str, Any]) -> Dict[str, int]:
-        """Index all nodes and relationships from graph data"""
-        nodes_indexed = 0
-        edges_indexed = 0
+    async def index_documents(self, docs: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Post a batch of documents to Solr as one JSON array
 
-        # Index nodes
-        nodes = graph_data.get('nodes', [])
-        for node in nodes:
-            if await self.index_node(node):
-                nodes_indexed += 1
+        Returns:
+            {'success': bool, 'indexed': int, 'error': str (on failure)}
+        """
+        try:
+            response = await self._update(
+                content=json.dumps(docs, default=str),
+                headers={"Content-Type": "application/json"}
+            )
+            if response.status_code == 200:
+                return {"success": True, "indexed": len(docs)}
+            return {"success": False, "indexed": 0, "error": f"HTTP {response.status_code}: {response.text[:500]}"}
+        except Exception as e:
+            return {"success": False, "indexed": 0, "error": str(e)}
 
-        # Index relationships
+    async def delete_documents(self, ids: List[str]) -> Dict[str, Any]:
+        """
+        Delete documents by id in one update request
+
+        Returns:
+            {'success': bool, 'deleted': int, 'error': str (on failure)}
+        """
+        if not ids:
+            return {"success": True, "deleted": 0}
+        try:
+            response = await self._update(json={"delete": ids})
+            if response.status_code == 200:
+                return {"success": True, "deleted": len(ids)}
+            return {"success": False, "deleted": 0, "error": f"HTTP {response.status_code}: {response.text[:500]}"}
+        except Exception as e:
+            return {"success": False, "deleted": 0, "error": str(e)}
+
+    async def get_documents(self, ids: List[str], fields: str = "id,label,group,properties") -> Dict[str, Any]:
+        """
+        Fetch stored documents by id with real-time get (sees uncommitted updates)
+
+        Returns:
+            {'docs': {id: document}} for the ids that exist, or {'docs': {}, 'error': str}
+        """
+        if not ids:
+            return {"docs": {}}
+        try:
+            response = await self._request("GET", "get", params={
+                "ids": ",".join(ids), "fl": fields, "wt": "json"
+            })
+            if response.status_code != 200:
+                return {"docs": {}, "error": f"HTTP {response.status_code}: {response.text[:500]}"}
+            docs = response.json().get("response", {}).get("docs", [])
+            return {"docs": {doc["id"]: doc for doc in docs}}
+        except Exception as e:
+            return {"docs": {}, "error": str(e)}
+
+    async def scan_documents(self, cursor: str = "*", rows: int = 1000,
+                             fields: str = "id,neo4j_id,type", query: str = "*:*") -> Dict[str, Any]:
+        """
+        Page through every document matching a query in id order with Solr's cursorMark
+
+        Args:
+            cursor: "*" for the first page, then the previous page's next_cursor
+            rows: Documents per page
+            fields: Stored fields to return
+            query: Filter query limiting the scan (e.g. "type:node")
+
+        Returns:
+            {'docs': [...], 'next_cursor': str, 'done': bool} or {'error': str}
+        """
+        try:
+            response = await self._request("GET", "select", params={
+                "q": "*:*", "fq": query, "fl": fields, "rows": rows, "sort": "id asc",
+                "cursorMark": cursor, "wt": "json"
+            })
+            if response.status_code != 200:
+                return {"docs": [], "error": f"HTTP {response.status_code}: {response.text[:500]}"}
+            result = response.json()
+            next_cursor = result.get("nextCursorMark", cursor)
+            return {
+                "docs": result.get("response", {}).get("docs", []),
+                "next_cursor": next_cursor,
+                "done": next_cursor == cursor
+            }
+        except Exception as e:
+            return {"docs": [], "error": str(e)}
+
+    async def bulk_index(self, docs: List[Dict[str, Any]], batch_size: Optional[int] = None,
+                         concurrency: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Index documents in batches, with several batches in flight at once
+
+        Args:
+            docs: Solr documents
+            batch_size: Documents per update request (default SOLR_BATCH_SIZE)
+            concurrency: Update requests in flight (default SOLR_BATCH_CONCURRENCY)
+
+        Returns:
+            Indexed count, batch count and one entry per failed batch
+            (batch number, first/last document id, error)
+        """
+        batch_size = batch_size or self.batch_size
+        semaphore = asyncio.Semaphore(concurrency or self.batch_concurrency)
+        batches = [docs[i:i + batch_size] for i in range(0, len(docs), batch_size)]
+
+        async def index_batch(number: int, batch: List[Dict[str, Any]]) -> Dict[str, Any]:
+            async with semaphore:
+                result = await self.index_documents(batch)
+            if not result["success"]:
+                logger.error(f"Solr batch {number} ({batch[0]['id']}..{batch[-1]['id']}) failed: {result['error']}")
+                return {
+                    **result,
+                    "batch": number,
+                    "size": len(batch),
+                    "first_id": batch[0]["id"],
+                    "last_id": batch[-1]["id"]
+                }
+            return result
+
+        results = await asyncio.gather(*(index_batch(n, batch) for n, batch in enumerate(batches)))
+        failed = [result for result in results if not result["success"]]
+
+        return {
+            "indexed": sum(result["indexed"] for result in results),
+            "batches": len(batches),
+            "failed_batches": failed
+        }
+
+    async def index_graph_data(self, graph_data: Dict[str, Any],
+                               batch_size: Optional[int] = None) -> Dict[str, Any]:
+        """Index all nodes and relationships from graph data in bulk batches"""
+        nodes = graph_data.get('nodes', [])
         edges = graph_data.get('edges', [])
-        for edge in edges:
-            if await self.index_relationship(edge):
-                edges_indexed += 1
 
-        # Commit changes
+        node_result = await self.bulk_index([self._node_document(node) for node in nodes], batch_size)
+        edge_result = await self.bulk_index([self._relationship_document(edge) for edge in edges], batch_size)
+
+        # Make the new documents visible (durability comes from the scheduled hard commit)
         await self.commit()
 
-        logger.info(f"Indexing complete: {nodes_indexed} nodes, {edges_indexed} relationships")
+        nodes_indexed = node_result["indexed"]
+        edges_indexed = edge_result["indexed"]
+        failed_batches = (
+            [{**batch, "kind": "node"} for batch in node_result["failed_batches"]] +
+            [{**batch, "kind": "relationship"} for batch in edge_result["failed_batches"]]
+        )
+
+        logger.info(
+            f"Indexing complete: {nodes_indexed} nodes, {edges_indexed} relationships "
+            f"in {node_result['batches'] + edge_result['batches']} batches ({len(failed_batches)} failed)"
+        )
         return {
             "nodes_indexed": nodes_indexed,
             "edges_indexed": edges_indexed,
-            "total_indexed": nodes_indexed + edges_indexed
+            "total_indexed": nodes_indexed + edges_indexed,
+            "batches": node_result["batches"] + edge_result["batches"],
+            "failed_batches": failed_batches
         }
+    @staticmethod
+    def _field_name(key: str) -> str:
+        """Map a filter/facet key to its Solr field (graph properties live in prop_*)"""
+        if key in ("type", "group") or key.startswith("prop_"):
+            return key
+        return f"prop_{key}"
+
+    def _aggregation_params(self, facet_fields: Optional[List[str]],
+                            facet_ranges: Optional[List[Dict[str, Any]]],
+                            stats_fields: Optional[List[str]], facet_limit: int) -> Dict[str, Any]:
+        """Facet and stats component parameters for a select request"""
+        params: Dict[str, Any] = {}
+        if facet_fields or facet_ranges:
+            params.update({"facet": "true", "facet.limit": facet_limit, "facet.mincount": 1})
+        if facet_fields:
+            params["facet.field"] = [self._field_name(field) for field in facet_fields]
+        if facet_ranges:
+            params["facet.range"] = []
+            for facet_range in facet_ranges:
+                field = self._field_name(facet_range["field"])
+                params["facet.range"].append(field)
+                for key in ("start", "end", "gap"):
+                    params[f"f.{field}.facet.range.{key}"] = facet_range[key]
+        if stats_fields:
+            params["stats"] = "true"
+            params["stats.field"] = [self._field_name(field) for field in stats_fields]
+        return params
+
+    @staticmethod
+    def _parse_aggregations(result: Dict[str, Any]) -> Dict[str, Any]:
+        """Turn Solr facet_counts/stats into {field: buckets} and {field: stats} dicts"""
+        def buckets(flat: List[Any]) -> List[Dict[str, Any]]:
+            # Solr returns facet counts as a flat [value, count, value, count, ...] list
+            return [{"value": value, "count": count} for value, count in zip(flat[::2], flat[1::2])]
+
+        aggregations: Dict[str, Any] = {}
+        facet_counts = result.get("facet_counts")
+        if facet_counts is not None:
+            aggregations["facets"] = {
+                field: buckets(counts) for field, counts in facet_counts.get("facet_fields", {}).items()
+            }
+            aggregations["range_facets"] = {
+                field: {
+                    "buckets": buckets(facet.get("counts", [])),
+                    **{key: facet[key] for key in ("start", "end", "gap", "before", "after") if key in facet}
+                }
+                for field, facet in facet_counts.get("facet_ranges", {}).items()
+            }
+        if "stats" in result:
+            aggregations["stats"] = {
+                field: stats for field, stats in result["stats"].get("stats_fields", {}).items()
+                if stats is not None
+            }
+        return aggregations
+
+    @staticmethod
+    def _query_fingerprint(query: str, filters: Optional[Dict[str, Any]]) -> str:
+        return hashlib.sha1(json.dumps([query, filters or {}], sort_keys=True, default=str).encode()).hexdigest()[:12]
 
+    def encode_cursor(self, cursor_mark: str, query: str, filters: Optional[Dict[str, Any]] = None) -> str:
+        """Wrap a Solr cursorMark in an opaque token bound to the query it pages through"""
+        payload = json.dumps({"mark": cursor_mark, "query": self._query_fingerprint(query, filters)})
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+    def decode_cursor(self, token: str, query: str, filters: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Get the Solr cursorMark from a cursor token ('*' starts a new scroll)
+
+        Raises:
+            ValueError: if the token is malformed or belongs to another query
+        """
+        if token == "*":
+            return "*"
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+            cursor_mark = payload["mark"]
+            fingerprint = payload["query"]
+        except (ValueError, KeyError, TypeError):
+            raise ValueError("Malformed search cursor")
+        if fingerprint != self._query_fingerprint(query, filters):
+            raise ValueError("Search cursor belongs to a different query")
+        return cursor_mark
+
+    @cached("search", should_cache=lambda result: "error" not in result, tags=(SCOPE_SOLR,))
     async def search(self, query: str, filters: Optional[Dict[str, Any]] = None,
-                    limit: int = 20, offset: int = 0) -> Dict[str, Any]:
-        """Search the indexed data"""
+                    limit: int = 20, offset: int = 0,
+                    facet_fields: Optional[List[str]] = None,
+                    facet_ranges: Optional[List[Dict[str, Any]]] = None,
+                    stats_fields: Optional[List[str]] = None,
+                    facet_limit: int = 20, cursor: Optional[str] = None,
+                    fields: Optional[List[str]] = None, highlight: bool = False,
+                    highlight_fields: Optional[List[str]] = None,
+                    snippet_length: int = 150) -> Dict[str, Any]:
+        """
+        Search the indexed data
+
+        Args:
+            query: Solr query string
+            filters: Field -> value filter queries (non-type/group keys map to prop_*)
+            limit: Rows to return
+            offset: Rows to skip
+            facet_fields: Fields to count values of across all matches
+            facet_ranges: Range facets, each {'field', 'start', 'end', 'gap'}
+                (numbers, or Solr date math such as '+1MONTH')
+            stats_fields: Numeric fields to compute min/max/sum/mean/stddev for
+            facet_limit: Buckets per field facet
+            cursor: '*' or a previous next_cursor to page with cursorMark
+                (sorted by id, offset ignored); each page costs the same however
+                deep it is and pages stay consistent while indexing runs
+            fields: Stored fields to return (Solr fl; e.g. DISPLAY_FIELDS);
+                all stored fields if omitted. 'id' is always included.
+            highlight: Attach matching snippets to each document as 'highlights'
+            highlight_fields: Fields to highlight (default ['content'])
+            snippet_length: Approximate snippet size in characters
+
+        Returns:
+            total, docs, and when requested 'facets', 'range_facets' and 'stats',
+            computed by Solr over every match rather than the returned page.
+            Cursor searches add 'next_cursor' (None on the last page).
+
+        Raises:
+            ValueError: if the cursor is malformed or belongs to another query
+        """
+        cursor_mark = self.decode_cursor(cursor, query, filters) if cursor else None
         try:
             search_params = {
                 "q": query,
@@ -95,31 +541,50 @@ class SolrService:
                 "start": offset,
                 "wt": "json"
             }
+            if cursor_mark:
+                # cursorMark needs a sort ending on the unique key and no start offset
+                del search_params["start"]
+                search_params.update({"cursorMark": cursor_mark, "sort": "id asc"})
+
+            if fields:
+                # id keys highlighting and cursor paging
+                search_params["fl"] = ",".join(dict.fromkeys(["id", *fields]))
+            if highlight:
+                search_params.update({
+                    "hl": "true",
+                    "hl.method": "unified",
+                    "hl.fl": ",".join(highlight_fields or ["content"]),
+                    "hl.fragsize": snippet_length,
+                    "hl.snippets": 1
+                })
 
             # Add filters
             if filters:
-                fq = []
-                for key, value in filters.items():
-                    if key == "type":
-                        fq.append(f"type:{value}")
-                    elif key == "group":
-                        fq.append(f"group:{value}")
-                    elif key.startswith("prop_"):
-                        fq.append(f"{key}:{value}")
-                    else:
-                        fq.append(f"prop_{key}:{value}")
+                fq = [f"{self._field_name(key)}:{value}" for key, value in filters.items()]
                 if fq:
                     search_params["fq"] = fq
 
-            response = requests.get(f"{self.base_url}/select", params=search_params)
+            search_params.update(self._aggregation_params(facet_fields, facet_ranges, stats_fields, facet_limit))
+
+            response = await self._request("GET", "select", params=search_params)
 
             if response.status_code == 200:
                 result = response.json()
+                docs = result.get("response", {}).get("docs", [])
+                if highlight:
+                    # Solr returns snippets keyed by document id; unmatched fields are empty lists
+                    snippets = result.get("highlighting", {})
+                    for doc in docs:
+                        doc["highlights"] = {
+                            field: values for field, values in snippets.get(doc.get("id"), {}).items() if values
+                        }
                 return {
                     "total": result.get("response", {}).get("numFound", 0),
-                    "docs": result.get("response", {}).get("docs", []),
+                    "docs": docs,
                     "query": query,
-                    "filters": filters
+                    "filters": filters,
+                    **self._parse_aggregations(result),
+                    **self._cursor_fields(result, cursor_mark, query, filters)
                 }
             else:
                 logger.error(f"Search failed: {response.text}")
@@ -129,49 +594,385 @@ class SolrService:
             logger.error(f"Search error: {e}")
             return {"total": 0, "docs": [], "error": str(e)}
 
-    async def commit(self):
-        """Commit pending changes to Solr"""
+    async def ensure_vector_schema(self) -> bool:
+        """
+        Add the dense vector field type and chunk fields to the collection schema
+
+        Uses the Schema API; fields that already exist are left alone, so this
+        is safe to call on every startup. Needs Solr 9.1+ (DenseVectorField
+        with kNN pre-filtering).
+        """
+        if self._vector_schema_ready:
+            return True
+
+        schema = [
+            ("add-field-type", {
+                "name": "knn_vector", "class": "solr.DenseVectorField",
+                "vectorDimension": self.vector_dimensions, "similarityFunction": "cosine"
+            }),
+            ("add-field", {"name": self.vector_field, "type": "knn_vector", "indexed": True, "stored": False}),
+            ("add-field", {"name": "chunk_id", "type": "string", "stored": True}),
+            ("add-field", {"name": "document_filename", "type": "string", "stored": True}),
+            ("add-field", {"name": "text", "type": "text_general", "stored": True}),
+            ("add-field", {"name": "start_pos", "type": "pint", "stored": True}),
+            ("add-field", {"name": "end_pos", "type": "pint", "stored": True})
+        ]
+        try:
+            for command, definition in schema:
+                response = await self._request("POST", "schema", json={command: definition})
+                if response.status_code != 200 and "already exists" not in response.text:
+                    logger.error(f"Solr schema update {command} {definition['name']} failed: {response.text[:500]}")
+                    return False
+            self._vector_schema_ready = True
+            logger.info(f"Solr vector schema ready on {self.collection} ({self.vector_dimensions} dimensions)")
+            return True
+        except Exception as e:
+            logger.error(f"Error updating Solr vector schema: {e}")
+            return False
+
+    def _chunk_document(self, chunk: Dict[str, Any], embedding: List[float], filename: str) -> Dict[str, Any]:
+        """Build the Solr document for a DocumentChunk and its embedding"""
+        return {
+            "id": f"chunk_{chunk['id']}",
+            "type": "chunk",
+            "chunk_id": chunk['id'],
+            "document_filename": filename,
+            "text": chunk['text'],
+            "content": chunk['text'],
+            "start_pos": chunk.get('start_pos', 0),
+            "end_pos": chunk.get('end_pos', len(chunk['text'])),
+            self.vector_field: [float(value) for value in embedding]
+        }
+
+    async def index_chunks(self, chunks: List[Dict[str, Any]], embeddings: List[List[float]],
+                           filename: str) -> Dict[str, Any]:
+        """
+        Index document chunks with their embeddings for knn_search
+
+        Returns:
+            bulk_index result (indexed, batches, failed_batches), or
+            {'indexed': 0, 'error': str} if the vector schema cannot be set up
+        """
+        if not await self.ensure_vector_schema():
+            return {"indexed": 0, "batches": 0, "failed_batches": [], "error": "Solr vector schema unavailable"}
+        docs = [self._chunk_document(chunk, embedding, filename) for chunk, embedding in zip(chunks, embeddings)]
+        result = await self.bulk_index(docs)
+        await self.commit()
+        return result
+
+    async def knn_search(self, vector: List[float], top_k: int = 10, keywords: Optional[str] = None,
+                         filters: Optional[Dict[str, Any]] = None,
+                         fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Nearest-neighbour search over chunk embeddings, filtered in the same request
+
+        Args:
+            vector: Query embedding
+            top_k: Number of neighbours to return
+            keywords: Optional keyword query the chunks must match (on text)
+            filters: Exact field filters, e.g. {'document_filename': 'spec.pdf'}
+            fields: Stored fields to return (default CHUNK_FIELDS)
+
+        Filter queries are applied before the neighbour search (Solr 9.1+
+        pre-filtering), so top_k neighbours are found among matching chunks
+        rather than filtered out of the global top_k. The request is POSTed
+        because an embedding does not fit in a URL.
+
+        Returns:
+            {'success', 'results': [{chunk_id, text, document_filename,
+            similarity_score, ...}], 'total_results'} or {'success': False, 'error'}
+        """
+        params = {
+            "q": f"{{!knn f={self.vector_field} topK={top_k}}}{json.dumps([float(v) for v in vector])}",
+            "fl": ",".join(fields or CHUNK_FIELDS),
+            "rows": top_k,
+            "wt": "json"
+        }
+        fq = []
+        for number, (key, value) in enumerate((filters or {}).items()):
+            if not FIELD_NAME.match(key):
+                return {"success": False, "error": f"Invalid filter field '{key}'", "results": []}
+            # Values are passed as separate parameters, like the keywords, so quotes
+            # or query syntax in them match literally instead of changing the filter
+            fq.append(f"{{!term f={key} v=$filter{number}}}")
+            params[f"filter{number}"] = value
+        if keywords:
+            fq.append("{!edismax qf=text q.op=AND v=$keywords}")
+            params["keywords"] = keywords
+        params["fq"] = fq
+
         try:
-            response = requests.get(f"{self.base_url}/update?commit=true")
+            response = await self._request("POST", "select", data=params)
+            if response.status_code != 200:
+                return {"success": False, "error": f"HTTP {response.status_code}: {response.text[:500]}", "results": []}
+            docs = response.json().get("response", {}).get("docs", [])
+            results = [{
+                **{key: value for key, value in doc.items() if key not in ("id", "score")},
+                # Solr scales cosine similarity to (1 + cos) / 2
+                "similarity_score": doc.get("score", 0.0)
+            } for doc in docs]
+            return {"success": True, "results": results, "total_results": len(results), "backend": "solr"}
+        except Exception as e:
+            logger.error(f"Solr kNN search error: {e}")
+            return {"success": False, "error": str(e), "results": []}
+
+    def _cursor_fields(self, result: Dict[str, Any], cursor_mark: Optional[str],
+                       query: str, filters: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        if cursor_mark is None:
+            return {}
+        next_mark = result.get("nextCursorMark", cursor_mark)
+        # Solr returns the same mark once the results are exhausted
+        done = next_mark == cursor_mark or not result.get("response", {}).get("docs")
+        return {"next_cursor": None if done else self.encode_cursor(next_mark, query, filters)}
+
+    async def iterate_search(self, query: str, filters: Optional[Dict[str, Any]] = None,
+                             page_size: int = 500) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Yield every matching document, one cursorMark page at a time
+
+        Pages bypass the search cache; an export reads each page once.
+
+        Raises:
+            RuntimeError: if a page request fails
+        """
+        cursor = "*"
+        while cursor:
+            page = await self.search.__wrapped__(self, query, filters, page_size, cursor=cursor)
+            if "error" in page:
+                raise RuntimeError(f"Solr search export failed: {page['error']}")
+            if page["docs"]:
+                yield page["docs"]
+            cursor = page["next_cursor"]
+
+    async def commit(self, mode: Optional[str] = None):
+        """
+        Make pending changes visible to searches
+
+        Args:
+            mode: 'soft', 'hard' or 'none' (default SOLR_COMMIT_MODE). A soft
+                commit opens a new searcher without flushing segments to disk;
+                'none' leaves visibility to commitWithin.
+
+        Cached search results are invalidated once the changes are visible:
+        right after a soft or hard commit, or when the commitWithin window
+        of the last update has passed.
+        """
+        mode = mode or self.commit_mode
+        if mode == "none":
+            self._publish_when_visible()
+            return True
+
+        params = {"softCommit": "true"} if mode == "soft" else {"commit": "true"}
+        try:
+            response = await self._request("GET", "update", params=params)
             if response.status_code == 200:
-                logger.info("Successfully committed changes to Solr")
+                if mode == "soft":
+                    self._commit_stats["soft_commits"] += 1
+                else:
+                    self._record_hard_commit()
+                logger.info(f"Successfully committed changes to Solr ({mode} commit)")
+                get_invalidation_bus().publish(SCOPE_SOLR, source="solr.commit")
                 return True
             else:
+                self._commit_stats["failed_commits"] += 1
                 logger.error(f"Commit failed: {response.text}")
                 return False
         except Exception as e:
+            self._commit_stats["failed_commits"] += 1
             logger.error(f"Commit error: {e}")
             return False
 
-    async def index_relationship(self, edge_data: Dict[str, Any]) -> bool:
-        """Index a single relationship into Solr"""
+    def _publish_when_visible(self) -> None:
+        """Schedule the SCOPE_SOLR publish for when commitWithin makes the last update visible"""
+        if self.commit_within_ms <= 0:
+            # Nothing we control opens a searcher; cached results expire by TTL
+            logger.debug("No commitWithin configured; not invalidating cached Solr results")
+            return
+
+        loop = asyncio.get_running_loop()
+        visible_at = (self._last_update_at or loop.time()) + self.commit_within_ms / 1000
+        self._invalidation_due = max(self._invalidation_due or 0.0, visible_at)
+        if self._invalidation_task is not None and not self._invalidation_task.done():
+            return  # The pending publish waits for the later deadline too
+
+        async def publish_when_due():
+            # Updates made while waiting push the deadline back
+            while self._invalidation_due > loop.time():
+                await asyncio.sleep(self._invalidation_due - loop.time())
+            self._invalidation_due = None
+            get_invalidation_bus().publish(SCOPE_SOLR, source="solr.commit_within")
+
+        self._invalidation_task = loop.create_task(publish_when_due())
+
+    async def hard_commit(self) -> bool:
+        """
+        Flush pending updates to stable storage without opening a new searcher
+
+        Visibility is unchanged, so Solr's searcher caches are kept.
+        """
         try:
-            # Prepare document for Solr
-            doc = {
-                "id": f"edge_{edge_data['id']}",
-                "type": "relationship",
-                "neo4j_id": edge_data['id'],
-                "label": edge_data.get('label', ''),
-                "source": edge_data.get('from', ''),
-                "target": edge_data.get('to', ''),
-                "properties": self._serialize_properties(edge_data.get('properties', {})),
-                "content": self._extract_searchable_content(edge_data)
-            }
+            response = await self._request("GET", "update", params={"commit": "true", "openSearcher": "false"})
+            if response.status_code == 200:
+                self._record_hard_commit()
+                logger.info("Hard commit completed (openSearcher=false)")
+                return True
+            self._commit_stats["failed_commits"] += 1
+            logger.error(f"Hard commit failed: {response.text}")
+            return False
+        except Exception as e:
+            self._commit_stats["failed_commits"] += 1
+            logger.error(f"Hard commit error: {e}")
+            return False
 
-            # Add all properties as individual fields
-            properties = edge_data.get('properties', {})
-            for key, value in properties.items():
-                if isinstance(value, (str, int, float, bool)):
-                    doc[f"prop_{key}"] = value
-                elif hasattr(value, 'isoformat'):  # Handle DateTime objects
-                    doc[f"prop_{key}"] = value.isoformat()
-                else:
-                    # Convert other types to string
-                    doc[f"prop_{key}"] = str(value)
+    def _record_hard_commit(self) -> None:
+        self._pending_updates = 0
+        self._commit_stats["hard_commits"] += 1
+        self._commit_stats["last_hard_commit"] = datetime.now().isoformat()
+
+    def start_commit_scheduler(self, interval_seconds: Optional[float] = None) -> Optional[asyncio.Task]:
+        """
+        Start a background task that hard-commits pending updates periodically
+
+        Must be called from a running event loop (e.g. the FastAPI lifespan).
+        The interval defaults to SOLR_HARD_COMMIT_INTERVAL seconds; 0 disables it.
+        """
+        if self._commit_task is not None and not self._commit_task.done():
+            return self._commit_task
+
+        interval = interval_seconds or self.hard_commit_interval
+        if interval <= 0:
+            return None
+
+        async def commit_forever():
+            while True:
+                await asyncio.sleep(interval)
+                if self._pending_updates:
+                    await self.hard_commit()
+
+        self._commit_task = asyncio.get_running_loop().create_task(commit_forever())
+        logger.info(f"Solr hard commit scheduler started (every {interval}s)")
+        return self._commit_task
+
+    async def stop_commit_scheduler(self) -> None:
+        """Stop the scheduler, hard-committing anything still pending and publishing a deferred invalidation"""
+        if self._invalidation_task is not None:
+            self._invalidation_task.cancel()
+            try:
+                await self._invalidation_task
+            except asyncio.CancelledError:
+                pass
+            self._invalidation_task = None
+        if self._invalidation_due is not None:
+            # Shared tier entries outlive this process: publish now instead of waiting out commitWithin
+            self._invalidation_due = None
+            get_invalidation_bus().publish(SCOPE_SOLR, source="solr.commit_within")
+        if self._commit_task is not None:
+            self._commit_task.cancel()
+            try:
+                await self._commit_task
+            except asyncio.CancelledError:
+                pass
+            self._commit_task = None
+            logger.info("Solr hard commit scheduler stopped")
+        if self._pending_updates:
+            await self.hard_commit()
+
+    def get_commit_stats(self) -> Dict[str, Any]:
+        """Commit policy and counters"""
+        return {
+            "mode": self.commit_mode,
+            "commit_within_ms": self.commit_within_ms,
+            "hard_commit_interval_seconds": self.hard_commit_interval,
+            "scheduler_running": self._commit_task is not None and not self._commit_task.done(),
+            "pending_updates": self._pending_updates,
+            "invalidation_pending": self._invalidation_due is not None,
+            **self._commit_stats
+        }
+
+    def _atomic_update_document(self, doc_id: str, data: Dict[str, Any], old_properties: Dict[str, Any],
+                                counters: Iterable[str] = ()) -> Optional[Dict[str, Any]]:
+        """
+        Build a Solr atomic update for the properties that changed
+
+        Changed prop_* fields get 'set', removed ones are cleared with a null
+        'set', and counters that changed by a number get 'inc'. The derived
+        label, properties and content fields are reset alongside. Unchanged
+        prop_* fields are not sent. Returns None if nothing changed.
+        """
+        properties = data.get('properties', {})
+        diff = property_diff(old_properties, properties)
+        if not diff["set"] and not diff["remove"]:
+            return None
+
+        counters = set(counters)
+        doc: Dict[str, Any] = {"id": doc_id}
+        for field, value in self._property_fields(diff["set"]).items():
+            key = field[len("prop_"):]
+            old_value = old_properties.get(key)
+            if (key in counters and isinstance(value, (int, float)) and isinstance(old_value, (int, float))
+                    and not isinstance(value, bool) and not isinstance(old_value, bool)):
+                doc[field] = {"inc": value - old_value}
+            else:
+                doc[field] = {"set": value}
+        for key in diff["remove"]:
+            doc[f"prop_{key}"] = {"set": None}
+
+        doc.update({
+            "label": {"set": data.get('label', '')},
+            "properties": {"set": self._serialize_properties(properties)},
+            "content": {"set": self._extract_searchable_content(data)}
+        })
+        return doc
+
+    async def update_properties(self, data: Dict[str, Any], old_properties: Dict[str, Any],
+                                kind: str = "node", counters: Iterable[str] = ()) -> Dict[str, Any]:
+        """
+        Apply a property change to an indexed node or relationship with an atomic update
 
-            response = requests.post(
-                f"{self.base_url}/update/json/docs",
-                json=doc,
+        Only the changed fields are sent, so a frequently changing node does
+        not cost a full document reindex. Needs every field to be stored or
+        have docValues (Solr rebuilds the rest of the document from them) and
+        the document to exist; index it with index_node/bulk_index first.
+
+        Args:
+            data: New node or edge data (same shape as index_node/index_relationship)
+            old_properties: Properties the indexed document was built from
+            kind: 'node' or 'relationship'
+            counters: Properties to update with 'inc' by the numeric difference,
+                so concurrent increments from other writers are not lost.
+                Such updates are sent without retries ('inc' is not idempotent).
+
+        Returns:
+            {'success': bool, 'updated_fields': [...], 'error': str (on failure)}
+        """
+        prefix = "node" if kind == "node" else "edge"
+        doc = self._atomic_update_document(f"{prefix}_{data['id']}", data, old_properties, counters)
+        if doc is None:
+            return {"success": True, "updated_fields": []}
+
+        updated_fields = [field for field in doc if field != "id"]
+        has_inc = any("inc" in value for value in doc.values() if isinstance(value, dict))
+        try:
+            response = await self._update(
+                content=json.dumps([doc], default=str),
+                headers={"Content-Type": "application/json"},
+                retry=not has_inc
+            )
+            if response.status_code == 200:
+                logger.info(f"Atomically updated {kind} {data['id']}: {', '.join(updated_fields)}")
+                return {"success": True, "updated_fields": updated_fields}
+            return {"success": False, "updated_fields": [],
+                    "error": f"HTTP {response.status_code}: {response.text[:500]}"}
+        except Exception as e:
+            logger.error(f"Error updating {kind} {data.get('id', 'unknown')}: {e}")
+            return {"success": False, "updated_fields": [], "error": str(e)}
+
+    async def index_relationship(self, edge_data: Dict[str, Any]) -> bool:
+        """Index a single relationship into Solr"""
+        try:
+            response = await self._update(
+                "update/json/docs",
+                json=self._relationship_document(edge_data),
                 headers={"Content-Type": "application/json"}
             )
 
@@ -213,8 +1014,9 @@ class SolrService:
     async def clear_index(self):
         """Clear all documents from the index"""
         try:
-            response = requests.get(f"{self.base_url}/update?stream.body=<delete><query>*:*</query></delete>&commit=true")
-            if response.status_code == 200:
+            response = await self._update(json={"delete": {"query": "*:*"}})
+            # commit() invalidates cached results once the deletion is visible
+            if response.status_code == 200 and await self.commit():
                 logger.info("Successfully cleared Solr index")
                 return True
             else:
@@ -244,8 +1046,10 @@ class SolrService:
         """Get statistics about the Solr index"""
         try:
             # Get collection info
-            response = requests.get(f"{self.solr_url}/solr/admin/collections",
-                                  params={"action": "CLUSTERSTATUS", "wt": "json"})
+            response = await self._request(
+                "GET", url=f"{self.solr_url}/solr/admin/collections",
+                params={"action": "CLUSTERSTATUS", "wt": "json"}
+            )
 
             if response.status_code == 200:
                 data = response.json()
@@ -267,5 +1071,43 @@ class SolrService:
             logger.error(f"Error getting index stats: {e}")
             return {"collection": self.collection, "status": "error", "error": str(e)}
 
+def create_search_service():
+    """
+    Build the search service selected by SEARCH_BACKEND
+
+    solr (default) -> SolrService; local -> LocalSearchService (SQLite FTS5);
+    auto -> Solr with writes mirrored to the local engine and reads falling
+    back to it while Solr is unreachable.
+    """
+    backend = os.getenv("SEARCH_BACKEND", "solr").lower()
+    if backend not in ("local", "auto"):
+        return SolrService()
+
+    try:
+        try:
+            from .local_search import FallbackSearchService, LocalSearchService
+        except ImportError:  # Imported as a top-level module by the standalone scripts
+            from local_search import FallbackSearchService, LocalSearchService
+        local = LocalSearchService()
+    except Exception as e:
+        logger.error(f"Local search engine unavailable ({e}); using Solr only")
+        return SolrService()
+
+    if backend == "local":
+        logger.info("Search backend: local SQLite FTS5 engine")
+        return local
+    logger.info("Search backend: Solr with local fallback")
+    return FallbackSearchService(SolrService(), local)
+
 # Global service instance
-solr_service = SolrService()
\ No newline at end of file
+solr_service = create_search_service()
+
+# Chunk embeddings live in their own collection (see get_solr_vector_service)
+_solr_vector_service = None
+
+def get_solr_vector_service() -> SolrService:
+    """Get the Solr service for the chunk vector collection (SOLR_VECTOR_COLLECTION)"""
+    global _solr_vector_service
+    if _solr_vector_service is None:
+        _solr_vector_service = SolrService(collection=os.getenv("SOLR_VECTOR_COLLECTION", "neoboi_chunks"))
+    return _solr_vector_service
\ No newline at end of file
@@ -0,0 +1,420 @@
+"""
+Incremental Neo4j -> Solr Sync for NeoBoi Application
+
+Keeps the Solr index in step with the graph without reindexing everything.
+
+Changes: nodes and relationships carry an epoch-millisecond high-water mark
+property (SOLR_SYNC_UPDATED_PROPERTY, default ``updated_at``; set it with
+``timestamp()`` in write queries). The job keeps a range index on that
+property for every label and relationship type (SOLR_SYNC_LABELS and
+SOLR_SYNC_RELATIONSHIP_TYPES, comma-separated; all of them when unset) and
+pages through each one separately with an index seek from its checkpoint,
+ordered by (mark, elementId). A page costs the changes past the checkpoint,
+not a scan and sort of the whole graph. Elements without the property are
+not in the index and are never picked up; use the full export for initial
+loads. Elements already in Solr are sent as atomic updates of just the
+properties that changed since their stored copy (SOLR_SYNC_ATOMIC_UPDATES).
+
+Deletions: deleted elements leave nothing to page through, and Neo4j only
+reports how many a query deleted. Neo4jService.execute_query keeps a change
+log of those counts (``(:SolrSyncState {name: 'graph'})``, cumulative
+nodes_deleted and relationships_deleted). Reconciliation starts only for a
+document type whose log count moved since the last run, pages through that
+type's Solr documents with cursorMark, removes documents whose element no
+longer exists and stops as soon as it has found every logged deletion.
+
+The checkpoint (SOLR_SYNC_CHECKPOINT) is saved after every page, so an
+interrupted run resumes from the last completed page.
+
+Usage:
+    from solr_sync import get_solr_sync_job
+
+    result = await get_solr_sync_job().run()
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    from .neo4j_service import get_neo4j_service
+    from .solr_service import solr_service
+except ImportError:  # Imported as a top-level module by the standalone scripts
+    from neo4j_service import get_neo4j_service
+    from solr_service import solr_service
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHECKPOINT_PATH = os.getenv(
+    "SOLR_SYNC_CHECKPOINT",
+    os.path.join(os.path.dirname(__file__), '..', 'sync_state', 'solr_sync.json')
+)
+
+SYNC_STATE_LABEL = "SolrSyncState"
+
+LABELS_QUERY = "CALL db.labels() YIELD label RETURN label"
+RELATIONSHIP_TYPES_QUERY = "CALL db.relationshipTypes() YIELD relationshipType RETURN relationshipType AS type"
+
+DELETION_LOG_QUERY = """
+MATCH (s:SolrSyncState {name: 'graph'})
+RETURN coalesce(s.nodes_deleted, 0) AS nodes, coalesce(s.relationships_deleted, 0) AS relationships
+"""
+
+EXISTING_NODES_QUERY = """
+UNWIND $ids AS id
+OPTIONAL MATCH (n) WHERE elementId(n) = id
+RETURN id, n IS NOT NULL AS exists
+"""
+
+EXISTING_RELATIONSHIPS_QUERY = """
+UNWIND $ids AS id
+OPTIONAL MATCH ()-[r]->() WHERE elementId(r) = id
+RETURN id, r IS NOT NULL AS exists
+"""
+
+def quote_name(name: str) -> str:
+    """Backtick-quote a label, relationship type or property name for Cypher"""
+    return "`" + name.replace("`", "``") + "`"
+
+def index_query(kind: str, name: str, prop: str) -> str:
+    """Range index backing the change pages of one label or relationship type"""
+    if kind == "nodes":
+        return f"CREATE INDEX IF NOT EXISTS FOR (n:{quote_name(name)}) ON (n.{quote_name(prop)})"
+    return f"CREATE INDEX IF NOT EXISTS FOR ()-[r:{quote_name(name)}]-() ON (r.{quote_name(prop)})"
+
+def page_query(kind: str, name: str, prop: str) -> str:
+    """
+    Next page of changed elements of one label or relationship type
+
+    The ``>= $since`` predicate is an index seek on the high-water mark; ties
+    on the mark are broken by elementId so no element is skipped or repeated.
+    """
+    if kind == "nodes":
+        return f"""
+MATCH (n:{quote_name(name)}) WHERE n.{quote_name(prop)} >= $since
+WITH n, n.{quote_name(prop)} AS hw
+WHERE hw > $since OR elementId(n) > $after_id
+RETURN elementId(n) AS elementId, labels(n) AS labels, properties(n) AS properties, hw
+ORDER BY hw, elementId LIMIT $limit
+"""
+    return f"""
+MATCH ()-[r:{quote_name(name)}]->() WHERE r.{quote_name(prop)} >= $since
+WITH r, r.{quote_name(prop)} AS hw
+WHERE hw > $since OR elementId(r) > $after_id
+RETURN elementId(r) AS elementId, type(r) AS type, properties(r) AS properties,
+       elementId(startNode(r)) AS startNodeElementId, elementId(endNode(r)) AS endNodeElementId, hw
+ORDER BY hw, elementId LIMIT $limit
+"""
+
+def read_records(neo4j_service, query: str, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Run a read query and return plain record dicts (blocking)"""
+    with neo4j_service.get_driver().session(database=neo4j_service.database) as session:
+        return [record.data() for record in session.run(query, params)]
+
+def record_to_data(neo4j_service, kind: str, record: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert a node or relationship record to node/edge data, the same way get_graph_data does"""
+    if kind == "nodes":
+        nodes_map: Dict[str, Dict[str, Any]] = {}
+        neo4j_service._add_node_from_info({
+            'id': record['elementId'],
+            'labels': record['labels'],
+            'properties': record['properties']
+        }, nodes_map)
+        return nodes_map[record['elementId']]
+
+    edges: List[Dict[str, Any]] = []
+    neo4j_service._process_relationship(record, {}, edges)
+    return edges[0]
+
+def record_to_document(neo4j_service, solr, kind: str, record: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert a node or relationship record to a Solr document"""
+    data = record_to_data(neo4j_service, kind, record)
+    return solr._node_document(data) if kind == "nodes" else solr._relationship_document(data)
+
+def load_checkpoint(path: str, default: Dict[str, Any]) -> Dict[str, Any]:
+    """Load a JSON checkpoint, or return the default if there is none"""
+    if not os.path.exists(path):
+        return default
+    with open(path, "r", encoding="utf-8") as f:
+        return {**default, **json.load(f)}
+
+def save_checkpoint(path: str, state: Dict[str, Any]) -> None:
+    """Write a JSON checkpoint atomically (write a temp file, then rename)"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2, default=str)
+    os.replace(tmp_path, path)
+
+class SolrSyncJob:
+    """Resumable incremental sync of changed and deleted graph elements into Solr"""
+
+    def __init__(self, neo4j_service=None, solr=None, checkpoint_path: Optional[str] = None,
+                 page_size: Optional[int] = None, updated_property: Optional[str] = None,
+                 labels: Optional[List[str]] = None, relationship_types: Optional[List[str]] = None):
+        self.neo4j = neo4j_service or get_neo4j_service()
+        self.solr = solr or solr_service
+        self.checkpoint_path = checkpoint_path or DEFAULT_CHECKPOINT_PATH
+        self.page_size = page_size or int(os.getenv("SOLR_SYNC_PAGE_SIZE", "1000"))
+        self.updated_property = updated_property or os.getenv("SOLR_SYNC_UPDATED_PROPERTY", "updated_at")
+        # Send only the changed fields of already-indexed elements (needs stored/docValues fields)
+        self.atomic_updates = os.getenv("SOLR_SYNC_ATOMIC_UPDATES", "true").lower() == "true"
+        # Fixed partitions to page over; discovered from the database when not configured
+        self.partitions = {
+            "nodes": labels if labels is not None else self._names_from_env("SOLR_SYNC_LABELS"),
+            "relationships": (relationship_types if relationship_types is not None
+                              else self._names_from_env("SOLR_SYNC_RELATIONSHIP_TYPES"))
+        }
+        self._indexed: set = set()
+        self.lock = asyncio.Lock()
+        self.state = load_checkpoint(self.checkpoint_path, self._initial_state())
+        if "since" in self.state["nodes"] or "checked_at" in self.state["deletions"]:
+            # Checkpoint from the single-cursor layout: start the per-label marks over
+            logger.info("Solr sync checkpoint predates per-label paging, resyncing")
+            self.state = {**self._initial_state(), "last_run": self.state.get("last_run")}
+
+    @staticmethod
+    def _names_from_env(variable: str) -> Optional[List[str]]:
+        names = [name.strip() for name in os.getenv(variable, "").split(",") if name.strip()]
+        return names or None
+
+    @staticmethod
+    def _initial_state() -> Dict[str, Any]:
+        return {
+            # label / relationship type -> {since, after_id}
+            "nodes": {},
+            "relationships": {},
+            # Per document type: log count reconciled so far, and the scan in progress
+            "deletions": {
+                kind: {"reconciled": 0, "target": None, "cursor": None, "found": 0}
+                for kind in ("nodes", "relationships")
+            },
+            "last_run": None,
+            "last_result": None
+        }
+
+    def _read(self, query: str, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        return read_records(self.neo4j, query, params)
+
+    async def _query(self, query: str, params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        return await asyncio.get_event_loop().run_in_executor(None, self._read, query, params or {})
+
+    async def _partition_names(self, kind: str) -> List[str]:
+        """Labels or relationship types to page over, each backed by a range index"""
+        names = self.partitions[kind]
+        if names is None:
+            if kind == "nodes":
+                names = [r["label"] for r in await self._query(LABELS_QUERY) if r["label"] != SYNC_STATE_LABEL]
+            else:
+                names = [r["type"] for r in await self._query(RELATIONSHIP_TYPES_QUERY)]
+
+        for name in names:
+            if (kind, name) not in self._indexed:
+                await self._query(index_query(kind, name, self.updated_property))
+                self._indexed.add((kind, name))
+        return names
+
+    async def _documents(self, kind: str, records: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Solr updates for a page of changed elements, and how many were atomic
+
+        Elements not yet in Solr (or whose label or group changed) get a full
+        document. Indexed ones get an atomic update of just the properties
+        that differ from the stored copy, and none at all if nothing did.
+        """
+        data = [record_to_data(self.neo4j, kind, record) for record in records]
+        full_docs = [self.solr._node_document(item) if kind == "nodes" else self.solr._relationship_document(item)
+                     for item in data]
+        if not self.atomic_updates:
+            return full_docs, 0
+
+        stored = await self.solr.get_documents([doc["id"] for doc in full_docs])
+        if "error" in stored:
+            logger.warning(f"Could not read stored Solr documents, sending full documents: {stored['error']}")
+            return full_docs, 0
+
+        docs = []
+        atomic = 0
+        for item, full_doc in zip(data, full_docs):
+            old = stored["docs"].get(full_doc["id"])
+            if old is None or old.get("label") != full_doc["label"] or old.get("group", "") != full_doc.get("group", ""):
+                docs.append(full_doc)
+                continue
+            try:
+                old_properties = json.loads(old.get("properties") or "{}")
+            except ValueError:
+                docs.append(full_doc)
+                continue
+            # Compare in stored form (dates as ISO strings) so unchanged values match
+            current = {**item, "properties": json.loads(self.solr._serialize_properties(item["properties"]))}
+            update = self.solr._atomic_update_document(full_doc["id"], current, old_properties)
+            if update is not None:
+                docs.append(update)
+                atomic += 1
+        return docs, atomic
+
+    async def _sync_changes(self, kind: str, max_pages: Optional[int]) -> Dict[str, Any]:
+        """Index changed nodes or relationships page by page, checkpointing each page"""
+        marks = self.state[kind]
+        indexed = 0
+        atomic_updates = 0
+        pages = 0
+
+        for name in await self._partition_names(kind):
+            query = page_query(kind, name, self.updated_property)
+            mark = marks.setdefault(name, {"since": -1, "after_id": ""})
+
+            while True:
+                if max_pages is not None and pages >= max_pages:
+                    return {"indexed": indexed, "atomic_updates": atomic_updates, "pages": pages,
+                            "complete": False, "high_water_marks": marks}
+
+                records = await self._query(query, {
+                    "since": mark["since"],
+                    "after_id": mark["after_id"],
+                    "limit": self.page_size
+                })
+                if not records:
+                    break
+
+                docs, atomic = await self._documents(kind, records)
+                result = await self.solr.bulk_index(docs) if docs else {"indexed": 0, "failed_batches": []}
+                if result["failed_batches"]:
+                    # Leave the checkpoint where it is; the next run retries this page
+                    return {
+                        "indexed": indexed, "atomic_updates": atomic_updates, "pages": pages, "complete": False,
+                        "high_water_marks": marks, "failed_batches": result["failed_batches"]
+                    }
+
+                mark["since"] = records[-1]["hw"]
+                mark["after_id"] = records[-1]["elementId"]
+                save_checkpoint(self.checkpoint_path, self.state)
+                indexed += result["indexed"]
+                atomic_updates += atomic
+                pages += 1
+
+        return {"indexed": indexed, "atomic_updates": atomic_updates, "pages": pages,
+                "complete": True, "high_water_marks": marks}
+
+    async def _missing_ids(self, kind: str, docs: List[Dict[str, Any]]) -> List[str]:
+        """Solr ids of node or relationship documents whose Neo4j element is gone"""
+        by_element = {doc["neo4j_id"]: doc["id"] for doc in docs if doc.get("neo4j_id")}
+        if not by_element:
+            return []
+        query = EXISTING_NODES_QUERY if kind == "nodes" else EXISTING_RELATIONSHIPS_QUERY
+        records = await self._query(query, {"ids": list(by_element)})
+        return [by_element[record["id"]] for record in records if not record["exists"]]
+
+    async def _reconcile_deletions(self, max_pages: Optional[int]) -> Dict[str, Any]:
+        """Remove documents for elements the change log reports as deleted"""
+        log = await self._query(DELETION_LOG_QUERY)
+        logged = log[0] if log else {"nodes": 0, "relationships": 0}
+
+        checked = 0
+        deleted = 0
+        pages = 0
+        for kind, doc_type in (("nodes", "node"), ("relationships", "relationship")):
+            scan = self.state["deletions"][kind]
+            if scan["cursor"] is None:
+                if logged[kind] <= scan["reconciled"]:
+                    continue
+                # Deletions logged after this point are picked up by a later scan
+                scan.update(target=logged[kind], cursor="*", found=0)
+
+            while True:
+                if max_pages is not None and pages >= max_pages:
+                    return {"checked": checked, "deleted": deleted, "pages": pages, "complete": False}
+
+                page = await self.solr.scan_documents(scan["cursor"], rows=self.page_size,
+                                                      query=f"type:{doc_type}")
+                if "error" in page:
+                    return {"checked": checked, "deleted": deleted, "pages": pages,
+                            "complete": False, "error": page["error"]}
+
+                missing = await self._missing_ids(kind, page["docs"])
+                result = await self.solr.delete_documents(missing)
+                if not result["success"]:
+                    return {"checked": checked, "deleted": deleted, "pages": pages,
+                            "complete": False, "error": result["error"]}
+
+                checked += len(page["docs"])
+                deleted += result["deleted"]
+                scan["found"] += result["deleted"]
+                pages += 1
+
+                # Every logged deletion is accounted for, unless more happened mid-scan
+                # (then a removed document may belong to those and the scan must go on)
+                pending = scan["target"] - scan["reconciled"]
+                all_found = scan["found"] >= pending and await self._logged(kind) == scan["target"]
+                if page["done"] or all_found:
+                    scan.update(reconciled=scan["target"], target=None, cursor=None, found=0)
+                    save_checkpoint(self.checkpoint_path, self.state)
+                    break
+
+                scan["cursor"] = page["next_cursor"]
+                save_checkpoint(self.checkpoint_path, self.state)
+
+        return {"checked": checked, "deleted": deleted, "pages": pages, "complete": True}
+
+    async def _logged(self, kind: str) -> int:
+        """Current change log count of deleted nodes or relationships"""
+        log = await self._query(DELETION_LOG_QUERY)
+        return log[0][kind] if log else 0
+
+    async def run(self, max_pages: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Run one sync pass
+
+        Args:
+            max_pages: Stop after this many pages per phase (resume on the next run)
+
+        Returns:
+            Per-phase counts (nodes, relationships, deletions) and whether the
+            pass reached the end of every phase
+        """
+        if self.lock.locked():
+            raise RuntimeError("Solr sync is already running")
+
+        async with self.lock:
+            if self.neo4j.driver is None:
+                await self.neo4j.initialize_driver()
+
+            started = time.time()
+            result = {
+                "nodes": await self._sync_changes("nodes", max_pages),
+                "relationships": await self._sync_changes("relationships", max_pages),
+                "deletions": await self._reconcile_deletions(max_pages)
+            }
+            result["complete"] = all(phase["complete"] for phase in result.values())
+            result["duration_seconds"] = round(time.time() - started, 2)
+
+            if result["nodes"]["indexed"] or result["relationships"]["indexed"] or result["deletions"]["deleted"]:
+                await self.solr.commit()
+
+            self.state["last_run"] = datetime.now().isoformat()
+            self.state["last_result"] = result
+            save_checkpoint(self.checkpoint_path, self.state)
+
+            logger.info(
+                f"Solr sync: {result['nodes']['indexed']} nodes, {result['relationships']['indexed']} relationships "
+                f"indexed, {result['deletions']['deleted']} deleted (complete: {result['complete']})"
+            )
+            return result
+
+    def get_status(self) -> Dict[str, Any]:
+        """Checkpoint and last run summary"""
+        return {"running": self.lock.locked(), "checkpoint_path": self.checkpoint_path, **self.state}
+
+# Global sync job instance
+_solr_sync_job = None
+
+def get_solr_sync_job() -> SolrSyncJob:
+    """Get the global Solr sync job"""
+    global _solr_sync_job
+    if _solr_sync_job is None:
+        _solr_sync_job = SolrSyncJob()
+    return _solr_sync_job
@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+"""
+Tests for the in-memory cache service
+"""
+import asyncio
+import sys
+import threading
+import zlib
+
+import pytest
+
+from backend.cache_service import CacheService, LRUCache, StripedLRUCache, cached, estimate_size, get_cache_service
+from backend.invalidation_bus import get_invalidation_bus
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(max_size=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get_stats()["evictions"] == 1
+
+def test_cached_decorator_normalizes_parameters():
+    get_cache_service().clear("search")
+    calls = []
+
+    @cached("search", ttl_seconds=60)
+    async def search(query, filters=None, limit=20):
+        calls.append(query)
+        return {"docs": [query]}
+
+    async def run():
+        await search("supplier  parts")
+        await search(" supplier parts", limit=20)
+        await search("supplier parts", None, 10)
+
+    asyncio.run(run())
+    assert calls == ["supplier  parts", "supplier parts"]
+
+def test_cached_decorator_skips_rejected_results():
+    get_cache_service().clear("search")
+    calls = []
+
+    @cached("search", should_cache=lambda result: "error" not in result)
+    async def failing_search(query):
+        calls.append(query)
+        return {"error": "down"}
+
+    async def run():
+        await failing_search("x")
+        await failing_search("x")
+
+    asyncio.run(run())
+    assert len(calls) == 2
+
+def test_get_or_compute_coalesces_concurrent_misses():
+    cache_service = get_cache_service()
+    cache_service.clear("integrated")
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"answer": 42}
+
+    async def run():
+        return await asyncio.gather(*[
+            cache_service.get_or_compute("integrated", "popular", compute) for _ in range(5)
+        ])
+
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert all(result == {"answer": 42} for result in results)
+    assert cache_service.integrated_cache.get_stats()["coalesced"] == 4
+
+def test_get_or_compute_waiter_times_out_and_computes():
+    cache_service = get_cache_service()
+    cache_service.clear("integrated")
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.2 if len(calls) == 1 else 0)
+        return len(calls)
+
+    async def run():
+        leader = asyncio.create_task(cache_service.get_or_compute("integrated", "slow", compute))
+        await asyncio.sleep(0)
+        await cache_service.get_or_compute("integrated", "slow", compute, wait_timeout=0.01)
+        await leader
+
+    asyncio.run(run())
+    assert len(calls) == 2
+    stats = cache_service.integrated_cache.get_stats()
+    assert stats["coalesce_timeouts"] == 1
+    assert stats["coalesced"] == 0  # the waiter that timed out was not served by the leader
+
+def test_lru_cache_evicts_by_byte_budget():
+    small = {"docs": ["x" * 100]}
+    large = {"nodes": ["y" * 1000 for _ in range(5)]}
+    cache = LRUCache(max_size=100, max_bytes=estimate_size(large) + estimate_size(small))
+    cache.set("small-1", small)
+    cache.set("small-2", {"docs": ["z" * 100]})
+    cache.set("large", large)
+
+    stats = cache.get_stats()
+    assert cache.get("small-1") is None
+    assert cache.get("large") == large
+    assert stats["bytes_in_use"] <= stats["max_bytes"]
+
+def test_estimate_size_counts_numpy_buffers_once():
+    np = pytest.importorskip("numpy")
+    array = np.zeros(1000, dtype=np.float64)
+    view = array[:500]
+
+    assert estimate_size(array) == sys.getsizeof(array) < 2 * array.nbytes
+    assert estimate_size(view) == sys.getsizeof(view) + view.nbytes
+
+def test_lru_cache_rejects_value_larger_than_budget():
+    cache = LRUCache(max_size=100, max_bytes=200)
+    cache.set("huge", ["x" * 1000])
+
+    assert cache.get("huge") is None
+    assert cache.get_stats()["rejected_oversize"] == 1
+    assert cache.get_stats()["bytes_in_use"] == 0
+
+def test_cleanup_expired_uses_expiry_order():
+    cache = LRUCache(max_size=100)
+    cache.set("short", 1, ttl_seconds=-1)
+    cache.set("long", 2, ttl_seconds=300)
+    cache.set("overwritten", 3, ttl_seconds=-1)
+    cache.set("overwritten", 4, ttl_seconds=300)
+
+    assert cache.cleanup_expired(batch_size=1) == 1
+    assert cache.get("long") == 2
+    assert cache.get("overwritten") == 4
+    assert cache.get_stats()["expirations"] == 1
+
+def test_expiry_heap_stays_bounded_under_overwrites_and_evictions():
+    cache = LRUCache(max_size=10)
+    for i in range(5000):
+        cache.set(f"key-{i % 50}", i, ttl_seconds=3600)
+
+    assert len(cache._expiry_heap) <= 2 * len(cache.cache) + 64
+    assert set(cache.cache) <= {key for _, key in cache._expiry_heap}
+
+def test_striped_cache_shards_keys_and_aggregates_stats():
+    cache = StripedLRUCache(max_size=80, segments=8)
+    keys = [f"key-{i}" for i in range(40)]
+    for i, key in enumerate(keys):
+        cache.set(key, i)
+
+    # Sharding is stable (CRC32), so the distribution is the same on every run
+    expected = [0] * 8
+    for key in keys:
+        expected[zlib.crc32(key.encode("utf-8")) % 8] += 1
+    assert [len(segment.cache) for segment in cache.segments] == [min(count, 10) for count in expected]
+    assert all(key in cache.segments[zlib.crc32(key.encode("utf-8")) % 8].cache
+               for segment in cache.segments for key in segment.cache)
+    assert sum(1 for count in expected if count) > 1
+
+    stored = [key for key in keys if key in cache]
+    assert all(cache.get(key) == int(key.split("-")[1]) for key in stored)
+    assert cache.get("missing") is None
+
+    # Per-key stats land on the segment that owns the key
+    cache.record_stale_hit("key-1", 2.0)
+    cache.record_stale_hit("key-2", 4.0)
+    cache.record_coalesced("key-3")
+    owner = cache._segment("key-3")
+    assert owner.get_stats()["coalesced"] == 1
+    assert sum(segment.get_stats()["coalesced"] for segment in cache.segments) == 1
+
+    stats = cache.get_stats()
+    assert stats["size"] == len(stored)
+    assert stats["hits"] == len(stored)
+    assert stats["misses"] == 1
+    assert stats["stale_hits"] == 2
+    assert stats["stale_age_avg_seconds"] == 3.0
+    assert stats["stale_age_max_seconds"] == 4.0
+    assert stats["coalesced"] == 1
+
+def test_shared_tier_serves_other_workers(tmp_path, monkeypatch):
+    monkeypatch.setenv("CACHE_SHARED_BACKEND", "sqlite")
+    monkeypatch.setenv("CACHE_SQLITE_PATH", str(tmp_path / "cache.sqlite3"))
+    worker_a = CacheService()
+    worker_b = CacheService()
+
+    worker_a.set_search_result("supplier", result={"docs": [{"id": "node_1"}]})
+
+    assert worker_b.get_search_result("supplier") == {"docs": [{"id": "node_1"}]}
+    assert worker_b.get_stats()["search_cache"]["shared_hits"] == 1
+
+    worker_b.clear("search")
+    assert CacheService().get_search_result("supplier") is None
+
+def test_corrupt_shared_entry_counts_as_miss(tmp_path, monkeypatch):
+    monkeypatch.setenv("CACHE_SHARED_BACKEND", "sqlite")
+    monkeypatch.setenv("CACHE_SQLITE_PATH", str(tmp_path / "cache.sqlite3"))
+    cache_service = CacheService()
+    shared = cache_service.shared_tier
+    shared.set("search", "broken", b"not zlib", 300)
+
+    assert shared.get("search", "broken") is None
+    assert shared.get_stats()["misses"] == 1
+    assert shared.get_stats()["entries"] == 0
+
+def test_get_or_compute_reads_and_writes_the_shared_tier_off_the_loop(tmp_path, monkeypatch):
+    monkeypatch.setenv("CACHE_SHARED_BACKEND", "sqlite")
+    monkeypatch.setenv("CACHE_SQLITE_PATH", str(tmp_path / "cache.sqlite3"))
+    worker_a = CacheService()
+    worker_b = CacheService()
+    threads = []
+
+    def record_thread(func):
+        def wrapper(*args):
+            threads.append(threading.current_thread().name)
+            return func(*args)
+        return wrapper
+
+    monkeypatch.setattr(worker_a.shared_tier, "set", record_thread(worker_a.shared_tier.set))
+    monkeypatch.setattr(worker_b.shared_tier, "get", record_thread(worker_b.shared_tier.get))
+
+    async def compute():
+        return {"docs": [1]}
+
+    asyncio.run(worker_a.get_or_compute("search", "k", compute))
+    assert asyncio.run(worker_b.get_or_compute("search", "k", compute)) == {"docs": [1]}
+    assert worker_b.get_stats()["search_cache"]["shared_hits"] == 1
+    assert len(threads) == 2
+    assert all(name.startswith("cache-shared") for name in threads)
+
+def test_invalidation_in_one_worker_retires_shared_entries_for_all(tmp_path, monkeypatch):
+    monkeypatch.setenv("CACHE_SHARED_BACKEND", "sqlite")
+    monkeypatch.setenv("CACHE_SQLITE_PATH", str(tmp_path / "cache.sqlite3"))
+    monkeypatch.setenv("CACHE_GENERATION_TTL", "0")
+    worker_a = CacheService()
+    worker_b = CacheService()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        return {"docs": len(calls)}
+
+    async def search(cache_service):
+        return await cache_service.get_or_compute("search", "q", compute, tags=("solr",))
+
+    assert asyncio.run(search(worker_a)) == {"docs": 1}
+    assert asyncio.run(search(worker_b)) == {"docs": 1}  # shared hit, worker B never tagged it
+
+    # Worker B sees the mutation; worker A's local copy and the shared entry must both retire
+    worker_b.invalidate("solr")
+    assert asyncio.run(search(worker_a)) == {"docs": 2}
+    assert asyncio.run(search(worker_b)) == {"docs": 2}
+    assert len(calls) == 2
+
+def test_generations_are_reused_briefly_and_bumped_off_the_loop(tmp_path, monkeypatch):
+    monkeypatch.setenv("CACHE_SHARED_BACKEND", "sqlite")
+    monkeypatch.setenv("CACHE_SQLITE_PATH", str(tmp_path / "cache.sqlite3"))
+    cache_service = CacheService()
+    shared = cache_service.shared_tier
+    reads = []
+    bump_threads = []
+
+    def get_generations(scopes):
+        reads.append(scopes)
+        return type(shared).get_generations(shared, scopes)
+
+    def bump_generation(scope):
+        bump_threads.append(threading.current_thread().name)
+        return type(shared).bump_generation(shared, scope)
+
+    monkeypatch.setattr(shared, "get_generations", get_generations)
+    monkeypatch.setattr(shared, "bump_generation", bump_generation)
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        return {"docs": len(calls)}
+
+    async def run():
+        search = lambda: cache_service.get_or_compute("search", "q", compute, tags=("solr",))
+        first = await search()
+        hit = await search()
+        cache_service.invalidate("solr")  # as an invalidation bus callback on the loop would
+        return first, hit, await search()
+
+    assert asyncio.run(run()) == ({"docs": 1}, {"docs": 1}, {"docs": 2})
+    assert len(reads) == 1  # the hit and the post-invalidation lookup reused known generations
+    assert len(bump_threads) == 1 and bump_threads[0].startswith("cache-shared")
+
+def test_unreadable_generations_bypass_the_cache(tmp_path, monkeypatch):
+    monkeypatch.setenv("CACHE_SHARED_BACKEND", "sqlite")
+    monkeypatch.setenv("CACHE_SQLITE_PATH", str(tmp_path / "cache.sqlite3"))
+    cache_service = CacheService()
+    monkeypatch.setattr(cache_service.shared_tier, "get_generations", lambda scopes: None)
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        return {"docs": len(calls)}
+
+    for _ in range(2):
+        asyncio.run(cache_service.get_or_compute("search", "q", compute, tags=("solr",)))
+    assert len(calls) == 2
+
+def test_invalidation_evicts_only_tagged_entries():
+    cache_service = get_cache_service()
+    cache_service.clear("search")
+    calls = []
+
+    @cached("search", tags=("solr",))
+    async def solr_search(query):
+        calls.append(query)
+        return {"docs": [query]}
+
+    @cached("search", tags=("graph",))
+    async def graph_search(query):
+        calls.append(query)
+        return {"nodes": [query]}
+
+    async def run():
+        await solr_search("pump")
+        await graph_search("valve")
+        get_invalidation_bus().publish("solr", source="test")
+        await solr_search("pump")
+        await graph_search("valve")
+
+    asyncio.run(run())
+    assert calls == ["pump", "valve", "pump"]
+    assert cache_service.get_stats()["invalidation"]["evicted"]["solr"] >= 1
+
+def test_stale_entry_served_while_refreshed_once(monkeypatch):
+    monkeypatch.setenv("CACHE_SHARED_BACKEND", "none")
+    cache_service = CacheService()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"docs": len(calls)}
+
+    async def run():
+        first = await cache_service.get_or_compute("search", "k", compute, ttl_seconds=0.05, stale_seconds=60)
+        await asyncio.sleep(0.1)
+        stale = await asyncio.gather(*[
+            cache_service.get_or_compute("search", "k", compute, ttl_seconds=0.05, stale_seconds=60)
+            for _ in range(5)
+        ])
+        await asyncio.sleep(0.05)
+        fresh = await cache_service.get_or_compute("search", "k", compute, ttl_seconds=0.05, stale_seconds=60)
+        return first, stale, fresh
+
+    first, stale, fresh = asyncio.run(run())
+    assert first == {"docs": 1}
+    assert stale == [{"docs": 1}] * 5
+    assert fresh == {"docs": 2}
+    assert len(calls) == 2
+
+    stats = cache_service.get_stats()["search_cache"]
+    assert stats["stale_hits"] == 5
+    assert stats["refreshes"] == 1
+    assert stats["stale_age_max_seconds"] > 0
@@ -21,7 +21,7 @@ async def test_chat():
         # Debug LLM response
         if hasattr(enhanced_chat_service.llm_service, 'generate_response'):
             print("\nTesting direct LLM call...")
-            direct_response = enhanced_chat_service.llm_service.generate_response("Say hello", max_tokens=50)
+            direct_response = await enhanced_chat_service.llm_service.generate_response("Say hello", max_tokens=50)
             print(f"Direct LLM response: {repr(direct_response.get('response', 'No response'))}")
             print(f"Direct LLM success: {direct_response.get('success', False)}")
 
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Tests for the closed/open/half-open circuit breaker
+"""
+from backend.circuit_breaker import CircuitBreaker
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def test_breaker_opens_after_consecutive_failures_and_recovers_through_half_open():
+    clock = FakeClock()
+    breaker = CircuitBreaker("test", failure_threshold=3, reset_timeout=10, clock=clock)
+
+    breaker.record_failure("boom")
+    breaker.record_success()  # Only consecutive failures count
+    for _ in range(3):
+        assert breaker.allow_request()
+        breaker.record_failure("boom")
+
+    assert breaker.state == "open"
+    assert not breaker.allow_request()
+    clock.now = 4
+    assert breaker.get_state()["retry_in_seconds"] == 6
+
+    # After the reset timeout exactly one trial request is let through
+    clock.now = 10
+    assert breaker.allow_request()
+    assert not breaker.allow_request()
+    breaker.record_failure("still down")
+    assert breaker.state == "open"
+
+    clock.now = 20
+    assert breaker.allow_request()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.get_state()["opened"] == 2
+    assert breaker.get_state()["rejected"] == 2
+
+def test_trip_opens_immediately_and_release_frees_the_trial_slot():
+    clock = FakeClock()
+    breaker = CircuitBreaker("test", failure_threshold=5, reset_timeout=10, clock=clock)
+
+    breaker.trip("health check failed")
+    assert breaker.state == "open"
+    assert breaker.get_state()["last_failure"] == "health check failed"
+
+    clock.now = 10
+    assert breaker.allow_request()
+    breaker.release()  # e.g. the trial request was cancelled
+    assert breaker.allow_request()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Tests for the persistent embedding store
+"""
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from backend.embedding_store import EmbeddingStore
+
+def fake_encoder(calls):
+    def encode(texts):
+        calls.append(list(texts))
+        return np.array([[float(len(t)), 1.0, 2.0] for t in texts])
+    return encode
+
+def test_encodes_only_missing_texts(tmp_path):
+    calls = []
+    store = EmbeddingStore("test-model", store_dir=str(tmp_path))
+
+    first = store.get_or_encode(["alpha", "beta", "alpha"], fake_encoder(calls))
+    second = store.get_or_encode(["beta", "gamma"], fake_encoder(calls))
+
+    assert calls == [["alpha", "beta"], ["gamma"]]
+    assert first.shape == (3, 3)
+    assert np.allclose(first[1], second[0])
+
+def test_store_survives_reopen(tmp_path):
+    calls = []
+    EmbeddingStore("test-model", store_dir=str(tmp_path)).get_or_encode(["alpha"], fake_encoder(calls))
+
+    reopened = EmbeddingStore("test-model", store_dir=str(tmp_path))
+    vector = reopened.get("alpha")
+
+    assert vector is not None
+    assert np.allclose(vector, [5.0, 1.0, 2.0])
+    assert reopened.get_stats()["vectors"] == 1
+
+def test_rejects_dimension_mismatch(tmp_path):
+    store = EmbeddingStore("test-model", store_dir=str(tmp_path))
+    store.put_many(["alpha"], np.ones((1, 3)))
+
+    with pytest.raises(ValueError):
+        store.put_many(["beta"], np.ones((1, 4)))
+
+def test_torn_row_is_truncated_so_later_rows_stay_aligned(tmp_path):
+    calls = []
+    EmbeddingStore("test-model", store_dir=str(tmp_path)).get_or_encode(["alpha"], fake_encoder(calls))
+    vectors_path = tmp_path / "test-model" / "vectors.f32"
+    with open(vectors_path, "ab") as f:
+        f.write(b"\x00" * 5)  # A crash mid-append
+
+    store = EmbeddingStore("test-model", store_dir=str(tmp_path))
+    assert vectors_path.stat().st_size == 12
+    store.get_or_encode(["beta"], fake_encoder(calls))
+
+    # Another writer crashes after this store loaded
+    with open(vectors_path, "ab") as f:
+        f.write(b"\x00" * 7)
+    store.get_or_encode(["gamma"], fake_encoder(calls))
+
+    reopened = EmbeddingStore("test-model", store_dir=str(tmp_path))
+    assert np.allclose(reopened.get("alpha"), [5.0, 1.0, 2.0])
+    assert np.allclose(reopened.get("beta"), [4.0, 1.0, 2.0])
+    assert np.allclose(reopened.get("gamma"), [5.0, 1.0, 2.0])
+    assert vectors_path.stat().st_size == 36
@@ -19,15 +19,15 @@ async def test_enhanced_chat():
 
     # Test LLM service availability
     llm_service = OfflineLLMService()
-    print(f"🔍 LLM Service Available: {llm_service.is_service_available()}")
+    print(f"🔍 LLM Service Available: {await llm_service.is_service_available()}")
 
-    if not llm_service.is_service_available():
+    if not await llm_service.is_service_available():
         print("❌ LLM service not available. Please start Ollama service first.")
         print("   Run: ollama serve")
         return
 
     # Available models
-    models = llm_service.list_available_models()
+    models = await llm_service.list_available_models()
     print(f"📚 Available Models: {models}")
 
     if not models:
@@ -80,7 +80,7 @@ async def test_llm_direct():
     test_prompt = "Explain how knowledge graphs work in simple terms."
 
     try:
-        response = llm_service.generate_response(test_prompt, max_tokens=200)
+        response = await llm_service.generate_response(test_prompt, max_tokens=200)
         if response['success']:
             print("✅ LLM Response Generated Successfully")
             print(f"   📝 Response: {response['response'][:150]}...")
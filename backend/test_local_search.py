@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Tests for the embedded SQLite FTS5 search engine and Solr fallback
+"""
+import asyncio
+
+from backend.local_search import FallbackSearchService, LocalSearchService, parse_query
+from backend.solr_service import SolrService
+
+GRAPH = {
+    "nodes": [
+        {"id": "1", "label": "Centrifugal pump", "group": "Part", "properties": {"name": "Pump A", "weight": 12.5}},
+        {"id": "2", "label": "Gate valve", "group": "Part", "properties": {"name": "Valve B", "weight": 4}},
+        {"id": "3", "label": "Acme", "group": "Supplier", "properties": {"name": "Acme pump works"}}
+    ],
+    "edges": [{"id": "e1", "label": "SUPPLIES", "from": "3", "to": "1", "properties": {}}]
+}
+
+def test_parse_query_translates_solr_syntax():
+    assert parse_query("*:*") == (None, {})
+    assert parse_query('pump "gate valve" AND type:node') == ('"gate valve" OR "pump"', {"type": "node"})
+    assert parse_query("label:pump") == ('label : "pump"', {})
+
+def test_local_engine_indexes_and_searches_like_solr(tmp_path):
+    engine = LocalSearchService(path=str(tmp_path / "index.sqlite3"))
+
+    async def run():
+        indexed = await engine.index_graph_data(GRAPH)
+        hits = await engine.search.__wrapped__(engine, "pump", {"type": "node"}, fields=["label", "score"],
+                                               highlight=True, facet_fields=["group"], stats_fields=["weight"])
+        everything = await engine.search.__wrapped__(
+            engine, "*:*", facet_ranges=[{"field": "weight", "start": 0, "end": 20, "gap": 10}]
+        )
+        pages = [docs async for docs in engine.iterate_search("*:*", page_size=3)]
+        stored = await engine.get_documents(["node_1", "node_9"], fields="id,label")
+        await engine.update_properties({**GRAPH["nodes"][1], "properties": {"name": "Valve C", "weight": 4}},
+                                       GRAPH["nodes"][1]["properties"])
+        updated = await engine.search.__wrapped__(engine, "name", {"prop_name": "Valve C"})
+        await engine.delete_documents(["node_3"])
+        stats = await engine.get_index_stats()
+        return indexed, hits, everything, pages, stored, updated, stats
+
+    indexed, hits, everything, pages, stored, updated, stats = asyncio.run(run())
+
+    assert indexed["total_indexed"] == 4
+    assert hits["total"] == 2
+    assert {doc["id"] for doc in hits["docs"]} == {"node_1", "node_3"}
+    assert set(hits["docs"][0]) == {"id", "label", "score", "highlights"}
+    assert any("<em>" in doc["highlights"].get("content", [""])[0] for doc in hits["docs"])
+    assert hits["facets"]["group"] == [{"value": "Part", "count": 1}, {"value": "Supplier", "count": 1}]
+    assert hits["stats"]["prop_weight"]["max"] == 12.5
+
+    assert everything["total"] == 4
+    assert everything["range_facets"]["prop_weight"]["buckets"] == [{"value": "0", "count": 1},
+                                                                    {"value": "10", "count": 1}]
+    assert [len(docs) for docs in pages] == [3, 1]
+    assert stored == {"docs": {"node_1": {"id": "node_1", "label": "Centrifugal pump"}}}
+    assert updated["total"] == 1
+    assert stats["documents"] == 3
+
+def test_fallback_serves_local_results_while_solr_is_down(tmp_path):
+    solr = SolrService(solr_url="http://127.0.0.1:1/solr", collection="test")
+    solr.retries = 0
+    service = FallbackSearchService(solr, LocalSearchService(path=str(tmp_path / "index.sqlite3")))
+
+    async def run():
+        # Writes are mirrored, so the local engine has the data Solr would have
+        await service.index_graph_data(GRAPH)
+        first = await service.search("valve")
+        second = await service.search("valve")
+        await solr.close()
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first["engine"] == "local"
+    assert [doc["id"] for doc in first["docs"]] == ["node_2"]
+    assert second["engine"] == "local"
+    assert service.fallback_searches == 2
+
+def test_index_documents_applies_atomic_updates(tmp_path):
+    engine = LocalSearchService(path=str(tmp_path / "index.sqlite3"))
+
+    async def run():
+        await engine.index_graph_data(GRAPH)
+        await engine.index_documents([{"id": "node_2", "prop_weight": {"inc": 1}, "prop_name": {"set": None}}])
+        return await engine.get_documents(["node_2"], fields="id,label,prop_weight,prop_name")
+
+    assert asyncio.run(run())["docs"]["node_2"] == {"id": "node_2", "label": "Gate valve", "prop_weight": 5}
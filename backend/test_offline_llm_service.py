@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Tests for the async OfflineLLMService client against a local fake Ollama endpoint
+"""
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from backend.unstructured_pipeline.llm_service import OfflineLLMService
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    """Answers /api/generate; the prompt 'slow' takes a second"""
+
+    protocol_version = "HTTP/1.1"  # Keep-alive, so connection reuse is observable
+
+    def do_GET(self):
+        self.server.gets += 1
+        self._reply({"models": [{"name": "test-model"}]})
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        self.server.requests.append((self.client_address[1], payload))
+        if payload["prompt"] == "slow":
+            time.sleep(1)
+        self._reply({"model": payload["model"], "response": f"echo {payload['prompt']}", "total_duration": 1e6})
+
+    def _reply(self, body):
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def fake_ollama():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeOllamaHandler)
+    server.requests = []
+    server.gets = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def test_generations_run_concurrently_and_slow_ones_can_be_cancelled(fake_ollama):
+    llm = OfflineLLMService(base_url=f"http://127.0.0.1:{fake_ollama.server_port}", model="test-model")
+
+    async def scenario():
+        slow = asyncio.ensure_future(asyncio.wait_for(llm.generate_response("slow"), timeout=0.3))
+        started = time.perf_counter()
+        fast = await llm.generate_response("fast", max_tokens=42, temperature=0.1)
+        fast_elapsed = time.perf_counter() - started
+        with pytest.raises(asyncio.TimeoutError):
+            await slow
+        again = await llm.generate_response("again")
+        await llm.close()
+        return fast, fast_elapsed, again
+
+    fast, fast_elapsed, again = asyncio.run(scenario())
+
+    assert fast["success"] is True
+    assert fast["response"] == "echo fast"
+    # The slow generation in flight does not hold up the fast one
+    assert fast_elapsed < 0.5
+    assert again["response"] == "echo again"
+
+    payloads = {payload["prompt"]: (port, payload) for port, payload in fake_ollama.requests}
+    assert payloads["fast"][1]["options"] == {"temperature": 0.1, "num_predict": 42}
+    # Sequential generations reuse the pooled keep-alive connection
+    assert payloads["again"][0] == payloads["fast"][0]
+
+def test_generations_fail_fast_while_ollama_is_down():
+    # Nothing listens on port 1
+    llm = OfflineLLMService(base_url="http://127.0.0.1:1", model="test-model")
+    llm.breaker.failure_threshold = 2
+
+    async def scenario():
+        failures = [await llm.generate_response("hello") for _ in range(2)]
+        rejected = await llm.generate_response("hello")
+        available = await llm.is_service_available()
+        await llm.close()
+        return failures, rejected, available
+
+    failures, rejected, available = asyncio.run(scenario())
+
+    assert all(not result["success"] for result in failures)
+    assert "circuit breaker open" in rejected["error"]
+    assert available is False
+    health = llm.get_health()
+    assert health["available"] is False
+    assert health["circuit_breaker"]["state"] == "open"
+    assert health["circuit_breaker"]["rejected"] == 1
+
+def test_health_check_caches_models_without_probing_each_generation(fake_ollama):
+    llm = OfflineLLMService(base_url=f"http://127.0.0.1:{fake_ollama.server_port}", model="test-model")
+
+    async def scenario():
+        await llm.check_health()
+        models = await llm.list_available_models()
+        await llm.generate_response("one")
+        await llm.generate_response("two")
+        await llm.close()
+        return models
+
+    assert asyncio.run(scenario()) == ["test-model"]
+    assert [payload["prompt"] for _, payload in fake_ollama.requests] == ["one", "two"]
+    assert fake_ollama.gets == 1
+    assert llm.get_health()["circuit_breaker"]["state"] == "closed"
+
+def test_client_from_a_previous_event_loop_is_closed():
+    llm = OfflineLLMService(base_url="http://127.0.0.1:1", model="test-model")
+    clients = []
+
+    async def use_client():
+        clients.append(llm._get_client())
+        await asyncio.sleep(0)
+
+    asyncio.run(use_client())
+    asyncio.run(use_client())
+
+    assert clients[0] is not clients[1]
+    assert clients[0].is_closed
+    assert not clients[1].is_closed
@@ -22,7 +22,7 @@ async def test_ollama_integration():
 
     # Test 1: Service availability
     print("1. Testing service availability...")
-    is_available = llm_service.is_service_available()
+    is_available = await llm_service.is_service_available()
     print(f"   Service available: {'✓' if is_available else '✗'}")
 
     if not is_available:
@@ -32,7 +32,7 @@ async def test_ollama_integration():
 
     # Test 2: List available models
     print("\n2. Testing model listing...")
-    models = llm_service.list_available_models()
+    models = await llm_service.list_available_models()
     print(f"   Available models: {len(models)} found")
     for model in models[:5]:  # Show first 5
         print(f"   - {model}")
@@ -47,7 +47,7 @@ async def test_ollama_integration():
     # Test 3: Basic text generation
     print("\n3. Testing basic text generation...")
     try:
-        response = llm_service.generate_response(
+        response = await llm_service.generate_response(
             "Say hello and introduce yourself in one sentence.",
             max_tokens=100
         )
@@ -73,7 +73,7 @@ async def test_ollama_integration():
     """
 
     try:
-        analysis = llm_service.analyze_document(test_document, "text")
+        analysis = await llm_service.analyze_document(test_document, "text")
         if analysis['success']:
             print("   ✓ Document analysis successful")
             analysis_data = analysis.get('analysis', {})
@@ -91,7 +91,7 @@ async def test_ollama_integration():
     # Test 5: Question answering
     print("\n5. Testing question answering...")
     try:
-        qa_result = llm_service.answer_question(
+        qa_result = await llm_service.answer_question(
             "What is artificial intelligence?",
             test_document
         )
@@ -112,7 +112,7 @@ async def test_ollama_integration():
     # Test 6: Entity extraction
     print("\n6. Testing entity extraction...")
     try:
-        entities = llm_service.extract_entities_llm(test_document)
+        entities = await llm_service.extract_entities_llm(test_document)
         if entities['success']:
             print("   ✓ Entity extraction successful")
             entity_data = entities.get('entities', {})
@@ -131,7 +131,7 @@ async def test_ollama_integration():
     # Test 7: Search query generation
     print("\n7. Testing search query enhancement...")
     try:
-        search_query = llm_service.generate_search_query("find documents about AI technology")
+        search_query = await llm_service.generate_search_query("find documents about AI technology")
         if search_query['success']:
             print("   ✓ Search query generation successful")
             search_data = search_query.get('search_params', {})
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Tests for deterministic reciprocal rank fusion
+"""
+from backend.rank_fusion import fuse_results, result_key
+
+def test_results_found_by_several_sources_rank_first_and_dedupe():
+    results = {
+        "solr": [
+            {"id": "node_a", "neo4j_id": "a", "label": "Pump", "score": 8.0},
+            {"id": "chunk_c1", "chunk_id": "c1", "content": "pump seal", "score": 2.0}
+        ],
+        "vector": [
+            {"chunk_id": "c1", "text": "pump seal", "similarity_score": 0.91},
+            {"chunk_id": "c2", "text": "valve", "similarity_score": 0.80}
+        ],
+        "graph": [{"p": {"id": "c1", "text": "pump seal", "document_filename": "a.pdf"}}]
+    }
+
+    fused = fuse_results("pump", results, weights={"graph": 0.5}, k=60)
+    ranked = fused["fused_analysis"]["fused_results"]
+
+    assert fused["method"] == "rrf"
+    assert [entry["key"] for entry in ranked] == ["chunk:c1", "neo4j:a", "chunk:c2"]
+    assert set(ranked[0]["sources"]) == {"solr", "vector", "graph"}
+    assert ranked[0]["sources"]["solr"] == {"rank": 2, "score": 0.0}
+    assert ranked[1]["sources"]["solr"]["score"] == 1.0
+    assert 0 < ranked[-1]["score"] < ranked[0]["score"] <= 1.0
+    assert fused["fused_analysis"]["source_counts"] == {"solr": 2, "vector": 2, "graph": 1}
+
+def test_fusion_is_deterministic_and_zero_weight_drops_a_source():
+    results = {"solr": [{"neo4j_id": "a"}, {"neo4j_id": "b"}], "graph": [{"name": "row"}]}
+
+    first = fuse_results("q", results)["fused_analysis"]["fused_results"]
+    second = fuse_results("q", results)["fused_analysis"]["fused_results"]
+    muted = fuse_results("q", results, weights={"graph": 0})["fused_analysis"]["fused_results"]
+
+    assert [entry["key"] for entry in first] == [entry["key"] for entry in second]
+    assert result_key({"name": "row"}).startswith("hash:")
+    assert [entry["key"] for entry in muted] == ["neo4j:a", "neo4j:b"]
+    assert muted[0]["score"] == 1.0
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Tests for the concurrent integrated search fan-out
+"""
+import asyncio
+import time
+
+from backend.search_fanout import fan_out
+
+def test_fan_out_runs_concurrently_and_reports_each_backend():
+    async def respond(delay, result):
+        await asyncio.sleep(delay)
+        return result
+
+    async def fail():
+        raise RuntimeError("connection refused")
+
+    started = time.perf_counter()
+    outcomes = asyncio.run(fan_out({
+        "solr": lambda: respond(0.2, {"docs": [{"id": "a"}]}),
+        "vector": lambda: respond(0.2, {"success": True, "results": []}),
+        "graph": lambda: respond(5, {"rawRecords": []}),
+        "neo4j": fail,
+        "other": lambda: respond(0, {"success": False, "error": "index missing"})
+    }, timeouts={"solr": 1, "vector": 1, "graph": 0.3}, budget=2))
+    elapsed = time.perf_counter() - started
+
+    # Bounded by the slowest deadline, not the sum of the delays
+    assert elapsed < 1
+    assert outcomes["solr"]["status"] == "ok"
+    assert outcomes["solr"]["result"] == {"docs": [{"id": "a"}]}
+    assert 150 < outcomes["solr"]["latency_ms"] < 1000
+    assert outcomes["vector"]["status"] == "ok"
+    assert outcomes["graph"]["status"] == "timeout"
+    assert outcomes["graph"]["result"] is None
+    assert outcomes["neo4j"] == {**outcomes["neo4j"], "status": "error", "error": "connection refused"}
+    assert outcomes["other"]["status"] == "error"
+    assert outcomes["other"]["error"] == "index missing"
+
+def test_budget_caps_every_backend_deadline():
+    outcomes = asyncio.run(fan_out(
+        {"solr": lambda: asyncio.sleep(1)}, timeouts={"solr": 10}, budget=0.1
+    ))
+
+    assert outcomes["solr"]["status"] == "timeout"
+    assert outcomes["solr"]["timeout_s"] == 0.1
+
+def test_degraded_integrated_responses_are_not_cached(monkeypatch):
+    monkeypatch.setenv("NEO4J_URI", "bolt://localhost:7687")
+    monkeypatch.setenv("NEO4J_USER", "neo4j")
+    monkeypatch.setenv("NEO4J_PASSWORD", "test")
+    from backend.routes.routes import cacheable_integrated_result
+
+    ok = {"status": "ok"}
+    llm_ok = {"intent_analysis": True, "system_queries": True, "integrated_response": True}
+    assert cacheable_integrated_result({"backends": {"solr": ok, "graph": ok}, "llm_status": llm_ok})
+    # No backend ran: the answer is an apology, not search results
+    assert not cacheable_integrated_result({"backends": {}, "llm_status": llm_ok})
+    assert not cacheable_integrated_result({"backends": {"solr": {"status": "timeout"}}, "llm_status": llm_ok})
+    for step in llm_ok:
+        assert not cacheable_integrated_result({"backends": {"solr": ok}, "llm_status": {**llm_ok, step: False}})
+
+def test_each_call_sees_its_own_deadline():
+    from backend.search_fanout import remaining_time
+
+    async def report():
+        return {"remaining": remaining_time()}
+
+    async def run():
+        outside = remaining_time()
+        outcomes = await fan_out({"solr": report, "graph": report}, timeouts={"solr": 1, "graph": 3}, budget=5)
+        return outside, outcomes
+
+    outside, outcomes = asyncio.run(run())
+    assert outside is None
+    assert 0.9 < outcomes["solr"]["result"]["remaining"] <= 1
+    assert 2.9 < outcomes["graph"]["result"]["remaining"] <= 3
+
+def test_neo4j_query_runs_with_a_transaction_timeout_in_its_own_thread(monkeypatch):
+    import threading
+    monkeypatch.setenv("NEO4J_URI", "bolt://localhost:7687")
+    monkeypatch.setenv("NEO4J_USER", "neo4j")
+    monkeypatch.setenv("NEO4J_PASSWORD", "test")
+    from backend.neo4j_service import Neo4jService
+
+    runs = []
+
+    class FakeResult:
+        def __iter__(self):
+            # Slower than the graph deadline; the session must outlive the cancelled awaiter
+            time.sleep(0.3)
+            return iter([])
+
+        def consume(self):
+            counters = type("Counters", (), {"contains_updates": False, "nodes_deleted": 0,
+                                             "relationships_deleted": 0})()
+            return type("Summary", (), {"counters": counters})()
+
+    class FakeSession:
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            runs[-1]["closed_in"] = threading.current_thread().name
+
+        def run(self, query, params=None):
+            runs.append({"timeout": query.timeout, "thread": threading.current_thread().name})
+            return FakeResult()
+
+    service = Neo4jService()
+    service.driver = type("Driver", (), {"session": lambda self, database=None: FakeSession()})()
+
+    outcomes = asyncio.run(fan_out(
+        {"graph": lambda: service.execute_query("MATCH (n) RETURN n")}, timeouts={"graph": 0.1}, budget=1
+    ))
+    service._query_executor.shutdown(wait=True)
+
+    assert outcomes["graph"]["status"] == "timeout"
+    assert 0 < runs[0]["timeout"] <= 0.1
+    assert runs[0]["thread"].startswith("neo4j-query")
+    assert runs[0]["closed_in"] == runs[0]["thread"]
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Tests for the semantic LLM response cache
+"""
+import asyncio
+import threading
+
+import pytest
+
+from backend import semantic_cache
+from backend.semantic_cache import SemanticCache, context_fingerprint, hashed_ngram_embedding
+from backend.unstructured_pipeline.llm_service import OfflineLLMService
+
+def test_similar_question_in_same_context_hits():
+    cache = SemanticCache("test", embed_fn=hashed_ngram_embedding, threshold=0.8)
+    fingerprint = context_fingerprint("llama2", "supplier catalogue")
+    cache.store("What suppliers do we have?", {"response": "Acme, Globex", "total_duration": 9e9}, fingerprint)
+
+    hit = cache.lookup("which suppliers do we have", fingerprint)
+
+    assert hit["response"] == "Acme, Globex"
+    assert "total_duration" not in hit
+    assert hit["semantic_cache"]["matched_question"] == "What suppliers do we have?"
+    assert hit["semantic_cache"]["similarity"] >= 0.8
+    assert hit["semantic_cache"]["saved_seconds"] == 9.0
+
+def test_other_context_or_unrelated_question_misses():
+    cache = SemanticCache("test", embed_fn=hashed_ngram_embedding, threshold=0.8)
+    fingerprint = context_fingerprint("llama2", "supplier catalogue")
+    cache.store("What suppliers do we have?", {"response": "Acme"}, fingerprint)
+
+    assert cache.lookup("What suppliers do we have?", context_fingerprint("llama2", "other doc")) is None
+    assert cache.lookup("How many pumps failed last year?", fingerprint) is None
+    assert cache.get_stats()["misses"] == 2
+
+def test_generate_cached_response_calls_llm_once(monkeypatch):
+    service = OfflineLLMService(base_url="http://localhost:1", model="test-model")
+    calls = []
+
+    async def generate_response(prompt, model=None, **kwargs):
+        calls.append(prompt)
+        return {"success": True, "response": "42", "model": "test-model", "total_duration": 1e9}
+
+    monkeypatch.setattr(service, "generate_response", generate_response)
+    context = f"context-{id(service)}"
+
+    first = asyncio.run(service.generate_cached_response("What is the answer?", "prompt 1", "answer", context=context))
+    second = asyncio.run(service.generate_cached_response("what is the answer", "prompt 2", "answer", context=context))
+
+    assert calls == ["prompt 1"]
+    assert "semantic_cache" not in first
+    assert second["response"] == "42"
+    assert second["semantic_cache"]["hit"] is True
+
+def test_exact_lookup_only_matches_the_same_normalized_question():
+    cache = SemanticCache("test", embed_fn=hashed_ngram_embedding, threshold=0.8)
+    fingerprint = context_fingerprint("llama2", "graph")
+    cache.store("Which suppliers do we have?", {"response": "MATCH (s:Supplier) RETURN s"}, fingerprint)
+
+    assert cache.lookup("which suppliers do we have", fingerprint, exact=True)["response"] == "MATCH (s:Supplier) RETURN s"
+    assert cache.lookup("which suppliers did we have", fingerprint) is not None
+    assert cache.lookup("which suppliers did we have", fingerprint, exact=True) is None
+
+def test_async_lookup_and_store_embed_off_the_event_loop():
+    threads = []
+
+    def embed(text):
+        threads.append(threading.current_thread())
+        return hashed_ngram_embedding(text)
+
+    cache = SemanticCache("test", embed_fn=embed, threshold=0.8)
+
+    async def run():
+        await cache.store_async("What suppliers do we have?", {"response": "Acme"}, "fp")
+        return await cache.lookup_async("what suppliers do we have", "fp")
+
+    assert asyncio.run(run())["response"] == "Acme"
+    assert len(threads) == 2
+    assert threading.main_thread() not in threads
+
+def test_answer_question_fingerprints_the_full_context(monkeypatch):
+    service = OfflineLLMService(base_url="http://localhost:1", model="test-model")
+    calls = []
+
+    async def generate_response(prompt, model=None, **kwargs):
+        calls.append(prompt)
+        return {"success": True, "response": '{"answer": "42"}', "model": "test-model"}
+
+    monkeypatch.setattr(service, "generate_response", generate_response)
+    prefix = f"shared-{id(service)} " * 300
+
+    asyncio.run(service.answer_question("What is the answer?", prefix + "first document"))
+    asyncio.run(service.answer_question("What is the answer?", prefix + "second document"))
+
+    assert len(calls) == 2
+
+def test_default_embedder_reuses_the_neo4j_service_model(monkeypatch):
+    class FakeNeo4jService:
+        embedding_model = object()
+        embedding_model_name = "test-model"
+
+        def __init__(self):
+            self.encoded = []
+
+        def _encode_texts(self, texts):
+            self.encoded.extend(texts)
+            return [[3.0, 4.0]]
+
+    service = FakeNeo4jService()
+    monkeypatch.setattr(semantic_cache, "get_neo4j_service", lambda: service)
+    monkeypatch.setattr(semantic_cache, "_default_embedder", None)
+
+    vector = semantic_cache.get_default_embedder()("list suppliers")
+
+    assert service.encoded == ["list suppliers"]
+    assert vector.tolist() == pytest.approx([0.6, 0.8])
@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+"""
+Tests for SolrService against a local fake Solr endpoint
+"""
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+from backend.invalidation_bus import SCOPE_SOLR, get_invalidation_bus
+from backend.solr_service import SolrService
+
+class FakeSolrHandler(BaseHTTPRequestHandler):
+    """Records update requests; rejects batches containing a document with id 'node_bad'"""
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path.startswith("/solr/test/select"):
+            # Large queries (kNN vectors) are POSTed as form data
+            self.server.requests.append((self.path, parse_qs(body.decode())))
+            self._reply(200, json.dumps(self.server.select_body or {}).encode())
+            return
+        docs = json.loads(body) if body else []
+        self.server.requests.append((self.path, docs))
+        status = 400 if isinstance(docs, list) and any(doc.get("id") == "node_bad" for doc in docs) else 200
+        self._reply(status)
+
+    def do_GET(self):
+        self.server.requests.append((self.path, None))
+        if self.path.startswith("/solr/test/select") and self.server.unavailable > 0:
+            self.server.unavailable -= 1
+            self._reply(503)
+            return
+        if self.path.startswith("/solr/test/select") and self.server.select_body is not None:
+            body = self.server.select_body
+            if callable(body):
+                body = body(parse_qs(urlsplit(self.path).query))
+            self._reply(200, json.dumps(body).encode())
+            return
+        self._reply(200)
+
+    def _reply(self, status, body=b'{"responseHeader": {"status": 0}}'):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def fake_solr():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeSolrHandler)
+    server.requests = []
+    server.unavailable = 0
+    server.select_body = None
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def test_index_graph_data_posts_batches_and_reports_failures(fake_solr):
+    solr = SolrService(solr_url=f"http://127.0.0.1:{fake_solr.server_port}/solr", collection="test")
+    graph_data = {
+        "nodes": [{"id": str(i), "label": f"Part {i}", "properties": {"name": f"p{i}"}} for i in range(9)]
+                 + [{"id": "bad", "label": "Broken"}],
+        "edges": [{"id": "e1", "label": "SUPPLIES", "from": "1", "to": "2"}]
+    }
+
+    result = asyncio.run(solr.index_graph_data(graph_data, batch_size=4))
+
+    updates = [docs for path, docs in fake_solr.requests if docs is not None]
+    assert sorted(len(docs) for docs in updates if docs[0]["type"] == "node") == [2, 4, 4]
+    assert result["nodes_indexed"] == 8
+    assert result["edges_indexed"] == 1
+    assert result["batches"] == 4
+    assert len(result["failed_batches"]) == 1
+    assert result["failed_batches"][0]["kind"] == "node"
+    assert result["failed_batches"][0]["last_id"] == "node_bad"
+
+def test_requests_retry_transient_errors_on_pooled_client(fake_solr):
+    solr = SolrService(solr_url=f"http://127.0.0.1:{fake_solr.server_port}/solr", collection="test")
+    solr.retry_backoff = 0
+    fake_solr.unavailable = 1
+
+    async def run():
+        result = await solr.search.__wrapped__(solr, "pump")
+        client = solr._client
+        await solr.commit()
+        assert solr._client is client
+        await solr.close()
+        return result
+
+    result = asyncio.run(run())
+    selects = [path for path, _ in fake_solr.requests if path.startswith("/solr/test/select")]
+    assert len(selects) == 2
+    assert "error" not in result
+    assert solr._client is None
+
+def test_commit_policy_uses_commit_within_soft_and_scheduled_hard_commits(fake_solr):
+    solr = SolrService(solr_url=f"http://127.0.0.1:{fake_solr.server_port}/solr", collection="test")
+    solr.commit_within_ms = 5000
+
+    async def run():
+        await solr.index_documents([{"id": "node_1", "type": "node"}])
+        await solr.commit()
+        solr.start_commit_scheduler(interval_seconds=0.05)
+        await asyncio.sleep(0.2)
+        pending_after_schedule = solr.get_commit_stats()["pending_updates"]
+        await solr.stop_commit_scheduler()
+        await solr.close()
+        return pending_after_schedule
+
+    pending_after_schedule = asyncio.run(run())
+    paths = [path for path, _ in fake_solr.requests]
+    assert paths[0] == "/solr/test/update?commitWithin=5000"
+    assert paths[1] == "/solr/test/update?softCommit=true"
+    # One hard commit for the single pending update; idle ticks send nothing
+    assert paths[2:] == ["/solr/test/update?commit=true&openSearcher=false"]
+    assert pending_after_schedule == 0
+    stats = solr.get_commit_stats()
+    assert stats["soft_commits"] == 1 and stats["hard_commits"] == 1
+    assert stats["scheduler_running"] is False
+
+def test_search_requests_facets_and_stats_and_structures_them(fake_solr):
+    solr = SolrService(solr_url=f"http://127.0.0.1:{fake_solr.server_port}/solr", collection="test")
+    fake_solr.select_body = {
+        "response": {"numFound": 1200, "docs": [{"id": "node_1"}]},
+        "facet_counts": {
+            "facet_fields": {"group": ["Part", 900, "Supplier", 300]},
+            "facet_ranges": {"prop_weight": {"counts": ["0", 700, "10", 500], "start": 0, "end": 20, "gap": 10}}
+        },
+        "stats": {"stats_fields": {"prop_weight": {"min": 0.5, "max": 19.0, "count": 1200, "mean": 8.2}}}
+    }
+
+    result = asyncio.run(solr.search.__wrapped__(
+        solr, "*:*", {"type": "node"}, 20, 0,
+        facet_fields=["group"],
+        facet_ranges=[{"field": "weight", "start": 0, "end": 20, "gap": 10}],
+        stats_fields=["weight"]
+    ))
+
+    params = parse_qs(urlsplit(fake_solr.requests[-1][0]).query)
+    assert params["fq"] == ["type:node"]
+    assert params["facet.field"] == ["group"]
+    assert params["facet.range"] == ["prop_weight"]
+    assert params["f.prop_weight.facet.range.gap"] == ["10"]
+    assert params["stats.field"] == ["prop_weight"]
+
+    assert result["total"] == 1200
+    assert result["facets"]["group"] == [{"value": "Part", "count": 900}, {"value": "Supplier", "count": 300}]
+    assert result["range_facets"]["prop_weight"]["buckets"][1] == {"value": "10", "count": 500}
+    assert result["range_facets"]["prop_weight"]["gap"] == 10
+    assert result["stats"]["prop_weight"]["max"] == 19.0
+
+def test_cursor_search_pages_with_opaque_tokens_and_exports_everything(fake_solr):
+    solr = SolrService(solr_url=f"http://127.0.0.1:{fake_solr.server_port}/solr", collection="test")
+    ids = [f"node_{i}" for i in range(5)]
+
+    def select(params):
+        # cursorMark is the index of the next document
+        start = 0 if params["cursorMark"] == ["*"] else int(params["cursorMark"][0])
+        rows = int(params["rows"][0])
+        page = ids[start:start + rows]
+        return {"response": {"numFound": len(ids), "docs": [{"id": i} for i in page]},
+                "nextCursorMark": str(start + len(page))}
+
+    fake_solr.select_body = select
+
+    async def run():
+        first = await solr.search.__wrapped__(solr, "pump", None, 2, cursor="*")
+        second = await solr.search.__wrapped__(solr, "pump", None, 2, cursor=first["next_cursor"])
+        exported = [doc["id"] async for docs in solr.iterate_search("pump", page_size=2) for doc in docs]
+        return first, second, exported
+
+    first, second, exported = asyncio.run(run())
+    params = parse_qs(urlsplit(fake_solr.requests[0][0]).query)
+    assert params["sort"] == ["id asc"] and "start" not in params
+    assert [doc["id"] for doc in second["docs"]] == ["node_2", "node_3"]
+    assert exported == ids
+
+    # Tokens are bound to the query they came from
+    with pytest.raises(ValueError):
+        solr.decode_cursor(first["next_cursor"], "other query")
+    with pytest.raises(ValueError):
+        solr.decode_cursor("not-a-cursor", "pump")
+
+def test_search_projects_fields_and_attaches_highlights(fake_solr):
+    solr = SolrService(solr_url=f"http://127.0.0.1:{fake_solr.server_port}/solr", collection="test")
+    fake_solr.select_body = {
+        "response": {"numFound": 2, "docs": [{"id": "node_1", "label": "Pump"}, {"id": "node_2", "label": "Valve"}]},
+        "highlighting": {"node_1": {"content": ["centrifugal <em>pump</em> for water"]}, "node_2": {"content": []}}
+    }
+
+    result = asyncio.run(solr.search.__wrapped__(solr, "pump", fields=["label"], highlight=True, snippet_length=80))
+
+    params = parse_qs(urlsplit(fake_solr.requests[-1][0]).query)
+    assert params["fl"] == ["id,label"]
+    assert params["hl.fl"] == ["content"]
+    assert params["hl.fragsize"] == ["80"]
+    assert result["docs"][0]["highlights"] == {"content": ["centrifugal <em>pump</em> for water"]}
+    assert result["docs"][1]["highlights"] == {}
+
+def test_update_properties_sends_atomic_update_for_changed_fields_only(fake_solr):
+    solr = SolrService(solr_url=f"http://127.0.0.1:{fake_solr.server_port}/solr", collection="test")
+    old = {"name": "Pump A", "status": "ok", "starts": 10, "serial": "X1", "site": "north"}
+    node = {"id": "42", "label": "Pump A", "group": "Part",
+            "properties": {"name": "Pump A", "status": "failed", "starts": 12, "serial": "X1"}}
+
+    result = asyncio.run(solr.update_properties(node, old, counters=["starts"]))
+    unchanged = asyncio.run(solr.update_properties(node, node["properties"]))
+
+    path, docs = fake_solr.requests[-1]
+    doc = docs[0]
+    assert path.startswith("/solr/test/update")
+    assert doc["id"] == "node_42"
+    assert doc["prop_status"] == {"set": "failed"}
+    assert doc["prop_starts"] == {"inc": 2}
+    assert doc["prop_site"] == {"set": None}
+    assert "prop_name" not in doc and "prop_serial" not in doc
+    assert "status:failed" in doc["content"]["set"]
+    assert result["success"] is True
+    assert unchanged == {"success": True, "updated_fields": []}
+    assert len(fake_solr.requests) == 1
+
+def test_knn_search_filters_in_the_same_request_and_indexes_chunks(fake_solr):
+    solr = SolrService(solr_url=f"http://127.0.0.1:{fake_solr.server_port}/solr", collection="test")
+    solr.vector_dimensions = 3
+    fake_solr.select_body = {"response": {"docs": [
+        {"id": "chunk_c1", "chunk_id": "c1", "text": "pump seal failure", "document_filename": "a.pdf", "score": 0.93}
+    ]}}
+
+    async def run():
+        indexed = await solr.index_chunks([{"id": "c1", "text": "pump seal failure"}], [[0.1, 0.2, 0.3]], "a.pdf")
+        found = await solr.knn_search([0.1, 0.2, 0.3], top_k=5, keywords="seal",
+                                      filters={"document_filename": "a.pdf"})
+        await solr.close()
+        return indexed, found
+
+    indexed, found = asyncio.run(run())
+
+    schema_requests = [body for path, body in fake_solr.requests if path.startswith("/solr/test/schema")]
+    assert schema_requests[0]["add-field-type"]["vectorDimension"] == 3
+    chunk_doc = next(body for path, body in fake_solr.requests
+                     if path.startswith("/solr/test/update?") and isinstance(body, list))[0]
+    assert chunk_doc["id"] == "chunk_c1" and chunk_doc["embedding"] == [0.1, 0.2, 0.3]
+    assert indexed["indexed"] == 1
+
+    path, form = fake_solr.requests[-1]
+    assert path == "/solr/test/select"
+    assert form["q"] == ["{!knn f=embedding topK=5}[0.1, 0.2, 0.3]"]
+    assert form["fq"] == ["{!term f=document_filename v=$filter0}", "{!edismax qf=text q.op=AND v=$keywords}"]
+    assert form["filter0"] == ["a.pdf"]
+    assert form["keywords"] == ["seal"]
+    assert found["results"] == [{"chunk_id": "c1", "text": "pump seal failure",
+                                 "document_filename": "a.pdf", "similarity_score": 0.93}]
+
+def test_commit_within_defers_invalidation_until_the_window_has_passed(fake_solr):
+    solr = SolrService(solr_url=f"http://127.0.0.1:{fake_solr.server_port}/solr", collection="test")
+    solr.commit_mode = "none"
+    solr.commit_within_ms = 150
+    events = []
+    bus = get_invalidation_bus()
+    bus.subscribe(events.append)
+
+    async def run():
+        await solr.index_documents([{"id": "node_1", "type": "node"}])
+        await solr.commit()
+        published_at_commit = len(events)
+        await asyncio.sleep(0.05)
+        # A later update pushes the publish back to its own window
+        await solr.index_documents([{"id": "node_2", "type": "node"}])
+        await solr.commit()
+        await asyncio.sleep(0.12)
+        published_in_first_window = len(events)
+        await solr.stop_commit_scheduler()
+        await solr.close()
+        return published_at_commit, published_in_first_window
+
+    try:
+        published_at_commit, published_in_first_window = asyncio.run(run())
+    finally:
+        bus.unsubscribe(events.append)
+
+    assert published_at_commit == 0
+    assert published_in_first_window == 0
+    assert [event["scope"] for event in events] == [SCOPE_SOLR]
+    assert events[0]["source"] == "solr.commit_within"
+
+def test_shutdown_publishes_a_deferred_invalidation_without_waiting(fake_solr):
+    solr = SolrService(solr_url=f"http://127.0.0.1:{fake_solr.server_port}/solr", collection="test")
+    solr.commit_mode = "none"
+    solr.commit_within_ms = 10000
+    events = []
+    bus = get_invalidation_bus()
+    bus.subscribe(events.append)
+
+    async def run():
+        await solr.index_documents([{"id": "node_1", "type": "node"}])
+        await solr.commit()
+        started = time.perf_counter()
+        await solr.stop_commit_scheduler()
+        await solr.close()
+        return time.perf_counter() - started
+
+    try:
+        elapsed = asyncio.run(run())
+    finally:
+        bus.unsubscribe(events.append)
+
+    assert elapsed < 1
+    assert [event["source"] for event in events] == ["solr.commit_within"]
+
+def test_clear_index_publishes_once_after_the_commit(fake_solr):
+    solr = SolrService(solr_url=f"http://127.0.0.1:{fake_solr.server_port}/solr", collection="test")
+    events = []
+    bus = get_invalidation_bus()
+    bus.subscribe(events.append)
+
+    async def run():
+        assert await solr.clear_index() is True
+        await solr.close()
+
+    try:
+        asyncio.run(run())
+    finally:
+        bus.unsubscribe(events.append)
+
+    assert [event["source"] for event in events] == ["solr.commit"]
+
+def test_knn_search_passes_filter_values_literally_and_rejects_bad_fields(fake_solr):
+    solr = SolrService(solr_url=f"http://127.0.0.1:{fake_solr.server_port}/solr", collection="test")
+    fake_solr.select_body = {"response": {"docs": []}}
+    injected = 'a.pdf" OR *:* OR document_filename:"b'
+
+    async def run():
+        found = await solr.knn_search([0.1], filters={"document_filename": injected})
+        rejected = await solr.knn_search([0.1], filters={"text:x OR id": "y"})
+        await solr.close()
+        return found, rejected
+
+    found, rejected = asyncio.run(run())
+
+    path, form = fake_solr.requests[-1]
+    assert form["fq"] == ["{!term f=document_filename v=$filter0}"]
+    assert form["filter0"] == [injected]
+    assert found["success"] is True
+    assert rejected["success"] is False
+    assert len([p for p, _ in fake_solr.requests if p.startswith("/solr/test/select")]) == 1
+
+def test_requests_inside_a_fan_out_are_bounded_by_its_deadline(fake_solr):
+    from backend.search_fanout import fan_out
+
+    solr = SolrService(solr_url=f"http://127.0.0.1:{fake_solr.server_port}/solr", collection="test")
+    sent_timeouts = []
+    request = solr._get_client
+
+    def recording_client():
+        client = request()
+        original = client.request
+
+        async def send(method, url, **kwargs):
+            sent_timeouts.append(kwargs.get("timeout"))
+            return await original(method, url, **kwargs)
+
+        client.request = send
+        return client
+
+    solr._get_client = recording_client
+
+    async def run():
+        await solr._request("GET", "select")
+        await fan_out({"solr": lambda: solr._request("GET", "select")}, timeouts={"solr": 0.5}, budget=1)
+        await solr.close()
+
+    asyncio.run(run())
+
+    assert sent_timeouts[0] is None  # outside a fan-out the client's own timeout applies
+    assert 0 < sent_timeouts[1] <= 0.5
+
+def test_client_from_a_previous_event_loop_is_closed():
+    solr = SolrService(solr_url="http://127.0.0.1:1/solr", collection="test")
+    clients = []
+
+    async def use_client():
+        clients.append(solr._get_client())
+        await asyncio.sleep(0)
+
+    asyncio.run(use_client())
+    asyncio.run(use_client())
+
+    assert clients[0].is_closed
+    assert not clients[1].is_closed
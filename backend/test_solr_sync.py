@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Tests for the incremental Neo4j -> Solr sync job
+"""
+import asyncio
+import json
+
+import pytest
+
+from backend.local_search import LocalSearchService
+from backend.neo4j_service import Neo4jService
+from backend.solr_service import SolrService
+from backend.solr_sync import (
+    DELETION_LOG_QUERY, EXISTING_NODES_QUERY, LABELS_QUERY, SolrSyncJob, page_query
+)
+
+class FakeNeo4j:
+    """In-memory graph exposing the Neo4jService pieces the sync job uses"""
+    _add_node_from_info = Neo4jService._add_node_from_info
+    _process_relationship = Neo4jService._process_relationship
+
+    def __init__(self):
+        self.driver = object()
+        self.database = "neo4j"
+        self.nodes = {}
+        self.nodes_deleted = 0
+
+    def delete_node(self, node_id):
+        """Delete a node and count it in the change log, as execute_query does"""
+        del self.nodes[node_id]
+        self.nodes_deleted += 1
+
+class RecordingSolr(SolrService):
+    """SolrService that keeps documents in a dict instead of calling Solr"""
+
+    def __init__(self):
+        super().__init__(solr_url="http://solr.invalid/solr", collection="test")
+        self.docs = {}
+        self.commits = 0
+        self.scans = []
+        self.sent = []
+
+    async def bulk_index(self, docs, batch_size=None, concurrency=None):
+        self.sent.append(docs)
+        for doc in docs:
+            if any(isinstance(value, dict) for value in doc.values()):
+                # Atomic update: apply each field's "set" to the stored copy
+                stored = self.docs[doc["id"]]
+                for field, value in doc.items():
+                    if field != "id":
+                        stored[field] = value["set"]
+            else:
+                self.docs[doc["id"]] = doc
+        return {"indexed": len(docs), "batches": 1, "failed_batches": []}
+
+    async def get_documents(self, ids, fields="id,label,group,properties"):
+        return {"docs": {doc_id: dict(self.docs[doc_id]) for doc_id in ids if doc_id in self.docs}}
+
+    async def scan_documents(self, cursor="*", rows=1000, fields="id,neo4j_id,type", query="*:*"):
+        self.scans.append(query)
+        doc_type = query.split(":", 1)[1] if query.startswith("type:") else None
+        ids = sorted(i for i, doc in self.docs.items() if doc_type is None or doc["type"] == doc_type)
+        start = 0 if cursor == "*" else int(cursor)
+        page = [self.docs[i] for i in ids[start:start + rows]]
+        next_cursor = str(start + len(page))
+        return {"docs": page, "next_cursor": next_cursor, "done": not page}
+
+    async def delete_documents(self, ids):
+        for doc_id in ids:
+            self.docs.pop(doc_id, None)
+        return {"success": True, "deleted": len(ids)}
+
+    async def commit(self):
+        self.commits += 1
+        return True
+
+class RecordingLocal(LocalSearchService):
+    """Local search engine that records what the sync job sends and scans"""
+
+    def __init__(self, path):
+        super().__init__(path=path)
+        self.scans = []
+        self.sent = []
+
+    @property
+    def docs(self):
+        rows = self._connection().execute("SELECT id, doc FROM documents").fetchall()
+        return {doc_id: json.loads(doc) for doc_id, doc in rows}
+
+    async def bulk_index(self, docs, batch_size=None, concurrency=None):
+        self.sent.append(docs)
+        return await super().bulk_index(docs, batch_size, concurrency)
+
+    async def scan_documents(self, cursor="*", rows=1000, fields="id,neo4j_id,type", query="*:*"):
+        self.scans.append(query)
+        return await super().scan_documents(cursor, rows, fields, query)
+
+@pytest.fixture(params=["solr", "local"])
+def solr(request, tmp_path):
+    """The sync job's search backend: Solr (stubbed) or the local engine (SEARCH_BACKEND=local)"""
+    if request.param == "local":
+        return RecordingLocal(str(tmp_path / "index.sqlite3"))
+    return RecordingSolr()
+
+class FakeSyncJob(SolrSyncJob):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.queries = []
+
+    def _read(self, query, params):
+        self.queries.append(query)
+        graph = self.neo4j
+        if query == LABELS_QUERY:
+            labels = {label for node in graph.nodes.values() for label in node["labels"]}
+            return [{"label": label} for label in sorted(labels)]
+        for label in {label for node in graph.nodes.values() for label in node["labels"]}:
+            if query == page_query("nodes", label, self.updated_property):
+                rows = sorted(
+                    (node["properties"][self.updated_property], node_id, node)
+                    for node_id, node in graph.nodes.items()
+                    if label in node["labels"] and self.updated_property in node["properties"]
+                )
+                rows = [row for row in rows if (row[0], row[1]) > (params["since"], params["after_id"])]
+                return [{"elementId": node_id, "labels": node["labels"], "properties": node["properties"], "hw": hw}
+                        for hw, node_id, node in rows[:params["limit"]]]
+        if query == DELETION_LOG_QUERY:
+            return [{"nodes": graph.nodes_deleted, "relationships": 0}]
+        if query == EXISTING_NODES_QUERY:
+            return [{"id": node_id, "exists": node_id in graph.nodes} for node_id in params["ids"]]
+        return []
+
+def test_sync_indexes_changes_resumes_and_removes_deleted(tmp_path, solr):
+    neo4j = FakeNeo4j()
+    checkpoint = str(tmp_path / "sync.json")
+    for i in range(5):
+        neo4j.nodes[f"n{i}"] = {"labels": ["Part"], "properties": {"name": f"p{i}", "updated_at": 100 + i}}
+
+    job = FakeSyncJob(neo4j, solr, checkpoint_path=checkpoint, page_size=2)
+    first = asyncio.run(job.run(max_pages=1))
+    assert first["nodes"]["indexed"] == 2
+    assert first["complete"] is False
+
+    # A fresh job resumes from the saved checkpoint
+    job = FakeSyncJob(neo4j, solr, checkpoint_path=checkpoint, page_size=2)
+    second = asyncio.run(job.run())
+    assert second["nodes"]["indexed"] == 3
+    assert sorted(solr.docs) == [f"node_n{i}" for i in range(5)]
+
+    # Only changed nodes are re-sent
+    neo4j.nodes["n1"]["properties"]["updated_at"] = 200
+    neo4j.delete_node("n3")
+    third = asyncio.run(job.run())
+    assert third["nodes"]["indexed"] == 1
+    assert third["deletions"]["deleted"] == 1
+    assert "node_n3" not in solr.docs
+
+    # The change log is not reprocessed once reconciled
+    scans = len(solr.scans)
+    fourth = asyncio.run(job.run())
+    assert fourth["deletions"]["checked"] == 0
+    assert fourth["nodes"]["indexed"] == 0
+    assert len(solr.scans) == scans
+
+def test_sync_pages_per_label_over_an_index(tmp_path, solr):
+    neo4j = FakeNeo4j()
+    neo4j.nodes["a"] = {"labels": ["Part"], "properties": {"updated_at": 1}}
+    neo4j.nodes["b"] = {"labels": ["Supplier"], "properties": {"updated_at": 2}}
+    neo4j.nodes["c"] = {"labels": ["Supplier"], "properties": {"name": "never stamped"}}
+
+    job = FakeSyncJob(neo4j, solr, checkpoint_path=str(tmp_path / "sync.json"))
+    result = asyncio.run(job.run())
+
+    assert result["nodes"]["indexed"] == 2
+    assert set(result["nodes"]["high_water_marks"]) == {"Part", "Supplier"}
+    indexes = [q for q in job.queries if q.startswith("CREATE INDEX")]
+    assert indexes == [
+        "CREATE INDEX IF NOT EXISTS FOR (n:`Part`) ON (n.`updated_at`)",
+        "CREATE INDEX IF NOT EXISTS FOR (n:`Supplier`) ON (n.`updated_at`)"
+    ]
+    # The seek predicate is on the indexed property of a single label
+    assert "MATCH (n:`Part`) WHERE n.`updated_at` >= $since" in page_query("nodes", "Part", "updated_at")
+
+def test_deletion_scan_is_filtered_by_type_and_stops_once_all_logged_deletions_are_found(tmp_path, solr):
+    neo4j = FakeNeo4j()
+    for i in range(10):
+        neo4j.nodes[f"n{i}"] = {"labels": ["Part"], "properties": {"updated_at": i}}
+    asyncio.run(solr.bulk_index([{"id": "edge_r1", "type": "relationship", "neo4j_id": "r1"}]))
+
+    job = FakeSyncJob(neo4j, solr, checkpoint_path=str(tmp_path / "sync.json"), page_size=2)
+    asyncio.run(job.run())
+    neo4j.delete_node("n1")
+    result = asyncio.run(job.run())
+
+    assert result["deletions"] == {"checked": 2, "deleted": 1, "pages": 1, "complete": True}
+    # Relationship documents were not scanned: no relationship deletions were logged
+    assert set(solr.scans) == {"type:node"}
+    assert "edge_r1" in solr.docs
+
+def test_changed_indexed_elements_are_sent_as_atomic_updates(tmp_path, solr):
+    neo4j = FakeNeo4j()
+    neo4j.nodes["a"] = {"labels": ["Part"], "properties": {"name": "pump", "color": "red", "updated_at": 1}}
+    neo4j.nodes["b"] = {"labels": ["Part"], "properties": {"name": "valve", "updated_at": 1}}
+    job = FakeSyncJob(neo4j, solr, checkpoint_path=str(tmp_path / "sync.json"))
+    asyncio.run(job.run())
+
+    neo4j.nodes["a"]["properties"].update(color="blue", updated_at=2)
+    neo4j.nodes["c"] = {"labels": ["Part"], "properties": {"name": "seal", "updated_at": 2}}
+    result = asyncio.run(job.run())
+
+    assert result["nodes"]["atomic_updates"] == 1
+    update, new_doc = solr.sent[-1]
+    assert update["id"] == "node_a"
+    assert update["prop_color"] == {"set": "blue"}
+    assert update["prop_updated_at"] == {"set": 2}
+    assert "prop_name" not in update  # unchanged fields are not sent
+    assert new_doc["id"] == "node_c" and new_doc["prop_name"] == "seal"
+    assert solr.docs["node_a"]["prop_color"] == "blue"
+    assert solr.docs["node_a"]["prop_name"] == "pump"
+
+def test_label_change_resends_the_full_document(tmp_path, solr):
+    neo4j = FakeNeo4j()
+    neo4j.nodes["a"] = {"labels": ["Part"], "properties": {"updated_at": 1}}
+    job = FakeSyncJob(neo4j, solr, checkpoint_path=str(tmp_path / "sync.json"), labels=["Part", "Spare"])
+    asyncio.run(job.run())
+
+    neo4j.nodes["a"] = {"labels": ["Spare", "Part"], "properties": {"updated_at": 2}}
+    result = asyncio.run(job.run())
+
+    assert result["nodes"]["atomic_updates"] == 0
+    assert solr.sent[-1][0]["group"] == "Spare"
@@ -269,7 +269,7 @@ class DocumentIngestionService:
             if processed_data.get('chunks'):
                 try:
                     import asyncio
-                    from neo4j_service import get_neo4j_service
+                    from ..neo4j_service import get_neo4j_service
                     neo4j_service = get_neo4j_service()
 
                     # Create vector index if it doesn't exist
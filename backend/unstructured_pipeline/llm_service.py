@@ -1,15 +1,33 @@
 """
 Offline LLM Service for document understanding and question answering
+
+All generation is async: requests go through one pooled keep-alive
+httpx.AsyncClient, so a slow generation only occupies its own request and
+never blocks the event loop. Cancelling the awaiting task (e.g. a deadline
+via asyncio.wait_for) closes the connection, which makes Ollama stop
+generating.
+
+Availability is probed by a background health monitor rather than before
+every generation, and a circuit breaker makes generations fail fast while
+Ollama is down instead of each one waiting out a timeout.
 """
-import requests
+import asyncio
+import httpx
 import json
 import logging
 import os
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Set
 import time
 from datetime import datetime
 from dotenv import load_dotenv
 
+try:
+    from ..circuit_breaker import OPEN, CircuitBreaker
+    from ..semantic_cache import context_fingerprint, get_semantic_cache
+except ImportError:  # Imported as a top-level module by the standalone scripts
+    from circuit_breaker import OPEN, CircuitBreaker
+    from semantic_cache import context_fingerprint, get_semantic_cache
+
 logger = logging.getLogger(__name__)
 
 class OfflineLLMService:
@@ -34,40 +52,164 @@ class OfflineLLMService:
 
         self.base_url = base_url.rstrip('/')
         self.default_model = model
-        self.timeout = 60  # seconds
 
-    def is_service_available(self) -> bool:
+        # Pooled keep-alive HTTP client, created lazily inside the running event loop
+        self.timeout = httpx.Timeout(
+            float(os.getenv("OLLAMA_TIMEOUT", "60")),
+            connect=float(os.getenv("OLLAMA_CONNECT_TIMEOUT", "5"))
+        )
+        self.limits = httpx.Limits(
+            max_connections=int(os.getenv("OLLAMA_MAX_CONNECTIONS", "10")),
+            max_keepalive_connections=int(os.getenv("OLLAMA_MAX_KEEPALIVE", "5"))
+        )
+        self._client: Optional[httpx.AsyncClient] = None
+        self._client_loop: Optional[asyncio.AbstractEventLoop] = None
+        # Closes of clients from earlier event loops, kept referenced until done
+        self._closing_clients: Set[asyncio.Task] = set()
+
+        # Cached availability, refreshed by the health monitor (start_health_monitor)
+        self.health_interval = float(os.getenv("OLLAMA_HEALTH_INTERVAL", "15"))
+        self._health: Dict[str, Any] = {"available": None, "checked_at": None, "latency_ms": None,
+                                        "error": None, "models": []}
+        self._health_checked = 0.0
+        self._health_task: Optional[asyncio.Task] = None
+
+        # Generations fail fast while the breaker is open
+        self.breaker = CircuitBreaker(
+            "ollama",
+            failure_threshold=int(os.getenv("OLLAMA_BREAKER_FAILURES", "5")),
+            reset_timeout=float(os.getenv("OLLAMA_BREAKER_RESET", "30"))
+        )
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Get the pooled client for the running event loop"""
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client.is_closed or self._client_loop is not loop:
+            # Pooled connections belong to the loop that opened them
+            if self._client is not None and not self._client.is_closed:
+                self._retire_client(self._client, self._client_loop)
+            self._client = httpx.AsyncClient(timeout=self.timeout, limits=self.limits)
+            self._client_loop = loop
+        return self._client
+
+    def _retire_client(self, client: httpx.AsyncClient, loop: Optional[asyncio.AbstractEventLoop]) -> None:
+        """Close a client left behind by another event loop so its pooled connections are released"""
+        if loop is not None and loop.is_running():
+            # Its loop still runs in another thread: close it there
+            asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+            return
+
+        async def close():
+            try:
+                await client.aclose()
+            except Exception as e:
+                # Connections opened on a loop that has since closed may not shut down cleanly
+                logger.debug(f"Closing previous LLM HTTP client failed: {e}")
+
+        task = asyncio.get_running_loop().create_task(close())
+        self._closing_clients.add(task)
+        task.add_done_callback(self._closing_clients.discard)
+
+    async def close(self) -> None:
+        """Close the pooled HTTP client (called from the application lifespan)"""
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+            logger.info("LLM HTTP client closed")
+        self._client = None
+        self._client_loop = None
+
+    async def check_health(self) -> Dict[str, Any]:
+        """
+        Probe the LLM service (GET /api/tags) and cache the result
+
+        A failed probe trips the circuit breaker, so generations fail fast
+        without waiting for their own timeouts.
+        """
+        started = time.perf_counter()
+        try:
+            response = await self._get_client().get(f"{self.base_url}/api/tags", timeout=5)
+            response.raise_for_status()
+            models = [model['name'] for model in response.json().get('models', [])]
+            self._health.update({"available": True, "error": None, "models": models})
+        except Exception as e:
+            self._health.update({"available": False, "error": repr(e), "models": []})
+            self.breaker.trip(f"health check failed: {e!r}")
+
+        self._health["latency_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        self._health["checked_at"] = datetime.now().isoformat()
+        self._health_checked = time.monotonic()
+        return self._health
+
+    async def _fresh_health(self) -> Dict[str, Any]:
+        # Without a running monitor (e.g. standalone scripts) probe on demand once the cache is stale
+        if self._health["available"] is None or time.monotonic() - self._health_checked > 2 * self.health_interval:
+            await self.check_health()
+        return self._health
+
+    def start_health_monitor(self, interval_seconds: Optional[float] = None) -> Optional[asyncio.Task]:
+        """
+        Start a background task that probes the LLM service periodically
+
+        Must be called from a running event loop (e.g. the FastAPI lifespan).
+        The interval defaults to OLLAMA_HEALTH_INTERVAL seconds; 0 disables it.
+        """
+        if self._health_task is not None and not self._health_task.done():
+            return self._health_task
+
+        interval = interval_seconds or self.health_interval
+        if interval <= 0:
+            return None
+
+        async def probe_forever():
+            while True:
+                await self.check_health()
+                await asyncio.sleep(interval)
+
+        self._health_task = asyncio.get_running_loop().create_task(probe_forever())
+        logger.info(f"LLM health monitor started (every {interval}s)")
+        return self._health_task
+
+    async def stop_health_monitor(self) -> None:
+        """Stop the health monitor"""
+        if self._health_task is not None:
+            self._health_task.cancel()
+            try:
+                await self._health_task
+            except asyncio.CancelledError:
+                pass
+            self._health_task = None
+            logger.info("LLM health monitor stopped")
+
+    async def is_service_available(self) -> bool:
         """
         Check if the LLM service is available
 
         Returns:
-            True if service is responding
+            True if the last health check succeeded and the breaker is not open
         """
-        try:
-            response = requests.get(f"{self.base_url}/api/tags", timeout=5)
-            return response.status_code == 200
-        except:
-            return False
+        health = await self._fresh_health()
+        return bool(health["available"]) and self.breaker.state != OPEN
 
-    def list_available_models(self) -> List[str]:
+    async def list_available_models(self) -> List[str]:
         """
         List available models
 
         Returns:
-            List of available model names
+            List of available model names (from the last health check)
         """
-        try:
-            response = requests.get(f"{self.base_url}/api/tags", timeout=10)
-            if response.status_code == 200:
-                data = response.json()
-                return [model['name'] for model in data.get('models', [])]
-            return []
-        except Exception as e:
-            logger.error(f"Failed to list models: {str(e)}")
-            return []
+        return list((await self._fresh_health())["models"])
 
-    def generate_response(self, prompt: str, model: Optional[str] = None,
-                         temperature: float = 0.7, max_tokens: int = 500) -> Dict[str, Any]:
+    def get_health(self) -> Dict[str, Any]:
+        """Cached health check result and circuit breaker state"""
+        return {
+            **{key: value for key, value in self._health.items() if key != "models"},
+            "monitor_running": self._health_task is not None and not self._health_task.done(),
+            "circuit_breaker": self.breaker.get_state()
+        }
+
+    async def generate_response(self, prompt: str, model: Optional[str] = None,
+                                temperature: float = 0.7, max_tokens: int = 500,
+                                timeout: Optional[float] = None) -> Dict[str, Any]:
         """
         Generate response from LLM
 
@@ -76,14 +218,19 @@ class OfflineLLMService:
             model: Model to use (optional)
             temperature: Sampling temperature
             max_tokens: Maximum tokens to generate
+            timeout: Seconds to wait for this generation (default OLLAMA_TIMEOUT)
 
         Returns:
             Response dictionary
+
+        Raises:
+            asyncio.CancelledError: If the awaiting task is cancelled; the
+                connection is dropped and Ollama abandons the generation
         """
-        if not self.is_service_available():
+        if not self.breaker.allow_request():
             return {
                 'success': False,
-                'error': 'LLM service not available',
+                'error': 'LLM service not available (circuit breaker open)',
                 'response': '',
                 'model': model or self.default_model
             }
@@ -92,17 +239,22 @@ class OfflineLLMService:
             payload = {
                 'model': model or self.default_model,
                 'prompt': prompt,
-                'temperature': temperature,
-                'num_predict': max_tokens,
+                'options': {'temperature': temperature, 'num_predict': max_tokens},
                 'stream': False
             }
 
-            response = requests.post(
+            response = await self._get_client().post(
                 f"{self.base_url}/api/generate",
                 json=payload,
-                timeout=self.timeout
+                timeout=timeout if timeout is not None else self.timeout
             )
 
+            # Server errors count against the breaker; anything else means Ollama is up
+            if response.status_code >= 500:
+                self.breaker.record_failure(f"HTTP {response.status_code}")
+            else:
+                self.breaker.record_success()
+
             if response.status_code == 200:
                 result = response.json()
                 return {
@@ -123,8 +275,13 @@ class OfflineLLMService:
                     'model': model or self.default_model
                 }
 
+        except asyncio.CancelledError:
+            logger.info(f"LLM generation cancelled (model {model or self.default_model})")
+            self.breaker.release()
+            raise
         except Exception as e:
-            logger.error(f"LLM generation failed: {str(e)}")
+            logger.error(f"LLM generation failed: {e!r}")
+            self.breaker.record_failure(repr(e))
             return {
                 'success': False,
                 'error': str(e),
@@ -132,7 +289,39 @@ class OfflineLLMService:
                 'model': model or self.default_model
             }
 
-    def analyze_document(self, document_content: str, document_type: str = "general") -> Dict[str, Any]:
+    async def generate_cached_response(self, question: str, prompt: str, cache_name: str,
+                                       context: Any = None, model: Optional[str] = None,
+                                       exact: bool = False, **kwargs) -> Dict[str, Any]:
+        """
+        Generate a response, reusing the answer to a semantically similar question
+
+        Args:
+            question: The user's question, used for the similarity lookup
+            prompt: Full prompt sent to the LLM on a miss
+            cache_name: Semantic cache to use (answer, integrated, chat)
+            context: Whatever else the prompt was built from; answers are only
+                reused for the same context and model
+            model: Model to use (optional)
+            exact: Only reuse an answer to the same normalized question; for
+                responses that are executed rather than shown (e.g. Cypher)
+            **kwargs: Passed to generate_response
+
+        Returns:
+            Response dictionary; hits carry a ``semantic_cache`` provenance dict
+        """
+        semantic_cache = get_semantic_cache(cache_name)
+        fingerprint = context_fingerprint(model or self.default_model, kwargs, context)
+
+        cached = await semantic_cache.lookup_async(question, fingerprint, exact=exact)
+        if cached is not None:
+            return cached
+
+        response = await self.generate_response(prompt, model=model, **kwargs)
+        if response['success']:
+            await semantic_cache.store_async(question, response, fingerprint)
+        return response
+
+    async def analyze_document(self, document_content: str, document_type: str = "general") -> Dict[str, Any]:
         """
         Analyze document content using LLM
 
@@ -161,7 +350,7 @@ class OfflineLLMService:
         Format your response as a JSON object with these keys: summary, topics, entities, document_type, dates, sentiment
         """
 
-        response = self.generate_response(prompt, max_tokens=1000)
+        response = await self.generate_response(prompt, max_tokens=1000)
 
         if response['success']:
             try:
@@ -189,7 +378,7 @@ class OfflineLLMService:
                 'model': response['model']
             }
 
-    def answer_question(self, question: str, context: str, model: Optional[str] = None) -> Dict[str, Any]:
+    async def answer_question(self, question: str, context: str, model: Optional[str] = None) -> Dict[str, Any]:
         """
         Answer questions about document content
 
@@ -218,7 +407,9 @@ class OfflineLLMService:
         Format as JSON with keys: answer, confidence, explanation, quotes
         """
 
-        response = self.generate_response(prompt, model=model, max_tokens=800)
+        response = await self.generate_cached_response(
+            question, prompt, "answer", context=context, model=model, max_tokens=800
+        )
 
         if response['success']:
             try:
@@ -227,14 +418,16 @@ class OfflineLLMService:
                     'success': True,
                     'qa_result': qa_result,
                     'model': response['model'],
-                    'processing_time': response.get('total_duration', 0) / 1e9
+                    'processing_time': response.get('total_duration', 0) / 1e9,
+                    'semantic_cache': response.get('semantic_cache', {'hit': False})
                 }
             except json.JSONDecodeError:
                 return {
                     'success': True,
                     'qa_result': {'raw_response': response['response']},
                     'model': response['model'],
-                    'processing_time': response.get('total_duration', 0) / 1e9
+                    'processing_time': response.get('total_duration', 0) / 1e9,
+                    'semantic_cache': response.get('semantic_cache', {'hit': False})
                 }
         else:
             return {
@@ -244,7 +437,7 @@ class OfflineLLMService:
                 'model': response['model']
             }
 
-    def extract_entities_llm(self, text: str) -> Dict[str, Any]:
+    async def extract_entities_llm(self, text: str) -> Dict[str, Any]:
         """
         Extract entities using LLM (alternative to spaCy)
 
@@ -270,7 +463,7 @@ class OfflineLLMService:
         Return as JSON with categories as keys and lists of entities as values.
         """
 
-        response = self.generate_response(prompt, max_tokens=600)
+        response = await self.generate_response(prompt, max_tokens=600)
 
         if response['success']:
             try:
@@ -294,7 +487,7 @@ class OfflineLLMService:
                 'model': response['model']
             }
 
-    def classify_document(self, content: str) -> Dict[str, Any]:
+    async def classify_document(self, content: str) -> Dict[str, Any]:
         """
         Classify document type and content
 
@@ -320,7 +513,7 @@ class OfflineLLMService:
         Return as JSON with keys: document_type, primary_topic, content_category, language, reading_level
         """
 
-        response = self.generate_response(prompt, max_tokens=400)
+        response = await self.generate_response(prompt, max_tokens=400)
 
         if response['success']:
             try:
@@ -344,7 +537,7 @@ class OfflineLLMService:
                 'model': response['model']
             }
 
-    def generate_search_query(self, natural_query: str) -> Dict[str, Any]:
+    async def generate_search_query(self, natural_query: str) -> Dict[str, Any]:
         """
         Convert natural language query to structured search query
 
@@ -369,7 +562,7 @@ class OfflineLLMService:
         Return as JSON with keys: keywords, entity_types, date_range, boolean_logic, filters
         """
 
-        response = self.generate_response(prompt, max_tokens=500)
+        response = await self.generate_response(prompt, max_tokens=500)
 
         if response['success']:
             try:
@@ -396,7 +589,7 @@ class OfflineLLMService:
                 'model': response['model']
             }
 
-    def analyze_query_intent(self, query: str) -> Dict[str, Any]:
+    async def analyze_query_intent(self, query: str) -> Dict[str, Any]:
         """
         Analyze query intent and determine optimal search strategy
 
@@ -433,7 +626,7 @@ class OfflineLLMService:
         Return as JSON with keys: query_type, recommended_strategy, key_entities, search_depth, result_format, confidence
         """
 
-        response = self.generate_response(prompt, max_tokens=600)
+        response = await self.generate_response(prompt, max_tokens=600)
 
         if response['success']:
             try:
@@ -461,7 +654,7 @@ class OfflineLLMService:
                 'model': response['model']
             }
 
-    def generate_system_queries(self, query: str, intent_analysis: Dict[str, Any]) -> Dict[str, Any]:
+    async def generate_system_queries(self, query: str, intent_analysis: Dict[str, Any]) -> Dict[str, Any]:
         """
         Generate optimized queries for each search system based on intent analysis
 
@@ -470,7 +663,8 @@ class OfflineLLMService:
             intent_analysis: Analysis from analyze_query_intent
 
         Returns:
-            Optimized queries for each system
+            Optimized queries for each system, plus 'failed': the systems
+            whose query could not be generated
         """
         strategy = intent_analysis.get('recommended_strategy', 'hybrid_search')
         query_type = intent_analysis.get('query_type', 'general')
@@ -481,6 +675,7 @@ class OfflineLLMService:
             'graph_query': None,
             'vector_query': None
         }
+        generations = {}
 
         # Generate Solr query for keyword search
         if strategy in ['solr_primary', 'hybrid_search']:
@@ -496,9 +691,7 @@ class OfflineLLMService:
 
             Return just the Solr query string, no explanation.
             """
-            solr_response = self.generate_response(solr_prompt, max_tokens=200)
-            if solr_response['success']:
-                system_queries['solr_query'] = solr_response['response'].strip()
+            generations['solr_query'] = self.generate_response(solr_prompt, max_tokens=200)
 
         # Generate Neo4j vector similarity query
         if strategy in ['neo4j_primary', 'hybrid_search']:
@@ -513,9 +706,7 @@ class OfflineLLMService:
 
             Return just the semantic description, no explanation.
             """
-            vector_response = self.generate_response(vector_prompt, max_tokens=200)
-            if vector_response['success']:
-                system_queries['vector_query'] = vector_response['response'].strip()
+            generations['vector_query'] = self.generate_response(vector_prompt, max_tokens=200)
 
         # Generate Cypher query for graph relationships
         if strategy in ['graph_primary', 'hybrid_search'] or query_type == 'relationship_analysis':
@@ -531,21 +722,32 @@ class OfflineLLMService:
             Return just the Cypher query, no explanation.
             Example: MATCH (n)-[r]-(m) WHERE n.name CONTAINS "search" RETURN n, r, m LIMIT 20
             """
-            cypher_response = self.generate_response(cypher_prompt, max_tokens=300)
-            if cypher_response['success']:
-                system_queries['graph_query'] = cypher_response['response'].strip()
+            generations['graph_query'] = self.generate_response(cypher_prompt, max_tokens=300)
+
+        # The per-system prompts are independent, so generate them concurrently
+        responses = await asyncio.gather(*generations.values())
+        failed = []
+        for key, response in zip(generations, responses):
+            if response['success']:
+                system_queries[key] = response['response'].strip()
+            else:
+                failed.append(key)
 
         return {
             'success': True,
             'system_queries': system_queries,
+            'failed': failed,
             'strategy': strategy,
             'query_type': query_type
         }
 
-    def fuse_multi_system_results(self, query: str, results: Dict[str, Any]) -> Dict[str, Any]:
+    async def fuse_multi_system_results(self, query: str, results: Dict[str, Any]) -> Dict[str, Any]:
         """
         Intelligently fuse results from multiple search systems
 
+        Opt-in for integrated search (options.fusion="llm" or FUSION_METHOD=llm);
+        the default is deterministic rank fusion (rank_fusion.fuse_results).
+
         Args:
             query: Original query
             results: Results from all search systems
@@ -592,7 +794,7 @@ class OfflineLLMService:
         Return as JSON with keys: fused_results, summary, top_insights, follow_up_suggestions, confidence_score
         """
 
-        response = self.generate_response(prompt, max_tokens=1000)
+        response = await self.generate_response(prompt, max_tokens=1000)
 
         if response['success']:
             try:
@@ -620,8 +822,8 @@ class OfflineLLMService:
                 'model': response['model']
             }
 
-    def generate_integrated_response(self, query: str, fused_results: Dict[str, Any],
-                                   conversation_context: Optional[List[Dict]] = None) -> Dict[str, Any]:
+    async def generate_integrated_response(self, query: str, fused_results: Dict[str, Any],
+                                           conversation_context: Optional[List[Dict]] = None) -> Dict[str, Any]:
         """
         Generate a contextual, conversational response from fused search results
 
@@ -661,7 +863,10 @@ class OfflineLLMService:
         Return as JSON with keys: response_text, key_insights, data_sources, confidence, suggestions
         """
 
-        response = self.generate_response(prompt, max_tokens=800)
+        response = await self.generate_cached_response(
+            query, prompt, "integrated",
+            context=(context_str, fused_results.get('fused_analysis', {})), max_tokens=800
+        )
 
         if response['success']:
             try:
@@ -671,14 +876,16 @@ class OfflineLLMService:
                     'integrated_response': integrated_response,
                     'query': query,
                     'model': response['model'],
-                    'processing_time': response.get('total_duration', 0) / 1e9
+                    'processing_time': response.get('total_duration', 0) / 1e9,
+                    'semantic_cache': response.get('semantic_cache', {'hit': False})
                 }
             except json.JSONDecodeError:
                 return {
                     'success': True,
                     'integrated_response': {'response_text': response['response']},
                     'query': query,
-                    'model': response['model']
+                    'model': response['model'],
+                    'semantic_cache': response.get('semantic_cache', {'hit': False})
                 }
         else:
             return {
@@ -687,4 +894,14 @@ class OfflineLLMService:
                 'integrated_response': {'response_text': 'I apologize, but I encountered an error processing your query.'},
                 'query': query,
                 'model': response['model']
-            }
\ No newline at end of file
+            }
+
+# Global LLM service instance (shares one connection pool across callers)
+_llm_service = None
+
+def get_llm_service() -> OfflineLLMService:
+    """Get the global offline LLM service"""
+    global _llm_service
+    if _llm_service is None:
+        _llm_service = OfflineLLMService()
+    return _llm_service